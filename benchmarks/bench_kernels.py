@@ -0,0 +1,128 @@
+"""
+Benchmark the array-based kernels against the month-by-month loop they replaced.
+
+Both sides build the same dataframe from the same dates, so the numbers show the cost of the month calculations
+themselves. Creating the dates with `pd.date_range` is left out, it is the same for both and costs more than either.
+
+Run with: python -m benchmarks.bench_kernels
+"""
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from duo_tool.calculations import AanloopPhase, PaymentPhase
+from duo_tool.kernels import amortize, compound
+
+
+def legacy_aanloopfase(phase: AanloopPhase, dates: pd.DatetimeIndex) -> pd.DataFrame:
+    """The original `AanloopPhase.calculate`, compounding the debt once per month."""
+    # The original `_monthly_compound` inline, as the current one caches its growth factors
+    rate = phase.interest_rate
+    debt = [round(phase.debt * (pow((1 + rate / 12), x)), 2) for x in range(phase.payment_offset)]
+    df = pd.DataFrame(zip(dates, debt), columns=["month", "debt"])
+    df[["payment", "principal", "interest"]] = 0.0
+    return df
+
+
+def kernel_aanloopfase(phase: AanloopPhase, dates: pd.DatetimeIndex) -> pd.DataFrame:
+    """`AanloopPhase.calculate` without the date range."""
+    no_payments = np.zeros(phase.payment_offset)
+    return pd.DataFrame(
+        {
+            "month": dates,
+            "debt": compound(phase.debt, phase.interest_rate, phase.payment_offset)[0],
+            "payment": no_payments,
+            "principal": no_payments,
+            "interest": no_payments,
+        }
+    )
+
+
+def legacy_payment_phase(phase: PaymentPhase, dates: pd.DatetimeIndex) -> pd.DataFrame:
+    """The original `PaymentPhase._calculate_amortization`, building a dict per month."""
+    monthly_interest_r = phase.interest_rate / 12
+    remaining_balance = phase.debt
+    amortization_schedule = []
+    for month in dates:
+        interest_payment = round(remaining_balance * monthly_interest_r, 2)
+        principal_payment = round(phase.payment - interest_payment, 2)
+        remaining_balance -= principal_payment
+        remaining_balance = max(0, remaining_balance)
+        amortization_schedule.append(
+            {
+                "month": month,
+                "debt": remaining_balance,
+                "payment": phase.payment,
+                "principal": principal_payment,
+                "interest": interest_payment,
+            }
+        )
+    return pd.DataFrame(amortization_schedule)
+
+
+def kernel_payment_phase(phase: PaymentPhase, dates: pd.DatetimeIndex) -> pd.DataFrame:
+    """`PaymentPhase._calculate_amortization` without the date range."""
+    remaining_balance, principal_payment, interest_payment = amortize(
+        phase.debt, phase.payment, phase.interest_rate, phase.months
+    )
+    return pd.DataFrame(
+        {
+            "month": dates,
+            "debt": remaining_balance[0],
+            "payment": np.full(phase.months, phase.payment),
+            "principal": principal_payment[0],
+            "interest": interest_payment[0],
+        }
+    )
+
+
+def best_of(func, number: int = 50, repeat: int = 5) -> float:
+    """Returns the fastest time of a single call in milliseconds."""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1000
+
+
+def report(case: str, legacy, kernel) -> None:
+    """Check that both implementations agree and print their timings."""
+    assert legacy().equals(kernel()), f"{case}: kernel does not match the loop"
+    loop_ms, kernel_ms = best_of(legacy), best_of(kernel)
+    print(f"{case:<30}{loop_ms:>12.3f}{kernel_ms:>14.3f}{loop_ms / kernel_ms:>9.1f}x")
+
+
+def main() -> None:
+    start_date = pd.to_datetime("01-2024")
+
+    print(f"{'case':<30}{'loop (ms)':>12}{'kernel (ms)':>14}{'speedup':>10}")
+    for offset in [24, 84]:
+        phase = AanloopPhase(start_date, 0.0256, 30_000, offset)
+        dates = pd.date_range(start=start_date, freq="MS", periods=offset)
+        report(
+            f"aanloopfase {offset} months",
+            lambda: legacy_aanloopfase(phase, dates),
+            lambda: kernel_aanloopfase(phase, dates),
+        )
+
+    for years in [15, 35]:
+        phase = PaymentPhase(start_date, 0.0256, 31_000.0, 12 * years)
+        phase.payment = phase._monthly_payment(phase.debt, phase.interest_rate, phase.months)
+        dates = pd.date_range(start=start_date, freq="MS", periods=phase.months)
+        report(
+            f"payment phase {years} years",
+            lambda: legacy_payment_phase(phase, dates),
+            lambda: kernel_payment_phase(phase, dates),
+        )
+
+    # A batch of borrowers is where the kernels pay off most: one call instead of a loop per borrower
+    debts = np.random.default_rng(0).uniform(5_000, 80_000, 1_000).round(2)
+    phases = [PaymentPhase(start_date, 0.0256, float(debt), 420) for debt in debts]
+    for phase in phases:
+        phase.payment = phase._monthly_payment(phase.debt, phase.interest_rate, phase.months)
+    payments = np.array([phase.payment for phase in phases])
+    dates = pd.date_range(start=start_date, freq="MS", periods=420)
+    loop_ms = best_of(lambda: [legacy_payment_phase(phase, dates) for phase in phases], number=1, repeat=3)
+    kernel_ms = best_of(lambda: amortize(debts, payments, 0.0256, 420), number=1, repeat=3)
+    print(f"{'1000 borrowers, 35 years':<30}{loop_ms:>12.3f}{kernel_ms:>14.3f}{loop_ms / kernel_ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
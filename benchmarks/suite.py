@@ -0,0 +1,147 @@
+"""
+Benchmark the hot paths of the calculator and compare them against a stored baseline.
+
+Every case is timed as the fastest of a few repeats, and its peak memory is measured in a separate run with
+tracemalloc (which slows down the code, so it is not timed). A case regresses when its time or peak memory is more than
+the threshold above the baseline, in which case the suite exits with status 1.
+
+The baseline depends on the machine, so save a new one after changing hardware or the benchmark cases.
+
+Run with: python -m benchmarks.suite                 compare against benchmarks/baseline.json
+          python -m benchmarks.suite --save          store the results as the new baseline
+          python -m benchmarks.suite --threshold 0.5 allow 50% slowdown before failing
+"""
+import argparse
+import json
+import subprocess
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from duo_tool.batch import get_inputs_batch
+from duo_tool.calculations import AanloopPhase, PaymentPhase
+from duo_tool.inputs import get_inputs, one_time_payment
+
+BASELINE = Path(__file__).with_name("baseline.json")
+ROOT = Path(__file__).parent.parent
+START_DATE = pd.to_datetime("01-2024")
+
+
+def single_borrower_cases() -> dict:
+    """The calculations behind one submission of the form."""
+    cases = {}
+    for offset in [1, 24, 84]:
+        phase = AanloopPhase(START_DATE, 0.0256, 30_000, offset)
+        cases[f"aanloopfase offset={offset}"] = phase.calculate
+
+    for years in [15, 35]:
+        phase = PaymentPhase(START_DATE, 0.0256, np.float64(31_000.0), 12 * years)
+        cases[f"payment phase {years}y"] = phase.calculate
+
+        for offset in [1, 24, 84]:
+            cases[f"get_inputs {years}y offset={offset}"] = lambda y=years, o=offset: get_inputs(
+                y, START_DATE, 30_000, 2.56, o
+            )
+
+        payment = get_inputs(years, START_DATE, 30_000, 2.56, 24)["monthly_payment"]
+        for label, payment_date in [("aanloopfase", "06-2025"), ("payment phase", "03-2030")]:
+            arguments = (None, 10_000, pd.to_datetime(payment_date), 2.56, years, START_DATE, 30_000, 24, payment)
+            cases[f"one_time_payment {years}y {label}"] = lambda a=arguments: one_time_payment(*a)
+    return cases
+
+
+def batch_cases() -> dict:
+    """The throughput of the batch API for growing numbers of borrowers."""
+    rng = np.random.default_rng(0)
+    cases = {}
+    for borrowers in [1_000, 100_000, 1_000_000]:
+        debts = rng.uniform(1_000, 100_000, borrowers).round()
+        rates = rng.choice([0.46, 2.56, 3.5], borrowers)
+        offsets = rng.integers(1, 85, borrowers)
+        cases[f"batch summary n={borrowers:,}"] = lambda d=debts, r=rates, o=offsets: get_inputs_batch(
+            35, START_DATE, d, r, o
+        )
+
+    debts = rng.uniform(1_000, 100_000, 1_000).round()
+    cases["batch schedule n=1,000"] = lambda: get_inputs_batch(35, START_DATE, debts, 2.56, 24, schedule=True)
+    return cases
+
+
+def startup_cases() -> dict:
+    """The cold start of a fresh python process, as in every new app container or batch worker."""
+    statements = {
+        "startup import duo_tool.inputs": "import duo_tool.inputs",
+        "startup import duo_tool.utils": "import duo_tool.utils",
+        "startup first get_inputs": "import pandas; from duo_tool.inputs import get_inputs; "
+        "get_inputs(35, pandas.Timestamp('2024-01-01'), 30_000, 2.56, 24)",
+    }
+    return {
+        case: lambda s=statement: subprocess.run([sys.executable, "-c", s], cwd=ROOT, check=True, capture_output=True)
+        for case, statement in statements.items()
+    }
+
+
+def measure(func, repeat: int = 7) -> dict:
+    """Returns the fastest time of a single call in milliseconds and the peak memory of one call in MiB."""
+    # Run every repeat for at least 0.2 seconds, so that short calls are not dominated by timer noise
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    seconds = min(timer.repeat(number=number, repeat=repeat)) / number
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms": round(seconds * 1000, 4), "peak_mib": round(peak / 2**20, 3)}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Returns a line per metric that is more than `threshold` above the baseline."""
+    regressions = []
+    for case, metrics in results.items():
+        for metric, value in metrics.items():
+            reference = baseline.get(case, {}).get(metric)
+            if reference and value > reference * (1 + threshold):
+                regressions.append(f"{case}: {metric} {reference} -> {value} (+{value / reference - 1:.0%})")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--baseline", type=Path, default=BASELINE, help="the baseline file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative increase, 0.25 = 25%%")
+    parser.add_argument("--filter", default="", help="only run the cases that contain this text")
+    args = parser.parse_args()
+
+    # The calculations log every monthly payment, which would end up in the timings
+    logger.remove()
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    results = {}
+    print(f"{'case':<45}{'ms':>12}{'baseline':>12}{'peak MiB':>12}")
+    for case, func in {**single_borrower_cases(), **batch_cases(), **startup_cases()}.items():
+        if args.filter not in case:
+            continue
+        results[case] = measure(func)
+        reference = baseline.get(case, {}).get("ms", float("nan"))
+        print(f"{case:<45}{results[case]['ms']:>12.3f}{reference:>12.3f}{results[case]['peak_mib']:>12.2f}")
+
+    if args.save:
+        args.baseline.write_text(json.dumps({**baseline, **results}, indent=2) + "\n")
+        print(f"Saved the baseline to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
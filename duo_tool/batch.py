@@ -0,0 +1,248 @@
+"""
+This module calculates the outputs of `duo_tool.inputs.get_inputs` for many borrowers in one call.
+
+The monthly payment and total interest only depend on the debt after the aanloopfase, so they are calculated without
+building any schedule. The schedule per borrower and month is optional, as it takes (borrowers x months) memory.
+
+The chunking and process pool of the modules that calculate many borrowers or scenarios in chunks are shared here as
+well, see `iter_input_chunks` and `map_chunks`.
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from duo_tool.instrumentation import count, timed
+from duo_tool.kernels import amortize, compound, payment_after_aanloopfase, round_cents, truncate_at_payoff
+
+
+@timed("batch")
+def get_inputs_batch(years, start_date, original_debt, interest_perc, payment_offset, schedule: bool = False) -> dict:
+    """
+    Gather the monthly payment and total interest paid for many borrowers at once, see `get_inputs`.
+
+    The arguments are broadcast to one value per borrower, see `broadcast_inputs`.
+
+    Args:
+        years: amount of years to pay back loan
+        start_date: the start date of the aanloopfase
+        original_debt: the original debt amount in euros
+        interest_perc: the interest percentage
+        payment_offset: the number of months after the start date to start paying back the loan.
+        schedule: whether to also return the debt over time per borrower and month
+
+    Returns:
+        dict: the monthly payment, interest paid, debt after the aanloopfase and the month of the last payment per
+            borrower. With `schedule` the debt over time as well, see `_calculate_schedule`.
+    """
+    years, start_month, original_debt, interest_perc, payment_offset = broadcast_inputs(
+        years, start_date, original_debt, interest_perc, payment_offset
+    )
+
+    # Convert the interest percentage to a rate
+    interest_rate = interest_perc / 100
+    months = 12 * years
+
+    debt_after_aanloopfase, payment = payment_after_aanloopfase(original_debt, interest_rate, payment_offset, months)
+    count("batch_borrowers", len(payment_offset))
+
+    # Every payment is a whole number of cents, so this equals the sum of the payment column of the schedule
+    interest_paid = round_cents(payment * months - original_debt, numpy_round=True)
+
+    outputs = {
+        "total_interest_paid": interest_paid,
+        "monthly_payment": payment,
+        "debt_after_aanloopfase": debt_after_aanloopfase,
+        "last_payment_month": start_month + payment_offset + months - 1,
+    }
+    if schedule:
+        outputs["debt_over_time"] = _calculate_schedule(
+            original_debt, interest_rate, payment_offset, months, debt_after_aanloopfase, payment
+        )
+    return outputs
+
+
+def broadcast_inputs(years, start_date, original_debt, interest_perc, payment_offset) -> tuple:
+    """
+    Broadcast the inputs of many borrowers to arrays with one value per borrower.
+
+    Every argument is an array with one value per borrower, or a single value that holds for every borrower.
+    Broadcasting only creates views, so a single value is not copied for every borrower.
+
+    Returns:
+        tuple: the years, start month of the aanloopfase as datetime64[M], original debt, interest percentage and
+            payment offset per borrower.
+    """
+    start_month, years, original_debt, interest_perc, payment_offset = np.broadcast_arrays(
+        pd.to_datetime(np.atleast_1d(start_date)).values.astype("datetime64[M]"),
+        np.array(years, dtype=np.int64, ndmin=1),
+        np.array(original_debt, dtype=np.float64, ndmin=1),
+        np.array(interest_perc, dtype=np.float64, ndmin=1),
+        np.array(payment_offset, dtype=np.int64, ndmin=1),
+    )
+    return years, start_month, original_debt, interest_perc, payment_offset
+
+
+def chunk_ranges(size: int, chunk_size: int) -> list:
+    """The start and stop (not included) of every chunk of at most `chunk_size` out of `size` items."""
+    if chunk_size < 1:
+        raise ValueError("The chunk size must be at least 1")
+    return [(start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+
+
+def iter_input_chunks(
+    years, start_date, original_debt, interest_perc, payment_offset, chunk_size: int
+) -> Iterator[tuple]:
+    """
+    Broadcast the inputs of many borrowers, see `broadcast_inputs`, and yield them a chunk of borrowers at a time.
+
+    Yields:
+        tuple: the index of the first borrower of the chunk, and the years, start month, original debt, interest
+            percentage and payment offset of its borrowers, as slices of the broadcast inputs.
+    """
+    inputs = broadcast_inputs(years, start_date, original_debt, interest_perc, payment_offset)
+    for start, stop in chunk_ranges(len(inputs[0]), chunk_size):
+        yield (start, *(values[start:stop] for values in inputs))
+
+
+def map_chunks(function: Callable, arguments: Iterable[tuple], workers: int = None, initializer: Callable = None):
+    """
+    Call `function` with every tuple of `arguments` and yield the results in the order of the arguments.
+
+    With 1 worker, or a single tuple of arguments, the calls are made in this process. Otherwise they are spread over a
+    pool of processes, with at most two calls per worker in flight. The arguments are only read as the results are
+    used, so a generator of large chunks is never in memory all at once.
+
+    Args:
+        function: a module level function, so it can be sent to other processes
+        arguments: the positional arguments of every call
+        workers: the number of processes, by default one per cpu
+        initializer: called once in every process of the pool before the first call, e.g. to set up logging
+
+    Yields:
+        the result of every call
+    """
+    workers = workers or os.cpu_count() or 1
+    if isinstance(arguments, (list, tuple)):
+        workers = min(workers, len(arguments))
+    if workers <= 1:
+        for args in arguments:
+            yield function(*args)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer) as executor:
+        pending = deque()
+        for args in arguments:
+            pending.append(executor.submit(function, *args))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _calculate_schedule(
+    original_debt: np.ndarray,
+    interest_rate: np.ndarray,
+    payment_offset: np.ndarray,
+    months: np.ndarray,
+    debt_after_aanloopfase: np.ndarray,
+    payment: np.ndarray,
+) -> dict:
+    """
+    Calculate the debt over time per borrower (rows) and month since the start of the aanloopfase (columns).
+
+    Borrowers are grouped by their payment offset and term, so every group is a single call to the kernels.
+
+    Returns:
+        dict: the debt, payment, principal and interest arrays, padded with NaN after the last payment of a borrower,
+            and the number of months per borrower.
+    """
+    length = payment_offset + months
+    shape = (len(length), int(length.max()))
+    columns = {name: np.full(shape, np.nan) for name in ["debt", "payment", "principal", "interest"]}
+
+    terms, group = np.unique(np.stack([payment_offset, months], axis=1), axis=0, return_inverse=True)
+    for idx, (offset, n_months) in enumerate(terms):
+        rows = np.flatnonzero(group.ravel() == idx)[:, None]
+        aanloopfase = np.arange(offset)
+        payment_phase = np.arange(offset, offset + n_months)
+
+        columns["debt"][rows, aanloopfase] = compound(original_debt[rows[:, 0]], interest_rate[rows[:, 0]], offset)
+        for name in ["payment", "principal", "interest"]:
+            columns[name][rows, aanloopfase] = 0.0
+
+        remaining, principal, interest = amortize(
+            debt_after_aanloopfase[rows[:, 0]],
+            payment[rows[:, 0]],
+            interest_rate[rows[:, 0]],
+            n_months,
+            numpy_round=True,
+        )
+        columns["debt"][rows, payment_phase] = remaining
+        columns["payment"][rows, payment_phase] = payment[rows]
+        columns["principal"][rows, payment_phase] = principal
+        columns["interest"][rows, payment_phase] = interest
+
+    columns["length"] = length
+    return columns
+
+
+def get_extra_payment_sweep(
+    years: int, start_date, original_debt: float, interest_perc: float, payment_offset: int, extra_payment
+) -> dict:
+    """
+    Gather the total interest paid and the month of the last payment of one loan for many monthly extra payments.
+
+    Every extra payment amount is a row of a single `amortize` call, so sweeping a few hundred amounts takes about as
+    long as one `get_inputs`. The results per amount equal those of `get_inputs` with that `extra_payment`.
+
+    Args:
+        years: amount of years to pay back loan
+        start_date: the start date of the aanloopfase
+        original_debt: the original debt amount in euros
+        interest_perc: the interest percentage
+        payment_offset: the number of months after the start date to start paying back the loan.
+        extra_payment: the extra payment every month per scenario, or per scenario and month of the payment phase
+
+    Returns:
+        dict: the monthly payment without extra payment, and the interest paid, month of the last payment and the
+            number of payments per scenario.
+    """
+    extra_payment = np.array(extra_payment, dtype=np.float64)
+    if extra_payment.ndim < 2:
+        extra_payment = extra_payment.reshape(-1, 1)
+    if (extra_payment < 0).any():
+        raise ValueError("The extra payment cannot be negative")
+
+    # Convert the interest percentage to a rate
+    interest_rate = interest_perc / 100
+    months = 12 * years
+
+    debt_after_aanloopfase, payment = payment_after_aanloopfase(original_debt, interest_rate, payment_offset, months)
+
+    monthly_payment = np.broadcast_to(payment[0] + extra_payment, (len(extra_payment), months))
+    remaining, principal, interest = amortize(
+        debt_after_aanloopfase, monthly_payment, interest_rate, months, numpy_round=True
+    )
+    length, truncated_payment, _ = truncate_at_payoff(
+        debt_after_aanloopfase, monthly_payment, remaining, principal, interest
+    )
+
+    # Without extra payments `get_inputs` keeps the full term, even if the rounding pays off the debt a bit early
+    has_extra = extra_payment.any(axis=1)
+    length = np.where(has_extra, length, months)
+    monthly_payment = np.where(has_extra[:, None], truncated_payment, monthly_payment)
+
+    # As in `get_inputs`, the interest paid is the sum of all payments minus the original debt
+    interest_paid = round_cents(monthly_payment.sum(axis=1) - original_debt, numpy_round=True)
+
+    start_month = np.datetime64(pd.Timestamp(start_date), "M")
+    return {
+        "monthly_payment": float(payment[0]),
+        "total_interest_paid": interest_paid,
+        "last_payment_month": start_month + payment_offset + length - 1,
+        "payment_months": length,
+    }
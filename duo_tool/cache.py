@@ -0,0 +1,177 @@
+"""
+This module caches the results of `get_inputs` and `one_time_payment`.
+
+The caches live at module level, so they are shared by all sessions of the Streamlit server. Streamlit runs every
+session in its own thread, which is why the caches are guarded by a lock.
+
+When DUO_TOOL_STORE is set, results missing from a cache are read from a `duo_tool.store.ScheduleStore` on disk before
+they are calculated, so the worker processes of a host share them and a new worker does not start cold.
+"""
+import threading
+import warnings
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+import pandas as pd
+from pandas import Timestamp
+
+from duo_tool.events import ScheduleEngine
+from duo_tool.inputs import UNUSED_INPUTS, get_inputs, one_time_payment
+from duo_tool.instrumentation import count
+from duo_tool.store import ScheduleStore
+
+
+class LRUCache:
+    """Thread-safe cache that evicts the least recently used result once it holds `maxsize` results"""
+
+    def __init__(self, maxsize: int = 1024, name: str = "cache"):
+        """
+        Args:
+            maxsize: the maximum number of results to keep
+            name: the label of the hit and miss counters, see `duo_tool.instrumentation`
+        """
+        self.maxsize = maxsize
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, compute: Callable[[], dict]) -> dict:
+        """
+        Return the result for the key, calculating and storing it first if it is not in the cache.
+
+        The result is copied before it is returned, so that callers cannot change the cached schedule.
+        """
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                count("cache_hits", cache=self.name)
+                return _copy_result(self._results[key])
+            self.misses += 1
+            count("cache_misses", cache=self.name)
+
+        # Calculate outside the lock, so that sessions do not wait for each other. Errors are not cached.
+        result = compute()
+
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+        return _copy_result(result)
+
+    def info(self) -> dict:
+        """Returns the hit and miss counters and the current size."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._results), "maxsize": self.maxsize}
+
+    def clear(self) -> None:
+        """Remove all results and reset the counters."""
+        with self._lock:
+            self._results.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def _copy_result(result: dict) -> dict:
+    """Copy the schedule in a result, the other values are immutable. A read-only stored schedule is not copied."""
+    if not result["debt_over_time"].debt.flags.writeable:
+        return {**result}
+    return {**result, "debt_over_time": result["debt_over_time"].copy()}
+
+
+def _normalize(years: int, start_date: Timestamp, original_debt: int, interest_perc: float, payment_offset: int):
+    """Convert the inputs to plain python types, so that equal inputs give equal keys."""
+    return int(years), pd.Timestamp(start_date), float(original_debt), float(interest_perc), int(payment_offset)
+
+
+def _stored(name: str, key: tuple, compute: Callable[[], dict]) -> Callable[[], dict]:
+    """Returns a function that reads the result from the store if there is one, or otherwise calculates it."""
+    if store is None:
+        return compute
+    return lambda: store.get_or_compute(ScheduleStore.key(name, *key), compute)
+
+
+inputs_cache = LRUCache(name="get_inputs")
+one_time_payment_cache = LRUCache(name="one_time_payment")
+store = ScheduleStore.from_environment()
+
+
+def cached_get_inputs(
+    years: int,
+    start_date: Timestamp,
+    original_debt: int,
+    interest_perc: float,
+    payment_offset: int,
+    compute: Callable[[], dict] = None,
+) -> dict:
+    """
+    Cached version of `get_inputs`, with the same arguments and results.
+
+    Args:
+        compute: optional function that calculates the result when it is not cached, instead of `get_inputs`. It must
+            give the same result, e.g. from phases that were already calculated, see `duo_tool.pipeline`.
+    """
+    key = _normalize(years, start_date, original_debt, interest_perc, payment_offset)
+    return inputs_cache.get(key, _stored("get_inputs", key, compute or (lambda: get_inputs(*key))))
+
+
+def cached_one_time_payment(
+    inputs: dict,
+    payment_amount: int,
+    payment_date: Timestamp,
+    interest_perc: float,
+    years: int,
+    start_date: Timestamp,
+    original_debt: int,
+    payment_offset: int,
+    current_monthly_payment: float,
+    engine: ScheduleEngine = None,
+) -> dict:
+    """
+    Cached version of `one_time_payment`, with the same arguments and results.
+
+    The engine is not part of the key, as it follows from the other arguments. The inputs are deprecated, pass None.
+    """
+    if inputs is not None:
+        warnings.warn(UNUSED_INPUTS, DeprecationWarning, stacklevel=2)
+    years, start_date, original_debt, interest_perc, payment_offset = _normalize(
+        years, start_date, original_debt, interest_perc, payment_offset
+    )
+    key = (
+        years,
+        start_date,
+        original_debt,
+        interest_perc,
+        payment_offset,
+        float(payment_amount),
+        pd.Timestamp(payment_date),
+        float(current_monthly_payment),
+    )
+    compute = _stored(
+        "one_time_payment",
+        key,
+        lambda: one_time_payment(
+            inputs=None,
+            payment_amount=payment_amount,
+            payment_date=payment_date,
+            interest_perc=interest_perc,
+            years=years,
+            start_date=start_date,
+            original_debt=original_debt,
+            payment_offset=payment_offset,
+            current_monthly_payment=current_monthly_payment,
+            engine=engine,
+        ),
+    )
+    return one_time_payment_cache.get(key, compute)
+
+
+def cache_info() -> dict:
+    """Returns the counters of both caches and of the store, to help size them."""
+    info = {"get_inputs": inputs_cache.info(), "one_time_payment": one_time_payment_cache.info()}
+    if store is not None:
+        info["store"] = store.info()
+    return info
@@ -8,80 +8,197 @@ Sources:
 - https://www.geld.nl/lenen/service/aflossing-lening-berekenen
 - https://www.calculator.net/loan-calculator.html
 """
+from __future__ import annotations
+
 import abc
+import functools
+from typing import TYPE_CHECKING, Union
 
-import pandas as pd
+import numpy as np
 from loguru import logger
-from pandas import Timestamp
+
+from duo_tool.instrumentation import timed
+from duo_tool.kernels import amortize, compound, truncate_at_payoff
+from duo_tool.schedule import Schedule, to_ordinal, to_timestamp
+
+if TYPE_CHECKING:
+    from pandas import Timestamp
 
 
 class LoanPhase(abc.ABC):
-    """Each phase should have a calculate method that returns a dataframe"""
+    """Each phase should have a calculate method that returns a schedule"""
 
-    def __init__(self, start_date: Timestamp, interest_rate: float, debt: float):
+    def __init__(self, start_date: Timestamp, interest_rate: float, debt: float, rate_schedule: list = None):
         self.start_date = start_date
         self.interest_rate = interest_rate
         self.debt = debt
+        self.rate_schedule = rate_schedule or []
 
-    def calculate(self) -> pd.DataFrame:
+    def calculate(self, out: Schedule = None) -> Schedule:
         ...
 
+    def _rate_periods(self, months: int) -> list:
+        """
+        Split the months of this phase into periods with a constant interest rate.
+
+        The phase starts with `interest_rate`, and every (from_date, rate) pair in the rate schedule changes the rate
+        from that month on.
+
+        Returns:
+            list: the index of the first month and the interest rate of every period.
+        """
+        return _periods(self.start_date, self.interest_rate, self.rate_schedule, months)
+
+
+def _periods(start_date: Timestamp, initial_value: float, changes: list, months: int) -> list:
+    """
+    Split `months` months from the start date into periods with a constant value.
+
+    Returns:
+        list: the index of the first month and the value of every period.
+    """
+    import pandas as pd
+
+    periods = [(0, initial_value)]
+    start_month = to_ordinal(start_date)
+    for from_date, value in sorted(changes, key=lambda change: pd.Timestamp(change[0])):
+        first = max(0, to_ordinal(pd.Timestamp(from_date)) - start_month)
+        if first >= months:
+            break
+        if first == periods[-1][0]:
+            periods[-1] = (first, value)
+        else:
+            periods.append((first, value))
+
+        # A change to the value that already holds is no change, so it does not start a period
+        if len(periods) > 1 and periods[-1][1] == periods[-2][1]:
+            periods.pop()
+    return periods
+
+
+# The factors only depend on the interest rate and months, of which real loans have few distinct values. The cache is
+# typed, as a numpy float gives a numpy result that rounds differently, see `duo_tool.kernels`.
+@functools.lru_cache(maxsize=4096, typed=True)
+def _growth(interest: float, months: int) -> float:
+    """Calculates the growth of a debt over the months with monthly compounded yearly interest."""
+    return pow((1 + interest / 12), months)
+
+
+@functools.lru_cache(maxsize=4096, typed=True)
+def _annuity_factor(interest: float, months: int) -> float:
+    """Calculates the monthly payment per euro of debt of an amortized loan."""
+    # Define i as the monthly interest rate
+    i = interest / 12
+    n = months
+    return ((1 + i) ** n * i) / ((1 + i) ** n - 1)
+
+
+def _numpy_round(debt: float) -> bool:
+    """Whether the kernels round like a numpy float for this debt, see `duo_tool.kernels.round_cents`."""
+    return isinstance(debt, np.floating)
+
 
 class AanloopPhase(LoanPhase):
     """Class to calculate the aanloopfase"""
 
-    def __init__(self, start_date: Timestamp, interest_rate: float, debt: float, payment_offset: int):
+    def __init__(
+        self,
+        start_date: Timestamp,
+        interest_rate: float,
+        debt: float,
+        payment_offset: int,
+        rate_schedule: list = None,
+    ):
         """
         Args:
             start_date (str): start date of the aanloopfase
             interest_rate: The annual interest rate (as a decimal).
             debt (int): the original debt in euros
             payment_offset (int): the payment offset in months
+            rate_schedule: optional (from_date, interest_rate) pairs for a changing interest rate
         """
-        super().__init__(start_date, interest_rate, debt)
+        super().__init__(start_date, interest_rate, debt, rate_schedule)
         self.payment_offset = payment_offset
         self.final_debt = None
 
     @staticmethod
     def _monthly_compound(original_debt: float, months_passed: int, interest: float) -> float:
         """Calculates monthly compounded interest based on original debt, yearly interest, and the months passed."""
-        return round(original_debt * (pow((1 + interest / 12), months_passed)), 2)
+        return round(original_debt * _growth(interest, months_passed), 2)
 
-    def calculate(self) -> pd.DataFrame:
+    @timed("aanloopfase")
+    def calculate(self, out: Schedule = None) -> Schedule:
         """
-        Calculate two elements. The debt after the aanloopfase and the dataframe for plotting.
+        Calculate two elements. The debt after the aanloopfase and the schedule for plotting.
+
+        Args:
+            out: optional schedule of `payment_offset` months to fill in, instead of allocating a new one
         """
         # Get months in the 'aanloopfase' first
-        aanloopfase_dates = pd.date_range(start=self.start_date, freq="MS", periods=self.payment_offset)
+        schedule = out if out is not None else Schedule.empty(to_ordinal(self.start_date), self.payment_offset)
 
-        # Add interest on the debt
-        current_debt = [self._monthly_compound(self.debt, x, self.interest_rate) for x in range(self.payment_offset)]
+        # Add interest on the debt, per period with the same interest rate
+        periods = self._rate_periods(self.payment_offset)
+        current_debt = schedule.debt
+        for (first, rate), (stop, _) in zip(periods, periods[1:] + [(self.payment_offset, None)]):
+            # After a rate change, the debt of the previous month is compounded with the new rate
+            opening = self.debt if first == 0 else round(current_debt[first - 1] * (1 + rate / 12), 2)
+            current_debt[first:stop] = compound(opening, rate, stop - first, _numpy_round(opening))[0]
 
-        # Create output dataframe
-        aanloopfase_df = pd.DataFrame(zip(aanloopfase_dates, current_debt), columns=["month", "debt"])
-        aanloopfase_df[["payment", "principal", "interest"]] = 0.0
+        # No payments are made during the aanloopfase
+        schedule.payment[:] = 0.0
+        schedule.principal[:] = 0.0
+        schedule.interest[:] = 0.0
 
         # Save the final debt after aanloopfase
-        self.final_debt = aanloopfase_df["debt"].iloc[-1]
-        logger.info(f"final debt after aanloopfase: {self.final_debt}")
+        self.final_debt = schedule.debt[-1]
+        logger.info("final debt after aanloopfase: {}", self.final_debt)
 
-        return aanloopfase_df
+        return schedule
 
 
 class PaymentPhase(LoanPhase):
     """Class to calculate the payment phase"""
 
-    def __init__(self, start_date: Timestamp, interest_rate: float, debt: float, months: int):
+    def __init__(
+        self,
+        start_date: Timestamp,
+        interest_rate: float,
+        debt: float,
+        months: int,
+        rate_schedule: list = None,
+        extra_payment: Union[float, list] = 0.0,
+    ):
         """
         Args:
             start_date (str): start date of the aanloopfase
             interest_rate: The annual interest rate (as a decimal).
             debt (int): the current debt in euros, after the aanloopfase
             months: the amount of months to pay off debt
+            rate_schedule: optional (from_date, interest_rate) pairs for a changing interest rate
+            extra_payment: the extra payment every month in euros, or (from_date, amount) pairs for an amount that
+                changes from that month on
         """
-        super().__init__(start_date, interest_rate, debt)
+        super().__init__(start_date, interest_rate, debt, rate_schedule)
         self.months = months
+        self.extra_payment = extra_payment
         self.payment = None
+        self.payments = []
+        self.payoff_months = months
+
+    def _extra_payments(self) -> np.ndarray:
+        """Returns the extra payment for every month of the payment phase."""
+        if isinstance(self.extra_payment, (list, tuple)):
+            periods = _periods(self.start_date, 0.0, self.extra_payment, self.months)
+        else:
+            periods = [(0, self.extra_payment)]
+
+        extra_payments = np.zeros(self.months)
+        for (first, amount), (stop, _) in zip(periods, periods[1:] + [(self.months, None)]):
+            extra_payments[first:stop] = amount
+        if (extra_payments < 0).any():
+            raise ValueError("The extra payment cannot be negative")
+        return extra_payments
 
     @staticmethod
     def _monthly_payment(remaining_debt: float, interest: float, months: int) -> float:
@@ -90,65 +207,75 @@ class PaymentPhase(LoanPhase):
         if interest == 0:
             return round(remaining_debt / months, 2)
 
-        # Define i as the monthly interest rate
-        i = interest / 12
-        n = months
-        payment = ((1 + i) ** n * i) / ((1 + i) ** n - 1) * remaining_debt
+        payment = _annuity_factor(interest, months) * remaining_debt
         return round(payment, 2)
 
-    def _calculate_amortization(self) -> pd.DataFrame:
+    def _calculate_amortization(self, schedule: Schedule) -> Schedule:
         """
         Calculate amortization schedule for loan.
 
         Returns:
-            amortization_schedule: pandas dataframe containing amortization information for each month.
+            amortization_schedule: the schedule containing amortization information for each month.
         """
-        # Convert annual interest rate to monthly rate
-        monthly_interest_r = self.interest_rate / 12
-
-        # Get the date range
-        payment_dates = pd.date_range(start=self.start_date, freq="MS", periods=self.months)
-
-        # Initialize variables
-        remaining_balance = self.debt
-        amortization_schedule = []
-
-        for month in payment_dates:
-            # Calculate interest for the current month
-            interest_payment = round(remaining_balance * monthly_interest_r, 2)
-
-            # Calculate principal for the current month
-            principal_payment = round(self.payment - interest_payment, 2)
-
-            # Update the remaining balance
-            remaining_balance -= principal_payment
-
-            # Ensure the remaining balance doesn't go below zero
-            remaining_balance = max(0, remaining_balance)
-
-            # Create a dictionary for the current month's information
-            month_info = {
-                "month": month,
-                "debt": remaining_balance,
-                "payment": self.payment,
-                "principal": principal_payment,
-                "interest": interest_payment,
-            }
-
-            # Append the dictionary to the amortization schedule
-            amortization_schedule.append(month_info)
-
-        return pd.DataFrame(amortization_schedule)
-
-    def calculate(self) -> pd.DataFrame:
+        remaining_balance = schedule.debt
+        payment = schedule.payment
+        principal_payment = schedule.principal
+        interest_payment = schedule.interest
+
+        extra_payments = self._extra_payments()
+
+        # Calculate the remaining debt, principal and interest for all months of a period with the same rate at once
+        periods = self._rate_periods(self.months)
+        balance, monthly_payment = self.debt, self.payment
+        self.payments = []
+        for (first, rate), (stop, _) in zip(periods, periods[1:] + [(self.months, None)]):
+            # At every rate change the monthly payment is recalculated for the remaining debt and months
+            if first > 0:
+                balance = remaining_balance[first - 1]
+                monthly_payment = self._monthly_payment(balance, rate, self.months - first)
+                logger.opt(lazy=True).info(
+                    "Monthly payment from {:%m-%Y} will be: {}",
+                    lambda: to_timestamp(schedule.month[first]),
+                    lambda: monthly_payment,
+                )
+            self.payments.append(monthly_payment)
+
+            payment[first:stop] = monthly_payment + extra_payments[first:stop]
+            remaining, principal, interest = amortize(
+                balance, payment[None, first:stop], rate, stop - first, _numpy_round(balance)
+            )
+            remaining_balance[first:stop] = remaining[0]
+            principal_payment[first:stop] = principal[0]
+            interest_payment[first:stop] = interest[0]
+
+        # With extra payments the debt is paid off early, so the schedule ends in the month of the last payment
+        self.payoff_months = self.months
+        if extra_payments.any():
+            length, truncated_payment, truncated_principal = truncate_at_payoff(
+                self.debt, payment[None], remaining_balance[None], principal_payment[None], interest_payment[None]
+            )
+            self.payoff_months = int(length[0])
+            payment[:] = truncated_payment[0]
+            principal_payment[:] = truncated_principal[0]
+            logger.opt(lazy=True).info(
+                "The debt will be paid off in {:%m-%Y}", lambda: to_timestamp(schedule.month[self.payoff_months - 1])
+            )
+
+        return schedule[: self.payoff_months]
+
+    @timed("payment_phase")
+    def calculate(self, out: Schedule = None) -> Schedule:
         """
         Calculate the monthly payment and the amortization schedule
+
+        Args:
+            out: optional schedule of `months` months to fill in, instead of allocating a new one. With extra payments
+                only the months up to the payoff are returned.
         """
         # Determine the monthly payment
-        self.payment = self._monthly_payment(self.debt, self.interest_rate, self.months)
-        logger.info(f"Monthly payment will be: {self.payment}")
+        self.payment = self._monthly_payment(self.debt, self._rate_periods(self.months)[0][1], self.months)
+        logger.info("Monthly payment will be: {}", self.payment)
 
         # Get the payment phase information
-        payment_phase_df = self._calculate_amortization()
-
-        return payment_phase_df
+        schedule = out if out is not None else Schedule.empty(to_ordinal(self.start_date), self.months)
+        return self._calculate_amortization(schedule)
@@ -0,0 +1,245 @@
+"""
+Calculate the loans of a file of borrowers from the command line, without the streamlit app, e.g. in a nightly job.
+
+The borrower file is a CSV or Parquet file with a row per borrower and the columns:
+- start_date: the start of the aanloopfase as month-year, e.g. 01-2024
+- years: the repayment term, 15 or 35
+- original_debt: the original debt amount in euros
+- interest_perc: the interest percentage
+- payment_offset (optional, 24 by default): the number of months after the start date to start paying back the loan
+- payment_date and payment_amount (optional): one time extra payments as month-year and euros. Separate multiple extra
+  payments of a borrower with a semicolon, e.g. "01-2027;06-2030" and "5000;2000".
+
+The file is read in chunks, which are checked and calculated in a pool of processes. Borrowers without extra payments
+are calculated together with `get_inputs_batch`, the others one by one with the `ScheduleEngine`. The summary (a row per
+borrower) and the schedules (a row per borrower and month) are written to CSV or Parquet as the chunks finish. The
+borrower column is the row number in the borrower file, starting at 0.
+
+Run with: python -m duo_tool.cli borrowers.csv --summary summary.parquet
+          python -m duo_tool.cli borrowers.parquet --summary summary.csv --schedules schedules.parquet --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+from contextlib import ExitStack, closing, contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from duo_tool.batch import get_inputs_batch, map_chunks
+from duo_tool.events import ExtraPayment, ScheduleEngine
+from duo_tool.instrumentation import flush
+from duo_tool.schedule import COLUMNS, to_datetime64
+from duo_tool.stream import open_writer, to_rows
+from duo_tool.validation import validate_borrowers
+
+
+def read_borrowers(path: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Read a CSV or Parquet file of borrowers in chunks of `chunk_size` rows."""
+    path = Path(path)
+    if path.suffix == ".csv":
+        # Read the dates and extra payments as text, so they are checked like the form does
+        text = {"start_date": str, "payment_date": str, "payment_amount": str}
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype=text)
+    elif path.suffix == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as error:
+            raise ImportError("Reading Parquet files needs pyarrow, install it with `pip install pyarrow`") from error
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Unknown file type {path.suffix!r}, choose from ['.csv', '.parquet']")
+
+
+def calculate_chunk(frame: pd.DataFrame, first_row: int, schedules: bool) -> tuple:
+    """
+    Check and calculate a chunk of borrowers.
+
+    Args:
+        frame: the borrowers, see the module docstring for the columns
+        first_row: the row number of the first borrower in the file
+        schedules: whether to also calculate the schedules
+
+    Returns:
+        tuple: the summary, and the schedules if asked for, as chunks of columns (see `duo_tool.stream`)
+    """
+    borrowers = validate_borrowers(frame, first_row)
+    borrower = first_row + np.arange(len(frame))
+    start_month = borrowers["start_month"]
+    has_events = np.array([bool(events) for events in borrowers["events"]], dtype=bool)
+
+    summary = {
+        "borrower": borrower,
+        "monthly_payment": np.empty(len(frame)),
+        "total_interest_paid": np.empty(len(frame)),
+        "last_payment_month": np.empty(len(frame), dtype="datetime64[M]"),
+    }
+    schedule_chunks = []
+
+    # Without extra payments all borrowers are calculated at once
+    batch = ~has_events
+    if batch.any():
+        outputs = get_inputs_batch(
+            borrowers["years"][batch],
+            start_month[batch],
+            borrowers["original_debt"][batch],
+            borrowers["interest_perc"][batch],
+            borrowers["payment_offset"][batch],
+            schedule=schedules,
+        )
+        for column in ["monthly_payment", "total_interest_paid", "last_payment_month"]:
+            summary[column][batch] = outputs[column]
+        if schedules:
+            schedule_chunks.append(to_rows(outputs["debt_over_time"], start_month[batch], borrower[batch]))
+
+    for idx in np.flatnonzero(has_events):
+        engine = ScheduleEngine(
+            int(borrowers["years"][idx]),
+            pd.Timestamp(start_month[idx]),
+            float(borrowers["original_debt"][idx]),
+            float(borrowers["interest_perc"][idx]),
+            int(borrowers["payment_offset"][idx]),
+        )
+        try:
+            outputs = engine.calculate([ExtraPayment(date, amount) for date, amount in borrowers["events"][idx]])
+        except ValueError as error:
+            raise ValueError(f"Row {borrower[idx]}: {error}")
+        schedule = outputs["debt_over_time"]
+        summary["monthly_payment"][idx] = outputs["monthly_payment"]
+        summary["total_interest_paid"][idx] = outputs["total_interest_paid"]
+        summary["last_payment_month"][idx] = to_datetime64(schedule.month[-1])
+        if schedules:
+            schedule_chunks.append(
+                {
+                    "borrower": np.full(len(schedule), borrower[idx]),
+                    "month": to_datetime64(schedule.month),
+                    **{column: getattr(schedule, column) for column in COLUMNS},
+                }
+            )
+
+    if not schedules:
+        return summary, None
+
+    # Put the schedules back in the order of the borrowers
+    combined = {column: np.concatenate([chunk[column] for chunk in schedule_chunks]) for column in schedule_chunks[0]}
+    order = np.argsort(combined["borrower"], kind="stable")
+    return summary, {column: values[order] for column, values in combined.items()}
+
+
+def run(
+    input_path: Path,
+    summary_path: Path = None,
+    schedules_path: Path = None,
+    workers: int = None,
+    chunk_size: int = 10_000,
+) -> int:
+    """
+    Calculate a file of borrowers and write the results, see the module docstring.
+
+    Args:
+        input_path: the CSV or Parquet file of borrowers
+        summary_path: the CSV or Parquet file to write the summary per borrower to
+        schedules_path: the CSV or Parquet file to write the schedules per borrower and month to
+        workers: the number of processes, by default one per cpu. With 1 worker the chunks are calculated in this
+            process.
+        chunk_size: the number of borrowers per chunk
+
+    Returns:
+        int: the number of borrowers
+    """
+    if summary_path is None and schedules_path is None:
+        raise ValueError("Give a summary and/or schedules file to write to")
+    workers = workers or os.cpu_count() or 1
+    schedules = schedules_path is not None
+
+    with ExitStack() as stack:
+        summary_writer = _open_output(stack, summary_path)
+        schedules_writer = _open_output(stack, schedules_path)
+
+        start = time.perf_counter()
+        borrowers = 0
+        for summary, schedule in _calculate_chunks(read_borrowers(input_path, chunk_size), schedules, workers, stack):
+            if summary_writer:
+                summary_writer.write(summary)
+            if schedules_writer:
+                schedules_writer.write(schedule)
+
+            borrowers += len(summary["borrower"])
+            seconds = time.perf_counter() - start
+            logger.info("Calculated {:,} borrowers in {:.1f}s ({:,.0f}/s)", borrowers, seconds, borrowers / seconds)
+            flush()
+
+    return borrowers
+
+
+def _open_output(stack: ExitStack, path: Path):
+    """Open a writer for an output file on the stack, or return None without a file."""
+    if path is None:
+        return None
+    return stack.enter_context(open_writer(stack.enter_context(_partial(path))))
+
+
+@contextmanager
+def _partial(path: Path) -> Iterator[Path]:
+    """
+    Yields a temporary file next to `path`, which replaces `path` when the block succeeds and is removed otherwise, so
+    a failed run does not leave an empty or partial output file behind.
+    """
+    path = Path(path)
+    temporary = path.with_name(f".{path.stem}.partial{path.suffix}")
+    try:
+        yield temporary
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+    os.replace(temporary, path)
+
+
+def _calculate_chunks(frames: Iterator[pd.DataFrame], schedules: bool, workers: int, stack: ExitStack) -> Iterator:
+    """Calculate the chunks in order, with at most two chunks per worker in memory at a time."""
+    arguments = _with_first_row(frames, schedules)
+    # The pool is shut down together with the output files, also when a chunk fails
+    return stack.enter_context(closing(map_chunks(calculate_chunk, arguments, workers, initializer=_quiet)))
+
+
+def _with_first_row(frames: Iterator[pd.DataFrame], schedules: bool) -> Iterator[tuple]:
+    """Yields the arguments of `calculate_chunk` for every chunk, with the row number of its first borrower."""
+    first_row = 0
+    for frame in frames:
+        yield frame, first_row, schedules
+        first_row += len(frame)
+
+
+def _quiet() -> None:
+    """Do not log every monthly payment of the engine, it drowns out the progress."""
+    logger.disable("duo_tool.calculations")
+    logger.disable("duo_tool.events")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", type=Path, help="the CSV or Parquet file of borrowers")
+    parser.add_argument("--summary", type=Path, help="the CSV or Parquet file to write the summary to")
+    parser.add_argument("--schedules", type=Path, help="the CSV or Parquet file to write the schedules to")
+    parser.add_argument("--workers", type=int, default=None, help="the number of processes, one per cpu by default")
+    parser.add_argument("--chunk-size", type=int, default=10_000, help="the number of borrowers per chunk")
+    args = parser.parse_args()
+    if args.summary is None and args.schedules is None:
+        parser.error("give --summary and/or --schedules")
+
+    _quiet()
+    try:
+        run(args.input, args.summary, args.schedules, args.workers, args.chunk_size)
+    except ValueError as error:
+        logger.error(error)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
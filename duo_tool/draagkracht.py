@@ -0,0 +1,125 @@
+"""
+This module caps the monthly payment by the draagkracht: the part of your income DUO considers you able to pay.
+
+The monthly payment is at most a percentage of the yearly income above a threshold income, divided by 12. What is left
+of the debt at the end of the term is forgiven (kwijtgescholden). Both the percentage and the threshold depend on the
+repayment regime:
+- SF15 (15 years): 12% of the income above 84% of the minimum wage
+- SF35 (35 years): 4% of the income above 100% of the minimum wage
+
+The rules here are simplified: the income of every year counts directly (DUO looks two years back) and the threshold
+is kept at today's level for the whole term. For the exact thresholds see
+https://duo.nl/particulier/studieschuld-terugbetalen/draagkracht.jsp
+
+All income scenarios of a loan are evaluated at once, as rows of a single `amortize` call.
+"""
+import numpy as np
+
+from duo_tool.kernels import amortize, payment_after_aanloopfase, round_cents, truncate_at_payoff
+
+# The yearly minimum wage, including holiday allowance, that the threshold income is based on
+MINIMUM_WAGE = 27_000
+
+# The draagkracht percentage and threshold (as a fraction of the minimum wage) per repayment term in years
+REGIMES = {15: (0.12, 0.84), 35: (0.04, 1.00)}
+
+
+def income_paths(start_income: float, growth, years: int) -> np.ndarray:
+    """
+    Create yearly income scenarios from a starting income and yearly growth rates.
+
+    Args:
+        start_income: the yearly income in the first year of the payment phase
+        growth: the yearly income growth (as a decimal) per scenario, or per scenario and year
+        years: the number of years of the payment phase
+
+    Returns:
+        np.ndarray: the yearly income per scenario (rows) and year (columns)
+    """
+    growth = np.array(growth, dtype=np.float64)
+    if growth.ndim < 2:
+        growth = growth.reshape(-1, 1)
+    growth = np.broadcast_to(growth, (len(growth), years))
+
+    # The first year has the starting income, every next year grows with the rate of the year before
+    factors = np.cumprod(np.concatenate([np.ones((len(growth), 1)), 1 + growth[:, :-1]], axis=1), axis=1)
+    return start_income * factors
+
+
+def draagkracht(income, years: int, minimum_wage: float = MINIMUM_WAGE) -> np.ndarray:
+    """
+    Calculates the maximum monthly payment for a yearly income.
+
+    Args:
+        income: the yearly income in euros
+        years: the repayment term in years, which determines the regime
+        minimum_wage: the yearly minimum wage the threshold income is based on
+
+    Returns:
+        np.ndarray: the maximum monthly payment in euros
+    """
+    if years not in REGIMES:
+        raise ValueError(f"There is no draagkracht regime for a term of {years} years")
+    percentage, threshold = REGIMES[years]
+    income = np.array(income, dtype=np.float64)
+    return round_cents(np.maximum(income - threshold * minimum_wage, 0.0) * percentage / 12).reshape(income.shape)
+
+
+def get_draagkracht_scenarios(
+    years: int,
+    original_debt: float,
+    interest_perc: float,
+    payment_offset: int,
+    income,
+    minimum_wage: float = MINIMUM_WAGE,
+) -> dict:
+    """
+    Gather the outcomes of one loan for many income scenarios, with the monthly payment capped by the draagkracht.
+
+    Without a cap the outcomes equal those of `get_inputs`.
+    Args:
+        years: amount of years to pay back loan
+        original_debt: the original debt amount in euros
+        interest_perc: the interest percentage
+        payment_offset: the number of months after the start date to start paying back the loan.
+        income: the yearly income per scenario and year of the payment phase, see `income_paths`
+        minimum_wage: the yearly minimum wage the threshold income is based on
+
+    Returns:
+        dict: the monthly payment without a cap, and per scenario the total paid, interest paid, forgiven debt and
+            the number of months with a capped payment.
+    """
+    income = np.array(income, dtype=np.float64, ndmin=2)
+    if income.shape[1] != years:
+        raise ValueError(f"The income paths must have one income per year ({years}), not {income.shape[1]}")
+
+    # Convert the interest percentage to a rate
+    interest_rate = interest_perc / 100
+    months = 12 * years
+
+    debt_after_aanloopfase, payment = payment_after_aanloopfase(original_debt, interest_rate, payment_offset, months)
+
+    # Cap the payment of every month by the draagkracht of its year
+    cap = np.repeat(draagkracht(income, years, minimum_wage), 12, axis=1)
+    monthly_payment = np.minimum(payment[0], cap)
+    remaining, principal, interest = amortize(
+        debt_after_aanloopfase, monthly_payment, interest_rate, months, numpy_round=True
+    )
+
+    # A capped loan can only be paid off early through rounding, in which case the last payment is lowered
+    capped = cap < payment[0]
+    is_capped = capped.any(axis=1)
+    _, truncated_payment, _ = truncate_at_payoff(
+        debt_after_aanloopfase, monthly_payment, remaining, principal, interest
+    )
+    monthly_payment = np.where(is_capped[:, None], truncated_payment, monthly_payment)
+
+    # What is left of the debt at the end of the term is forgiven
+    total_paid = round_cents(monthly_payment.sum(axis=1), numpy_round=True)
+    return {
+        "monthly_payment": float(payment[0]),
+        "total_paid": total_paid,
+        "total_interest_paid": round_cents(total_paid - original_debt, numpy_round=True),
+        "forgiven_debt": np.where(is_capped, remaining[:, -1], 0.0),
+        "capped_months": capped.sum(axis=1),
+    }
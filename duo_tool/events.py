@@ -0,0 +1,192 @@
+"""
+This module calculates the loan with any number of extra payments (events) in one pass.
+
+The schedule is split into segments: every extra payment ends a segment and starts the next one. The engine keeps the
+schedule in preallocated arrays together with the state at the start of every segment, so when the events change only
+the segments after the earliest changed event are recalculated, in place. The months before it are left untouched.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List
+
+import numpy as np
+from loguru import logger
+
+from duo_tool.calculations import PaymentPhase
+from duo_tool.instrumentation import timed
+from duo_tool.kernels import amortize, compound
+from duo_tool.schedule import Schedule, to_ordinal, to_timestamp
+
+if TYPE_CHECKING:
+    from pandas import Timestamp
+
+
+@dataclass(frozen=True)
+class ExtraPayment:
+    """A one time extra payment of `amount` euros in the month of `date`"""
+
+    date: Timestamp
+    amount: float
+
+
+class ScheduleEngine:
+    """Class to calculate the debt over time for a loan with extra payments"""
+
+    def __init__(
+        self, years: int, start_date: Timestamp, original_debt: float, interest_perc: float, payment_offset: int
+    ):
+        """
+        Args:
+            years: amount of years to pay back loan
+            start_date: the start date of the aanloopfase
+            original_debt: the original debt amount in euros
+            interest_perc: the interest percentage
+            payment_offset: the number of months after the start date to start paying back the loan.
+        """
+        self.start_date = start_date
+        self.original_debt = original_debt
+        self.interest_rate = interest_perc / 100
+        self.payment_offset = payment_offset
+        self.months = payment_offset + 12 * years
+
+        self._schedule = Schedule.empty(to_ordinal(start_date), self.months)
+        self._debt = self._schedule.debt
+        self._payment = self._schedule.payment
+        self._principal = self._schedule.principal
+        self._interest = self._schedule.interest
+
+        # The (row, amount) of the applied extra payments, and the (first row, opening debt) of every segment
+        self._applied = []
+        self._segments = [(0, original_debt)]
+        self._end = None
+        self._monthly_payment = None
+
+    def calculate(self, events: List[ExtraPayment]) -> dict:
+        """
+        Calculate the debt over time with the given extra payments.
+
+        Only the months from the segment of the earliest event that differs from the previous call are recalculated.
+        An extra payment equal to the remaining debt pays off the loan, and the schedule ends in that month.
+
+        Args:
+            events: the extra payments, in any order
+
+        Returns:
+            dict: the debt over time, interest paid, and the monthly payment after the last extra payment.
+        """
+        events = self._normalize(events)
+
+        # Keep the segments up to and including the one that ends with the first changed event
+        unchanged = 0
+        while unchanged < min(len(events), len(self._applied)) and events[unchanged] == self._applied[unchanged]:
+            unchanged += 1
+        if unchanged < len(events) or unchanged < len(self._applied) or self._end is None:
+            kept_segments = unchanged + 1
+            del self._applied[unchanged:]
+            del self._segments[kept_segments:]
+            self._recalculate(events[unchanged:])
+
+        # The engine keeps changing its own schedule, so the result is a copy
+        schedule = self._schedule[: self._end].copy()
+
+        # Calculate the total interest paid
+        interest_paid = round(schedule.payment.sum() - self.original_debt, 2)
+
+        return {
+            "debt_over_time": schedule,
+            "total_interest_paid": interest_paid,
+            "monthly_payment": self._monthly_payment,
+        }
+
+    def _normalize(self, events: List[ExtraPayment]) -> list:
+        """Convert the events to sorted (row, amount) pairs, adding up payments in the same month."""
+        import pandas as pd
+
+        amounts = {}
+        start_month = to_ordinal(self.start_date)
+        for event in events:
+            row = to_ordinal(pd.Timestamp(event.date)) - start_month
+            if row < 0 or row >= self.months:
+                raise ValueError(
+                    f"De extra aflossing ({event.date:%m-%Y}) moet binnen de looptijd van de lening vallen"
+                )
+            amounts[row] = amounts.get(row, 0) + event.amount
+        return sorted(amounts.items())
+
+    @timed("splice")
+    def _recalculate(self, events: list) -> None:
+        """Calculate the schedule from the start of the last kept segment, applying the remaining events."""
+        # Until the schedule is complete, so the next call starts over if an event turns out to be invalid
+        self._end = None
+
+        for row, amount in events:
+            self._fill_segment(stop=row + 1)
+
+            # If the remaining debt is lower than the payment amount, throw error
+            if self._debt[row] < amount:
+                raise ValueError(
+                    f"De schuld op de datum van extra aflossing ({self._debt[row]:.2f}) moet hoger dan of gelijk "
+                    f"zijn aan het af te lossen bedrag ({amount})"
+                )
+
+            # Subtract/add the extra payment
+            self._debt[row] -= amount
+            self._payment[row] += amount
+            self._principal[row] += amount
+            self._applied.append((row, amount))
+
+            # The next segment opens with the interest of one month during the aanloopfase, and as is afterwards
+            if row + 1 < self.payment_offset:
+                opening = round(self._debt[row] * (pow((1 + self.interest_rate / 12), 1)), 2)
+            else:
+                opening = self._debt[row]
+            self._segments.append((row + 1, opening))
+
+            # The loan is paid off, so the schedule ends here
+            if self._debt[row] == 0:
+                self._end = row + 1
+                self._monthly_payment = 0.0
+                return
+
+        self._fill_segment(stop=self.months)
+        self._end = self.months
+
+    def _fill_segment(self, stop: int) -> None:
+        """Fill the rows of the last segment up to (not including) `stop`."""
+        start, opening = self._segments[-1]
+
+        # The kernels round like the type of the debt, see `duo_tool.kernels.round_cents`
+        numpy_round = isinstance(opening, np.floating)
+
+        # Compound the debt for the months of the aanloopfase in this segment
+        aanloopfase_stop = min(stop, self.payment_offset)
+        if start < aanloopfase_stop:
+            self._debt[start:aanloopfase_stop] = compound(
+                opening, self.interest_rate, aanloopfase_stop - start, numpy_round
+            )[0]
+            self._payment[start:aanloopfase_stop] = 0.0
+            self._principal[start:aanloopfase_stop] = 0.0
+            self._interest[start:aanloopfase_stop] = 0.0
+
+        # The payment phase starts from the debt after the aanloopfase, or from the opening debt of this segment
+        payment_start = max(start, self.payment_offset)
+        if payment_start < stop:
+            if start < self.payment_offset:
+                opening = self._debt[self.payment_offset - 1]
+                numpy_round = isinstance(opening, np.floating)
+            months_left = self.months - payment_start
+            self._monthly_payment = PaymentPhase._monthly_payment(opening, self.interest_rate, months_left)
+            logger.opt(lazy=True).info(
+                "Monthly payment from {:%m-%Y} will be: {}",
+                lambda: to_timestamp(self._schedule.month[payment_start]),
+                lambda: self._monthly_payment,
+            )
+
+            remaining, principal, interest = amortize(
+                opening, self._monthly_payment, self.interest_rate, stop - payment_start, numpy_round
+            )
+            self._debt[payment_start:stop] = remaining[0]
+            self._payment[payment_start:stop] = self._monthly_payment
+            self._principal[payment_start:stop] = principal[0]
+            self._interest[payment_start:stop] = interest[0]
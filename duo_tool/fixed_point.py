@@ -0,0 +1,298 @@
+"""
+This module calculates the loan in whole cents, with integer arithmetic.
+
+All money is stored as int64 cents and the interest percentage as an integer number of 1/10000 percent, so the monthly
+interest is an exact fraction of the debt and is rounded to cents by integer division. The remaining debt is the debt
+minus the sum of the principal payments, without any float drift, so the results are exactly reproducible: the same
+inputs give the same cents for a single loan or as part of a batch, and results can be compared bit for bit.
+
+Rounding is either half to even (banker's rounding) or half away from zero, see `ROUNDING`.
+
+The differences with the float calculations in `duo_tool.calculations`:
+- the aanloopfase adds the interest of every month in whole cents, instead of compounding the debt in one formula
+- the monthly payment is rounded with the chosen rounding, from the annuity factor per (rate, term) as an integer
+  number of 1/2**32, which is calculated exactly from the rate as a fraction
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from duo_tool.schedule import COLUMNS, Schedule, to_ordinal
+
+if TYPE_CHECKING:
+    from pandas import Timestamp
+
+ROUNDING = ("half_even", "half_up")
+
+# The interest percentage is stored as an integer number of 1/10000 percent, so the monthly rate is rate / DENOMINATOR
+RATE_SCALE = 10_000
+DENOMINATOR = 100 * RATE_SCALE * 12
+
+# The annuity factor is stored as an integer number of 1/FACTOR_SCALE, which keeps debt * factor within int64 for debts
+# up to about 20 million euros
+FACTOR_SCALE = 2**32
+
+
+def to_cents(euros) -> np.ndarray:
+    """Convert euros to whole cents, rounding half to even."""
+    return np.rint(np.asarray(euros, dtype=np.float64) * 100).astype(np.int64)
+
+
+def to_rate(interest_perc) -> np.ndarray:
+    """Convert an interest percentage to an integer number of 1/10000 percent."""
+    interest_perc = np.asarray(interest_perc, dtype=np.float64)
+    rate = np.rint(interest_perc * RATE_SCALE).astype(np.int64)
+    if not np.allclose(rate, interest_perc * RATE_SCALE, rtol=0, atol=1e-6):
+        raise ValueError("The interest percentage can have at most 4 decimals")
+    return rate
+
+
+def to_euros(schedule: Schedule) -> Schedule:
+    """Convert a schedule in cents to a schedule in euros, for display."""
+    return Schedule(schedule.month, *(getattr(schedule, column) / 100 for column in COLUMNS))
+
+
+def divide_round(numerator, denominator: int, rounding: str = "half_even") -> np.ndarray:
+    """
+    Divide integers and round the result to an integer.
+
+    Args:
+        numerator: the integers to divide
+        denominator: the positive integer to divide by
+        rounding: "half_even" to round halves to the even integer, "half_up" to round halves away from zero
+
+    Returns:
+        np.ndarray: the rounded quotients
+    """
+    numerator = np.asarray(numerator, dtype=np.int64)
+
+    # np.divmod is several times slower than a floor division and a multiplication for int64
+    quotient = numerator // denominator
+    twice = 2 * (numerator - quotient * denominator)
+    if rounding == "half_even":
+        return quotient + ((twice > denominator) | ((twice == denominator) & (quotient & 1 == 1)))
+    if rounding == "half_up":
+        # The quotient is floored, so a negative half is already rounded away from zero
+        return quotient + ((twice > denominator) | ((twice == denominator) & (quotient >= 0)))
+    raise ValueError(f"Unknown rounding {rounding!r}, choose from {ROUNDING}")
+
+
+def compound_cents(debt, rate, months: int, rounding: str = "half_even") -> np.ndarray:
+    """
+    Calculates the debt during the aanloopfase, adding the interest of every month in whole cents.
+
+    Args:
+        debt: the debt per borrower in cents
+        rate: the interest per borrower in 1/10000 percent, see `to_rate`
+        months: the number of months to calculate
+        rounding: see `divide_round`
+
+    Returns:
+        np.ndarray: the debt per borrower (rows) and month (columns), in cents
+    """
+    debt, rate = np.broadcast_arrays(np.array(debt, dtype=np.int64, ndmin=1), np.array(rate, dtype=np.int64, ndmin=1))
+    compounded = np.empty((len(debt), months), dtype=np.int64)
+    current = debt.copy()
+    for month in range(months):
+        compounded[:, month] = current
+        current = current + divide_round(current * rate, DENOMINATOR, rounding)
+    return compounded
+
+
+def annuity_payment_cents(debt, rate, months, rounding: str = "half_even") -> np.ndarray:
+    """
+    Calculates the monthly payment per borrower in cents, see `PaymentPhase._monthly_payment`.
+
+    The annuity factor is calculated once per unique (rate, months) with python integers, see `annuity_factor_scaled`,
+    so a borrower gets the same payment in a batch of any size.
+
+    Args:
+        debt: the debt per borrower in cents
+        rate: the interest per borrower in 1/10000 percent, see `to_rate`
+        months: the total duration in months per borrower
+        rounding: see `divide_round`
+
+    Returns:
+        np.ndarray: the monthly payment per borrower in cents
+    """
+    debt, rate, months = np.broadcast_arrays(
+        np.array(debt, dtype=np.int64, ndmin=1),
+        np.array(rate, dtype=np.int64, ndmin=1),
+        np.array(months, dtype=np.int64, ndmin=1),
+    )
+    # Combine the rate and term into one key, which is much faster to deduplicate than pairs
+    base = int(months.max()) + 1
+    terms, index = np.unique(rate * base + months, return_inverse=True)
+    factors = np.array([annuity_factor_scaled(*divmod(term, base)) for term in terms.tolist()], dtype=np.int64)
+    factors = factors[index.ravel()]
+
+    if len(debt) and (np.abs(debt) > np.iinfo(np.int64).max // factors.max()).any():
+        raise ValueError("The debt is too large for the monthly payment in whole cents")
+    return divide_round(debt * factors, FACTOR_SCALE, rounding)
+
+
+def annuity_factor_scaled(rate: int, months: int) -> int:
+    """
+    Calculates the annuity factor i * (1 + i) ** n / ((1 + i) ** n - 1) in 1/FACTOR_SCALE, rounded half to even.
+
+    With the monthly rate i as the fraction rate / DENOMINATOR the factor is a fraction of integers, so it is
+    calculated exactly with python integers before it is rounded.
+
+    Args:
+        rate: the interest in 1/10000 percent, see `to_rate`
+        months: the total duration in months
+
+    Returns:
+        int: the annuity factor times FACTOR_SCALE
+    """
+    if rate == 0:
+        numerator, denominator = FACTOR_SCALE, months
+    else:
+        growth = (DENOMINATOR + rate) ** months
+        numerator = growth * rate * FACTOR_SCALE
+        denominator = DENOMINATOR * (growth - DENOMINATOR**months)
+    quotient, remainder = divmod(numerator, denominator)
+    return quotient + (2 * remainder > denominator or (2 * remainder == denominator and quotient % 2 == 1))
+
+
+def amortize_cents(debt, payment, rate, months: int, rounding: str = "half_even") -> tuple:
+    """
+    Calculate the amortization schedule per borrower in cents, see `duo_tool.kernels.amortize`.
+
+    Like the float kernel this iterates on the whole interest column until nothing changes, but in integers the
+    remaining debt is simply the debt minus the running sum of the principal.
+
+    Args:
+        debt: the debt per borrower at the start of the payment phase, in cents
+        payment: the monthly payment per borrower, or per borrower and month, in cents
+        rate: the interest per borrower in 1/10000 percent, see `to_rate`
+        months: the number of months to calculate
+        rounding: see `divide_round`
+
+    Returns:
+        tuple: the remaining debt, principal and interest arrays per borrower (rows) and month (columns), in cents
+    """
+    debt = np.array(debt, dtype=np.int64, ndmin=1)[:, None]
+    rate = np.array(rate, dtype=np.int64, ndmin=1)[:, None]
+    payment = np.array(payment, dtype=np.int64)
+    if payment.ndim < 2:
+        payment = payment.reshape(-1, 1)
+    rows = np.broadcast_shapes(debt.shape, rate.shape, payment.shape[:1] + (1,))[0]
+    debt, rate = np.broadcast_to(debt, (rows, 1)), np.broadcast_to(rate, (rows, 1))
+    payment = np.broadcast_to(payment, (rows, months))
+
+    # Start from the interest of the unrounded closed-form schedule
+    monthly_r = rate / DENOMINATOR
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        growth = np.power(1 + monthly_r, np.arange(months))
+        guess = np.where(monthly_r == 0, 0.0, debt * growth * monthly_r - payment * (growth - 1))
+    interest = np.rint(np.nan_to_num(guess)).astype(np.int64)
+
+    for _ in range(months + 1):
+        principal = payment - interest
+        remaining = debt - np.cumsum(principal, axis=1)
+
+        # Once the debt drops below zero it is clamped, after which it stays at zero for the rest of the schedule
+        remaining[np.logical_or.accumulate(remaining < 0, axis=1)] = 0
+
+        updated = divide_round(np.concatenate([debt, remaining[:, :-1]], axis=1) * rate, DENOMINATOR, rounding)
+        if np.array_equal(updated, interest):
+            break
+        interest = updated
+
+    return remaining, principal, interest
+
+
+def get_inputs_cents(
+    years: int,
+    start_date: Timestamp,
+    original_debt: float,
+    interest_perc: float,
+    payment_offset: int,
+    rounding: str = "half_even",
+) -> dict:
+    """
+    Gather the debt over time, total interest paid and monthly payment based on input, in whole cents.
+
+    Args:
+        years: amount of years to pay back loan
+        start_date: the start date of the aanloopfase
+        original_debt: the original debt amount in euros
+        interest_perc: the interest percentage, with at most 4 decimals
+        payment_offset: the number of months after the start date to start paying back the loan.
+        rounding: "half_even" (banker's rounding) or "half_up" (half away from zero)
+
+    Returns:
+        dict: the debt over time (a `Schedule` in cents), interest paid and monthly payment in cents.
+    """
+    if rounding not in ROUNDING:
+        raise ValueError(f"Unknown rounding {rounding!r}, choose from {ROUNDING}")
+    if payment_offset < 1:
+        raise ValueError("The payment offset must be at least 1 month")
+    debt, rate = to_cents(original_debt), to_rate(interest_perc)
+    months = 12 * years
+    schedule = Schedule.empty(to_ordinal(start_date), payment_offset + months, dtype=np.int64)
+
+    # The aanloopfase
+    schedule.debt[:payment_offset] = compound_cents(debt, rate, payment_offset, rounding)[0]
+    for column in ["payment", "principal", "interest"]:
+        getattr(schedule, column)[:payment_offset] = 0
+
+    # The payment phase, which starts from the debt of the last month of the aanloopfase
+    debt_after_aanloopfase = schedule.debt[payment_offset - 1]
+    payment = annuity_payment_cents(debt_after_aanloopfase, rate, months, rounding)
+    remaining, principal, interest = amortize_cents(debt_after_aanloopfase, payment, rate, months, rounding)
+    schedule.debt[payment_offset:] = remaining[0]
+    schedule.payment[payment_offset:] = payment[0]
+    schedule.principal[payment_offset:] = principal[0]
+    schedule.interest[payment_offset:] = interest[0]
+
+    return {
+        "debt_over_time": schedule,
+        "total_interest_paid": int(schedule.payment.sum() - debt),
+        "monthly_payment": int(payment[0]),
+    }
+
+
+def get_summary_cents(years, original_debt, interest_perc, payment_offset, rounding: str = "half_even") -> dict:
+    """
+    Gather the total interest paid and monthly payment in cents for many borrowers, see `get_inputs_cents`.
+
+    The arguments are broadcast to one value per borrower like those of `duo_tool.batch.broadcast_inputs`. The results
+    per borrower are exactly those of `get_inputs_cents`.
+
+    Returns:
+        dict: the interest paid, monthly payment and debt after the aanloopfase per borrower, in cents.
+    """
+    if rounding not in ROUNDING:
+        raise ValueError(f"Unknown rounding {rounding!r}, choose from {ROUNDING}")
+    years, debt, rate, payment_offset = np.broadcast_arrays(
+        np.array(years, dtype=np.int64, ndmin=1),
+        np.array(to_cents(original_debt), ndmin=1),
+        np.array(to_rate(interest_perc), ndmin=1),
+        np.array(payment_offset, dtype=np.int64, ndmin=1),
+    )
+    if (payment_offset < 1).any():
+        raise ValueError("The payment offset must be at least 1 month")
+    months = 12 * years
+
+    # The debt in the last month of the aanloopfase. Sorted on the offset, the borrowers still in the aanloopfase in a
+    # month are the first `active` ones, so every month works on a slice.
+    order = np.argsort(-payment_offset, kind="stable")
+    sorted_offset, sorted_rate = payment_offset[order], rate[order]
+    current = debt[order]
+    for month in range(1, int(payment_offset.max())):
+        active = np.count_nonzero(sorted_offset > month)
+        current[:active] += divide_round(current[:active] * sorted_rate[:active], DENOMINATOR, rounding)
+    debt_after_aanloopfase = np.empty_like(current)
+    debt_after_aanloopfase[order] = current
+    payment = annuity_payment_cents(debt_after_aanloopfase, rate, months, rounding)
+
+    # Every month pays the same whole number of cents
+    return {
+        "total_interest_paid": payment * months - debt,
+        "monthly_payment": payment,
+        "debt_after_aanloopfase": debt_after_aanloopfase,
+    }
@@ -1,14 +1,31 @@
+from __future__ import annotations
+
+import warnings
+from typing import TYPE_CHECKING, Union
+
 import numpy as np
-import pandas as pd
 from loguru import logger
-from pandas import Timestamp
 
 from duo_tool.calculations import AanloopPhase, PaymentPhase
-from duo_tool.utils import diff_month
+from duo_tool.events import ExtraPayment, ScheduleEngine
+from duo_tool.instrumentation import count, timed, timer
+from duo_tool.schedule import Schedule, to_ordinal, to_timestamp
+
+if TYPE_CHECKING:
+    from pandas import Timestamp
+
+# The warning for the outputs of `get_inputs` passed to `one_time_payment`, which it does not use anymore
+UNUSED_INPUTS = "The inputs argument of one_time_payment is not used anymore and will be removed, pass None instead"
 
 
 def get_inputs(
-    years: int, start_date: Timestamp, original_debt: int, interest_perc: float, payment_offset: int
+    years: int,
+    start_date: Timestamp,
+    original_debt: int,
+    interest_perc: float,
+    payment_offset: int,
+    rate_schedule: list = None,
+    extra_payment: Union[float, list] = 0.0,
 ) -> dict:
     """
     Gather the debt over time (df), total interest paid and monthly payment based on input.
@@ -18,34 +35,107 @@ def get_inputs(
         original_debt: the original debt amount in euros
         interest_perc: the interest percentage
         payment_offset: the number of months after the start date to start paying back the loan.
+        rate_schedule: optional (from_date, interest_perc) pairs, changing the interest percentage from that month on.
+            The monthly payment is recalculated at every change.
+        extra_payment: the extra payment every month of the payment phase in euros, or (from_date, amount) pairs for
+            an amount that changes from that month on. The debt over time ends in the month it is paid off.
 
     Returns:
-        dict: the debt over time, interest paid, and monthly payment.
+        dict: the debt over time (a `Schedule`), interest paid, monthly payment (at the start of the payment phase,
+            without the extra payment) and the month of the last payment.
     """
-    # Convert the interest percentage to a rate
+    # Convert the interest percentages to rates
     interest_rate = interest_perc / 100
+    rate_schedule = [(from_date, perc / 100) for from_date, perc in rate_schedule or []]
     months = 12 * years
 
+    # Both phases are calculated into one schedule, so combining them copies nothing
+    start_month = to_ordinal(start_date)
+    schedule = Schedule.empty(start_month, payment_offset + months)
+
     # Get the information for the aanloopfase
-    aanloopfase = AanloopPhase(start_date, interest_rate, original_debt, payment_offset)
-    aanloopfase_df = aanloopfase.calculate()
+    aanloopfase = AanloopPhase(start_date, interest_rate, original_debt, payment_offset, rate_schedule)
+    aanloopfase_schedule = aanloopfase.calculate(out=schedule[:payment_offset])
     debt_after_aanloopfase = aanloopfase.final_debt
 
     # Get information for the payment phase
-    first_payment_date = start_date + pd.DateOffset(months=payment_offset)
-    payment_phase = PaymentPhase(first_payment_date, interest_rate, debt_after_aanloopfase, months)
-    payment_phase_df = payment_phase.calculate()
-    payment = payment_phase.payment
+    first_payment_date = to_timestamp(start_month + payment_offset)
+    payment_phase = PaymentPhase(
+        first_payment_date, interest_rate, debt_after_aanloopfase, months, rate_schedule, extra_payment
+    )
+    payment_phase_schedule = payment_phase.calculate(out=schedule[payment_offset:])
+
+    return combine_phases(aanloopfase_schedule, payment_phase_schedule, original_debt, payment_phase.payment)
 
-    # Combine dataframes
-    df = pd.concat([aanloopfase_df, payment_phase_df], axis=0).reset_index(drop=True)
+
+def combine_phases(aanloopfase: Schedule, payment_phase: Schedule, original_debt: int, payment: float) -> dict:
+    """
+    Combine the schedules of both phases into the outputs of `get_inputs`.
+
+    Args:
+        aanloopfase: the schedule of the aanloopfase
+        payment_phase: the schedule of the payment phase, which ends early if the debt is paid off early
+        original_debt: the original debt amount in euros
+        payment: the monthly payment at the start of the payment phase
+
+    Returns:
+        dict: the debt over time, interest paid, monthly payment and the month of the last payment.
+    """
+    # Adjacent slices of one schedule are combined without copying
+    with timer("concat"):
+        schedule = Schedule.concat([aanloopfase, payment_phase])
+    count("rows", len(schedule))
 
     # Calculate the total interest paid
-    interest_paid = round(df["payment"].sum() - original_debt, 2)
+    interest_paid = round(schedule.payment.sum() - original_debt, 2)
 
-    return {"debt_over_time": df, "total_interest_paid": interest_paid, "monthly_payment": payment}
+    return {
+        "debt_over_time": schedule,
+        "total_interest_paid": interest_paid,
+        "monthly_payment": payment,
+        "last_payment_month": schedule.last_month,
+    }
 
 
+def get_summary(
+    years: int, start_date: Timestamp, original_debt: int, interest_perc: float, payment_offset: int
+) -> dict:
+    """
+    Gather the total interest paid and monthly payment based on input, without calculating the debt over time.
+
+    Gives the same results as `get_inputs` in constant time, use it when the debt over time is not needed.
+    Args:
+        years: amount of years to pay back loan
+        start_date: the start date of the aanloopfase
+        original_debt: the original debt amount in euros
+        interest_perc: the interest percentage
+        payment_offset: the number of months after the start date to start paying back the loan.
+
+    Returns:
+        dict: the interest paid, monthly payment, debt after the aanloopfase and month of the last payment.
+    """
+    # Convert the interest percentage to a rate
+    interest_rate = interest_perc / 100
+    months = 12 * years
+
+    # The last month of the aanloopfase is a numpy float in `get_inputs`, so the payment phase rounds like numpy there
+    debt_after_aanloopfase = np.float64(
+        AanloopPhase._monthly_compound(original_debt, payment_offset - 1, interest_rate)
+    )
+    payment = PaymentPhase._monthly_payment(debt_after_aanloopfase, interest_rate, months)
+
+    # Every payment is a whole number of cents, so this equals the sum of the payments in the schedule
+    interest_paid = round(payment * months - original_debt, 2)
+
+    return {
+        "total_interest_paid": interest_paid,
+        "monthly_payment": payment,
+        "debt_after_aanloopfase": debt_after_aanloopfase,
+        "last_payment_month": to_timestamp(to_ordinal(start_date) + payment_offset + months - 1),
+    }
+
+
+@timed("one_time_payment")
 def one_time_payment(
     inputs: dict,
     payment_amount: int,
@@ -56,90 +146,47 @@ def one_time_payment(
     original_debt: int,
     payment_offset: int,  # TODO: change order to conform with previous functions
     current_monthly_payment: float,
-):
-    # Convert the interest percentage to a rate
-    interest_rate = interest_perc / 100
+    engine: ScheduleEngine = None,
+) -> dict:
+    """
+    Recalculate the debt over time (df), total interest paid and monthly payment with a one time extra payment.
 
-    # Trim the dataframe until payment date
-    df = inputs["debt_over_time"]
-    idx = df.loc[df["month"] == payment_date].index[0]
-    df = df[: idx + 1].copy()
-
-    # If the remaining debt is lower than the payment amount, throw error
-    if df["debt"].iloc[idx] < payment_amount:
-        raise ValueError(
-            f"De schuld op de datum van extra aflossing ({df['debt'].iloc[idx]:.2f}) moet hoger dan of gelijk "
-            f"zijn aan het af te lossen bedrag ({payment_amount})"
-        )
-
-    # If the remaining debt equals the payment amount, there is no need to recalculate.
-    if df["debt"].iloc[idx] == payment_amount:
-        # TODO: in this case we should not recalculate > and the payment finishes earlier than the 35/15 years
-        raise NotImplementedError("to be implemented")
-
-    # Subtract/add the extra payment
-    df.at[idx, "debt"] -= payment_amount
-    df.at[idx, "payment"] += payment_amount
-    df.at[idx, "principal"] += payment_amount
-
-    # If the payment date is after the aanloopfase, we can simply slice the df and recalculate it partially.
-    if payment_date > start_date + pd.DateOffset(months=payment_offset - 1):
-        # Recalculate the rest of the payment
-        months_left = (years * 12) - diff_month(payment_date, start_date + pd.DateOffset(months=payment_offset))
-        remaining_debt = df["debt"].iloc[-1]
-
-        payment_phase = PaymentPhase(payment_date, interest_rate, remaining_debt, months_left)
-        rest_df = payment_phase.calculate()
-        updated_payment = payment_phase.payment
-        rest_df = rest_df.drop(index=df.index[0], axis=0)
-
-        logger.info(f"months left after extra payment: {months_left}")
-        logger.info(f"remaining deb after extra payment: {remaining_debt}")
-        logger.info(f"new monthly payment after extra payment: {updated_payment}")
-
-        # Combine data again
-        df = pd.concat([df, rest_df], axis=0).reset_index(drop=True)
-
-        # Calculate the total interest paid > old amount * time past + new amount * time left
-        interest_paid = round(df["payment"].sum() - original_debt, 2)
-
-        return {
-            "debt_over_time": df,
-            "total_interest_paid": interest_paid,
-            "monthly_payment": round(np.mean([updated_payment, current_monthly_payment]), 2),
-        }
-
-    # If the payment is during the aanloopfase adapt the aanloopfase and then calculate the payment phase
-    else:
-        # The debt needs to be increased with interest of 1 month
-        debt_plus_interest = round(df["debt"].iloc[idx] * (pow((1 + interest_rate / 12), 1)), 2)
-
-        # Calculate rest of aanloopfase and combine
-        aanloopfase = AanloopPhase(
-            start_date=payment_date + pd.DateOffset(months=1),  # The month after the additional payment
-            interest_rate=interest_rate,
-            debt=debt_plus_interest,
-            payment_offset=payment_offset - idx - 1,  # The original offset minus the amount of months that have passed
-        )
-        aanloopfase_df = aanloopfase.calculate()
-        debt_after_aanloopfase = aanloopfase.final_debt
-        aanloopfase_df = pd.concat([df, aanloopfase_df], axis=0).reset_index(drop=True)
-
-        # Calculate the payment phase
-        first_payment_date = start_date + pd.DateOffset(months=payment_offset)
-        payment_phase = PaymentPhase(first_payment_date, interest_rate, debt_after_aanloopfase, 12 * years)
-        payment_phase_df = payment_phase.calculate()
-
-        # Combine dataframes
-        df = pd.concat([aanloopfase_df, payment_phase_df], axis=0).reset_index(drop=True)
-
-        # Calculate the total interest paid
-        interest_paid = round(df["payment"].sum() - original_debt, 2)
-
-        return {"debt_over_time": df, "total_interest_paid": interest_paid, "monthly_payment": payment_phase.payment}
+    For more than one extra payment, use the `ScheduleEngine` directly.
+    Args:
+        inputs: deprecated, pass None. The engine calculates the whole schedule, so the outputs of `get_inputs` are
+            not used anymore.
+        payment_amount: the extra payment in euros
+        payment_date: the month of the extra payment
+        interest_perc: the interest percentage
+        years: amount of years to pay back loan
+        start_date: the start date of the aanloopfase
+        original_debt: the original debt amount in euros
+        payment_offset: the number of months after the start date to start paying back the loan.
+        current_monthly_payment: the monthly payment without the extra payment
+        engine: optional engine of the same loan from an earlier call, which only recalculates the months from the
+            earliest changed extra payment on
+
+    Returns:
+        dict: the debt over time, interest paid, and monthly payment.
+    """
+    if inputs is not None:
+        warnings.warn(UNUSED_INPUTS, DeprecationWarning, stacklevel=2)
+    if engine is None:
+        engine = ScheduleEngine(years, start_date, original_debt, interest_perc, payment_offset)
+    outputs = engine.calculate([ExtraPayment(payment_date, payment_amount)])
+    count("rows", len(outputs["debt_over_time"]))
+
+    # After an extra payment in the payment phase, show the average of the original and the new monthly payment
+    if to_ordinal(payment_date) >= to_ordinal(start_date) + payment_offset and outputs["monthly_payment"]:
+        logger.info("new monthly payment after extra payment: {}", outputs["monthly_payment"])
+        outputs["monthly_payment"] = round(np.mean([outputs["monthly_payment"], current_monthly_payment]), 2)
+
+    return outputs
 
 
 if __name__ == "__main__":
+    import pandas as pd
+
     date = pd.to_datetime("01-2024")
     y = 35
     i_p = 2.56
@@ -150,7 +197,7 @@ if __name__ == "__main__":
     out_df = out["debt_over_time"]
 
     out2 = one_time_payment(
-        inputs=out,
+        inputs=None,
         payment_amount=10_000,
         payment_date=pd.to_datetime("03-2025"),
         interest_perc=i_p,
@@ -0,0 +1,260 @@
+"""
+This module adds opt-in timers and counters to the hot paths, and a sampling profiler.
+
+Both are off by default, then every timer and counter is a no-op that costs a single check. Turn them on in code with
+`enable` and `start_profiler`, or in production without code changes with environment variables:
+- DUO_TOOL_METRICS=memory: keep the metrics in memory, see `snapshot`.
+- DUO_TOOL_METRICS=prometheus:/var/lib/node_exporter/duo_tool.prom: also write them in the Prometheus text format on
+  every `flush` and when the process exits. `{pid}` in the path is replaced by the process id, for process pools.
+- DUO_TOOL_PROFILE=/tmp/duo_tool.folded: sample the stacks of all threads every DUO_TOOL_PROFILE_INTERVAL seconds
+  (0.01 by default) and write them as folded stacks when the process exits, for flamegraph.pl or speedscope.
+
+Timers add up the calls and seconds per stage (e.g. aanloopfase, payment_phase), counters add up values per name and
+labels (e.g. rows, cache_hits).
+"""
+import atexit
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from pathlib import Path
+
+# The prefix of every metric in the Prometheus text format
+PREFIX = "duo_tool"
+
+_enabled = False
+_sinks = []
+_timers = {}
+_counters = {}
+_lock = threading.Lock()
+_NO_TIMER = nullcontext()
+
+
+class MemorySink:
+    """Keeps the last flushed snapshot, e.g. for tests or a metrics endpoint"""
+
+    def __init__(self):
+        self.last = None
+
+    def write(self, metrics: dict) -> None:
+        self.last = metrics
+
+
+class PrometheusFileSink:
+    """Writes the metrics in the Prometheus text format to a file, e.g. for the textfile collector of node_exporter"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: the file to write, `{pid}` is replaced by the process id
+        """
+        self.path = path
+
+    def write(self, metrics: dict) -> None:
+        """Replace the file in one step, so a scrape never reads half a file."""
+        path = Path(self.path.format(pid=os.getpid()))
+        temporary = path.with_name(f".{path.name}.tmp")
+        temporary.write_text(to_prometheus(metrics))
+        os.replace(temporary, path)
+
+
+def enable(*sinks) -> None:
+    """Start collecting metrics, which are written to the sinks on every `flush`."""
+    global _enabled
+    _sinks.extend(sinks)
+    _enabled = True
+
+
+def disable() -> None:
+    """Stop collecting metrics and remove the sinks, the collected metrics are kept until `reset`."""
+    global _enabled
+    _enabled = False
+    _sinks.clear()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    """Remove all collected metrics."""
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+class _Timer:
+    """Adds the seconds between entering and leaving to a stage"""
+
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        seconds = time.perf_counter() - self.start
+        with _lock:
+            calls, total, longest = _timers.get(self.stage, (0, 0.0, 0.0))
+            _timers[self.stage] = (calls + 1, total + seconds, max(longest, seconds))
+
+
+def timer(stage: str):
+    """Returns a context manager that times the code in it as `stage`, or does nothing when disabled."""
+    return _Timer(stage) if _enabled else _NO_TIMER
+
+
+def timed(stage: str):
+    """Decorator that times every call of the function as `stage`, see `timer`."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Timer(stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    """Add `value` to the counter with this name and labels, when enabled."""
+    if not _enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def snapshot() -> dict:
+    """
+    Returns the collected metrics.
+
+    Returns:
+        dict: the timers as {stage: {"calls", "seconds", "max_seconds"}}, and the counters as
+            {name: {labels: value}} with the labels as a tuple of (label, value) pairs.
+    """
+    with _lock:
+        timers = {
+            stage: {"calls": calls, "seconds": total, "max_seconds": longest}
+            for stage, (calls, total, longest) in _timers.items()
+        }
+        counters = {}
+        for (name, labels), value in _counters.items():
+            counters.setdefault(name, {})[labels] = value
+    return {"timers": timers, "counters": counters}
+
+
+def flush() -> dict:
+    """Write a snapshot of the metrics to every sink, and return it."""
+    metrics = snapshot()
+    for sink in _sinks:
+        sink.write(metrics)
+    return metrics
+
+
+def to_prometheus(metrics: dict) -> str:
+    """Format a snapshot in the Prometheus text format."""
+    lines = []
+    stages = sorted(metrics["timers"].items())
+    for metric, field, kind in [
+        ("stage_calls_total", "calls", "counter"),
+        ("stage_seconds_total", "seconds", "counter"),
+        ("stage_seconds_max", "max_seconds", "gauge"),
+    ]:
+        if stages:
+            lines.append(f"# TYPE {PREFIX}_{metric} {kind}")
+            lines += [f'{PREFIX}_{metric}{{stage="{stage}"}} {values[field]}' for stage, values in stages]
+
+    for name, values in sorted(metrics["counters"].items()):
+        lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+        for labels, value in sorted(values.items()):
+            text = ",".join(f'{label}="{label_value}"' for label, label_value in labels)
+            lines.append(f"{PREFIX}_{name}_total{{{text}}} {value}" if text else f"{PREFIX}_{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads from a background thread, cheap enough to leave on in production"""
+
+    def __init__(self, interval: float = 0.01):
+        """
+        Args:
+            interval: the seconds between samples
+        """
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="duo_tool-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        own_thread = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread, frame in sys._current_frames().items():
+                if thread == own_thread:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_code.co_name} ({Path(frame.f_code.co_filename).name}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        """The samples as folded stacks: the frames from the root separated by semicolons, and the count."""
+        return "".join(f"{stack} {samples}\n" for stack, samples in self.samples.most_common())
+
+    def write(self, path: str) -> None:
+        """Write the folded stacks to a file, `{pid}` in the path is replaced by the process id."""
+        Path(path.format(pid=os.getpid())).write_text(self.folded())
+
+
+def start_profiler(path: str, interval: float = 0.01) -> SamplingProfiler:
+    """Start a `SamplingProfiler` that writes its folded stacks to `path` when the process exits."""
+    profiler = SamplingProfiler(interval)
+    profiler.start()
+
+    def write() -> None:
+        profiler.stop()
+        profiler.write(path)
+
+    atexit.register(write)
+    return profiler
+
+
+def _configure_from_environment() -> None:
+    """Turn on the metrics and profiler as set in the environment variables, see the module docstring."""
+    metrics = os.environ.get("DUO_TOOL_METRICS")
+    if metrics == "memory":
+        enable(MemorySink())
+    elif metrics and metrics.startswith("prometheus:"):
+        enable(PrometheusFileSink(metrics.partition(":")[2]))
+        atexit.register(flush)
+    elif metrics:
+        raise ValueError(f"Unknown DUO_TOOL_METRICS {metrics!r}, use 'memory' or 'prometheus:<path>'")
+
+    profile = os.environ.get("DUO_TOOL_PROFILE")
+    if profile:
+        start_profiler(profile, float(os.environ.get("DUO_TOOL_PROFILE_INTERVAL", 0.01)))
+
+
+_configure_from_environment()
@@ -0,0 +1,183 @@
+"""
+This module inverts the loan calculation: from a target monthly payment back to the debt, term or interest rate.
+
+The forward calculation compounds the original debt during the aanloopfase and then applies the annuity formula, see
+`duo_tool.batch.get_inputs_batch`. Both steps are inverted in closed form for a first estimate, after which a bisection
+against the forward kernels takes the rounding to cents into account exactly. The interest rate has no closed form and
+is solved with Newton's method, falling back to bisection when a step leaves the bracket.
+
+The arguments are broadcast to one value per row like those of `duo_tool.batch.broadcast_inputs`, so a table of
+thousands of rows is one call.
+"""
+import numpy as np
+
+from duo_tool.kernels import annuity_factor, annuity_payment, compound_at, payment_after_aanloopfase
+
+
+def monthly_payment(years, original_debt, interest_perc, payment_offset) -> np.ndarray:
+    """The monthly payment of `get_inputs` per row, which the inverse functions solve for."""
+    interest_rate = np.array(interest_perc, dtype=np.float64, ndmin=1) / 100
+    return payment_after_aanloopfase(original_debt, interest_rate, payment_offset, 12 * np.array(years, ndmin=1))[1]
+
+
+def debt_for_payment(target_payment, years, interest_perc, payment_offset) -> np.ndarray:
+    """
+    Calculates the highest original debt with a monthly payment of at most `target_payment`.
+
+    Args:
+        target_payment: the highest acceptable monthly payment in euros
+        years: amount of years to pay back loan
+        interest_perc: the interest percentage
+        payment_offset: the number of months after the start date to start paying back the loan.
+
+    Returns:
+        np.ndarray: the highest original debt per row in euros, in whole cents
+    """
+    target_payment, years, interest_perc, payment_offset = np.broadcast_arrays(
+        np.array(target_payment, dtype=np.float64, ndmin=1),
+        np.array(years, dtype=np.int64, ndmin=1),
+        np.array(interest_perc, dtype=np.float64, ndmin=1),
+        np.array(payment_offset, dtype=np.int64, ndmin=1),
+    )
+    if (target_payment < 0).any():
+        raise ValueError("The monthly payment cannot be negative")
+    interest_rate = interest_perc / 100
+
+    # Every payment below half a cent above the target rounds to at most the target
+    growth = np.power(1 + interest_rate / 12, payment_offset - 1)
+    estimate = (target_payment + 0.005) / (annuity_factor(interest_rate, 12 * years) * growth)
+    cents = np.floor(estimate * 100).astype(np.int64)
+
+    # The estimate is within a few cents, so bisect between a debt that is too high and one that fits
+    def too_high(candidate: np.ndarray) -> np.ndarray:
+        return monthly_payment(years, candidate / 100, interest_perc, payment_offset) > target_payment
+
+    margin = np.maximum(cents // 10_000, 10)
+    low, high = np.maximum(cents - margin, -1), cents + margin
+    for _ in range(64):
+        low_fails, high_fails = too_high(low), ~too_high(high)
+        if not (low_fails.any() or high_fails.any()):
+            break
+        low = np.where(low_fails, np.maximum(low - 10 * margin, -1), low)
+        high = np.where(high_fails, high + 10 * margin, high)
+    return (_bisect(low, high, too_high) - 1) / 100
+
+
+def months_for_payment(target_payment, original_debt, interest_perc, payment_offset) -> np.ndarray:
+    """
+    Calculates the shortest payment phase with a monthly payment of at most `target_payment`.
+
+    The payment phase can be any number of months here, not only the 15 or 35 years of the regimes.
+    Args:
+        target_payment: the highest acceptable monthly payment in euros
+        original_debt: the original debt amount in euros
+        interest_perc: the interest percentage
+        payment_offset: the number of months after the start date to start paying back the loan.
+
+    Returns:
+        np.ndarray: the number of months per row, infinite if the payment does not even cover the monthly interest
+    """
+    target_payment, original_debt, interest_perc, payment_offset = np.broadcast_arrays(
+        np.array(target_payment, dtype=np.float64, ndmin=1),
+        np.array(original_debt, dtype=np.float64, ndmin=1),
+        np.array(interest_perc, dtype=np.float64, ndmin=1),
+        np.array(payment_offset, dtype=np.int64, ndmin=1),
+    )
+    i = interest_perc / 1200
+    debt = compound_at(original_debt, interest_perc / 100, payment_offset - 1)
+
+    # Solve payment = debt * i / (1 - (1 + i) ** -months) for the months, or payment = debt / months without interest
+    months = np.full(len(debt), np.inf)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covered = target_payment > debt * i
+        estimate = np.where(
+            i == 0, debt / target_payment, -np.log1p(-debt * i / target_payment) / np.log1p(np.where(i == 0, 1, i))
+        )
+    estimate = np.maximum(np.ceil(estimate[covered]), 1).astype(np.int64)
+
+    # The rounded payment can stay the same for many months around the estimate, so bisect on the months
+    def fits(candidate: np.ndarray) -> np.ndarray:
+        payment = annuity_payment(debt[covered], interest_perc[covered] / 100, candidate, numpy_round=True)
+        return payment <= target_payment[covered]
+
+    high = estimate
+    for _ in range(64):
+        too_short = ~fits(high)
+        if not too_short.any():
+            break
+        high = np.where(too_short, 2 * high, high)
+    months[covered] = _bisect(np.zeros_like(high), high, fits)
+    return months
+
+
+def rate_for_payment(target_payment, years, original_debt, payment_offset, tolerance: float = 1e-12) -> np.ndarray:
+    """
+    Calculates the interest percentage at which the monthly payment equals `target_payment`, before rounding to cents.
+
+    Any lower interest percentage gives a lower monthly payment, so this is the highest affordable percentage.
+    Args:
+        target_payment: the monthly payment in euros
+        years: amount of years to pay back loan
+        original_debt: the original debt amount in euros
+        payment_offset: the number of months after the start date to start paying back the loan.
+        tolerance: the precision of the monthly interest rate
+
+    Returns:
+        np.ndarray: the interest percentage per row, NaN if even 0% gives a higher payment
+    """
+    target_payment, months, original_debt, aanloop_months = np.broadcast_arrays(
+        np.array(target_payment, dtype=np.float64, ndmin=1),
+        12 * np.array(years, dtype=np.int64, ndmin=1),
+        np.array(original_debt, dtype=np.float64, ndmin=1),
+        np.array(payment_offset, dtype=np.int64, ndmin=1) - 1,
+    )
+
+    @np.errstate(divide="ignore", invalid="ignore")
+    def payment_and_slope(i: np.ndarray) -> tuple:
+        """The unrounded monthly payment at monthly rate i, and its derivative to i."""
+        # Near 0% the growth minus one loses its precision, expm1 keeps it
+        growth_minus_one = np.expm1(months * np.log1p(i))
+        growth = growth_minus_one + 1
+        payment = original_debt * np.power(1 + i, aanloop_months) * i * growth / growth_minus_one
+        slope = payment * ((aanloop_months + months) / (1 + i) + 1 / i - months * growth / ((1 + i) * growth_minus_one))
+        return payment, slope
+
+    # Bracket the monthly rate: the payment at 0% is debt / months and grows with the rate
+    affordable = target_payment >= original_debt / months
+    low = np.zeros(len(target_payment))
+    high = np.full(len(target_payment), 0.01)
+    for _ in range(60):
+        too_low = affordable & (payment_and_slope(high)[0] < target_payment)
+        if not too_low.any():
+            break
+        low[too_low] = high[too_low]
+        high[too_low] *= 2
+
+    # Newton's method within the bracket, bisecting when a step would leave it
+    i = (low + high) / 2
+    for _ in range(100):
+        payment, slope = payment_and_slope(i)
+        above = payment > target_payment
+        high = np.where(above, i, high)
+        low = np.where(above, low, i)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = i - (payment - target_payment) / slope
+        inside = (step > low) & (step < high)
+        updated = np.where(inside, step, (low + high) / 2)
+        converged = (np.abs(updated - i)[affordable] <= tolerance).all()
+        i = updated
+        if converged:
+            break
+
+    return np.where(affordable, i * 1200, np.nan)
+
+
+def _bisect(low: np.ndarray, high: np.ndarray, fits) -> np.ndarray:
+    """Returns the smallest integer above `low` for which `fits` holds, given that it holds for `high` and above."""
+    while (high - low > 1).any():
+        # Rows that are done evaluate `high` again, so no row evaluates a value outside its bracket
+        middle = np.where(high - low > 1, (low + high) // 2, high)
+        middle_fits = fits(middle)
+        high = np.where(middle_fits, middle, high)
+        low = np.where(middle_fits, low, middle)
+    return high
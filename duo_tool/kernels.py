@@ -0,0 +1,419 @@
+"""
+This module contains the array-based kernels behind the loan phases.
+
+All kernels work on a leading borrower axis and a trailing month axis, so a single schedule is simply a batch of one.
+The results match the scalar formulas in `duo_tool.calculations` exactly, including the cent rounding and the
+`max(0, ...)` clamp on the remaining debt. Every kernel that rounds takes a `numpy_round` flag, see `round_cents`.
+"""
+import functools
+
+import numpy as np
+
+# Scaled values this close to a half cent are rounded with the scalar formula, see `_round_cents`
+_TIE_TOLERANCE = 1e-13
+
+# From this many borrowers on, stepping through the months is faster than solving all months at once
+_SCAN_MIN_ROWS = 128
+
+# The factor tables cover 0 up to this many months, which fits every aanloopfase (at most 84 months) plus 35 years
+_TABLE_MONTHS = 512
+
+
+def _round_scalar(value: float, numpy_round: bool) -> float:
+    """Round a single value to cents, like the builtin round on a python float or a numpy float."""
+    return float(np.round(value, 2)) if numpy_round else round(value, 2)
+
+
+def _round_cents(values: np.ndarray) -> tuple:
+    """
+    Round to cents with numpy and flag the values that are too close to a half cent to trust the result.
+
+    Returns:
+        tuple: the rounded values and a boolean mask of the values that need to be rounded with the scalar formula.
+    """
+    scaled = values * 100
+    rounded = np.rint(scaled)
+
+    # Distance of the scaled value to the nearest half cent, compared against a tolerance relative to its size
+    distance = np.abs(scaled - rounded)
+    np.subtract(0.5, distance, out=distance)
+    np.abs(distance, out=distance)
+    tolerance = np.abs(scaled, out=scaled)
+    np.maximum(tolerance, 1.0, out=tolerance)
+    tolerance *= _TIE_TOLERANCE
+
+    rounded /= 100
+    return rounded, distance <= tolerance
+
+
+def round_cents(values, numpy_round: bool = False) -> np.ndarray:
+    """
+    Round an array to cents, giving exactly the same result as round(value, 2) per element.
+
+    The builtin `round(x, 2)` rounds differently depending on the type of `x`. A python float is rounded on its exact
+    decimal value, while a numpy float is multiplied by 100 and rounded to the nearest even integer. The phases hit
+    both, so this and every other kernel that rounds takes a `numpy_round` flag: the original calculation took the debt
+    after the aanloopfase from the last row of a dataframe, which made it a numpy float, and `get_inputs` keeps
+    rounding the payment phase like that. Callers pick the flag from the type of their debt.
+
+    Args:
+        values: the amounts in euros
+        numpy_round: round like numpy floats instead of python floats
+
+    Returns:
+        np.ndarray: the rounded amounts
+    """
+    values = np.array(values, dtype=np.float64, ndmin=1)
+    if numpy_round:
+        return np.rint(values * 100) / 100
+
+    rounded, suspect = _round_cents(values)
+    if suspect.any():
+        rounded[suspect] = [round(value, 2) for value in values[suspect].tolist()]
+    return rounded
+
+
+def compound(debt, interest_rate, months: int, numpy_round: bool = False) -> np.ndarray:
+    """
+    Calculates the monthly compounded debt during the aanloopfase, see `AanloopPhase._monthly_compound`.
+
+    Args:
+        debt: the debt per borrower in euros
+        interest_rate: the annual interest rate per borrower (as a decimal)
+        months: the number of months to calculate
+        numpy_round: round like numpy floats instead of python floats
+
+    Returns:
+        np.ndarray: the debt per borrower (rows) and month (columns)
+    """
+    debt = np.array(debt, dtype=np.float64, ndmin=1)[:, None]
+    monthly_i = np.array(interest_rate, dtype=np.float64, ndmin=1)[:, None] / 12
+    return _compound(debt, monthly_i, np.arange(months), numpy_round)
+
+
+def compound_at(debt, interest_rate, months_passed, numpy_round: bool = False) -> np.ndarray:
+    """
+    Calculates the compounded debt after a number of months per borrower, see `AanloopPhase._monthly_compound`.
+
+    Args:
+        debt: the debt per borrower in euros
+        interest_rate: the annual interest rate per borrower (as a decimal)
+        months_passed: the number of months passed per borrower
+        numpy_round: round like numpy floats instead of python floats
+
+    Returns:
+        np.ndarray: the compounded debt per borrower
+    """
+    debt = np.array(debt, dtype=np.float64, ndmin=1)
+    monthly_i = np.array(interest_rate, dtype=np.float64, ndmin=1) / 12
+    return _compound(debt, monthly_i, np.array(months_passed, ndmin=1), numpy_round)
+
+
+def _compound(debt: np.ndarray, monthly_i: np.ndarray, exponents: np.ndarray, numpy_round: bool) -> np.ndarray:
+    """Calculates round(debt * (1 + monthly_i) ** exponents, 2) element-wise."""
+    growth = _lookup(monthly_i, exponents, _GROWTH)
+    if growth is None:
+        growth = np.power(1 + monthly_i, exponents)
+    debt, base, exponents = np.broadcast_arrays(debt, 1 + monthly_i, exponents)
+    rounded, suspect = _round_cents(debt * growth)
+
+    # np.power is not guaranteed to equal pow to the last bit, so recompute these with the scalar formula
+    for idx in zip(*np.nonzero(suspect)):
+        value = float(debt[idx]) * pow(float(base[idx]), int(exponents[idx]))
+        rounded[idx] = _round_scalar(value, numpy_round)
+    return rounded
+
+
+def annuity_payment(debt, interest_rate, months, numpy_round: bool = False) -> np.ndarray:
+    """
+    Calculates the monthly payment of an amortized loan per borrower, see `PaymentPhase._monthly_payment`.
+
+    Args:
+        debt: the debt per borrower in euros
+        interest_rate: the annual interest rate per borrower (as a decimal)
+        months: the total duration in months per borrower
+        numpy_round: round like numpy floats instead of python floats
+
+    Returns:
+        np.ndarray: the monthly payment per borrower
+    """
+    debt, interest_rate, months = np.broadcast_arrays(
+        np.array(debt, dtype=np.float64, ndmin=1),
+        np.array(interest_rate, dtype=np.float64, ndmin=1),
+        np.array(months, dtype=np.float64, ndmin=1),
+    )
+    i = interest_rate / 12
+    payment = np.where(i == 0, debt / months, annuity_factor(interest_rate, months) * debt)
+
+    rounded, suspect = _round_cents(payment)
+    for idx in np.flatnonzero(suspect):
+        # Recompute these with the scalar formula, as np.power is not guaranteed to equal ** to the last bit
+        remaining_debt, monthly_i, n = float(debt[idx]), float(i[idx]), int(months[idx])
+        if monthly_i == 0:
+            value = remaining_debt / n
+        else:
+            value = ((1 + monthly_i) ** n * monthly_i) / ((1 + monthly_i) ** n - 1) * remaining_debt
+        rounded[idx] = _round_scalar(value, numpy_round)
+    return rounded
+
+
+def payment_after_aanloopfase(original_debt, interest_rate, payment_offset, months) -> tuple:
+    """
+    Calculates the debt after the aanloopfase and the monthly payment per borrower, exactly as `get_inputs` does.
+
+    Args:
+        original_debt: the original debt per borrower in euros
+        interest_rate: the annual interest rate per borrower (as a decimal)
+        payment_offset: the number of months after the start date to start paying back the loan, per borrower
+        months: the number of months of the payment phase per borrower
+
+    Returns:
+        tuple: the debt after the aanloopfase and the monthly payment per borrower
+    """
+    payment_offset = np.array(payment_offset, ndmin=1)
+    if (payment_offset < 1).any():
+        raise ValueError("The payment offset must be at least 1 month")
+
+    # The aanloopfase ends with the debt compounded for all but the last month, as in `AanloopPhase.calculate`
+    debt_after_aanloopfase = compound_at(original_debt, interest_rate, payment_offset - 1)
+
+    # That debt is a numpy float in `get_inputs`, so the payment is rounded like numpy, see the module docstring
+    payment = annuity_payment(debt_after_aanloopfase, interest_rate, months, numpy_round=True)
+    return debt_after_aanloopfase, payment
+
+
+def annuity_factor(interest_rate, months) -> np.ndarray:
+    """
+    Calculates the monthly payment per euro of debt, unrounded, see `PaymentPhase._monthly_payment`.
+
+    Args:
+        interest_rate: the annual interest rate (as a decimal)
+        months: the total duration in months
+
+    Returns:
+        np.ndarray: the monthly payment per euro of debt
+    """
+    i = np.array(interest_rate, dtype=np.float64, ndmin=1) / 12
+    months = np.array(months, dtype=np.float64, ndmin=1)
+    factor = _lookup(i, months, _FACTOR)
+    if factor is not None:
+        return np.broadcast_to(factor, np.broadcast_shapes(i.shape, months.shape)).copy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.power(1 + i, months)
+        return np.where(i == 0, 1 / months, (growth * i) / (growth - 1))
+
+
+# The columns of `_factor_tables`
+_GROWTH, _FACTOR = 0, 1
+
+
+@functools.lru_cache(maxsize=256)
+def _factor_tables(monthly_i: float) -> tuple:
+    """
+    The growth (1 + i) ** n and annuity factor for n = 0 up to `_TABLE_MONTHS` months, at one monthly interest rate.
+
+    DUO sets a handful of interest rates per year, so the tables are built once per rate and then shared by all loans.
+    They hold exactly the floats of the direct calculation, which keeps every result bit-identical.
+    """
+    months = np.arange(_TABLE_MONTHS, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.power(1 + monthly_i, months)
+        factor = np.where(monthly_i == 0, 1 / months, (growth * monthly_i) / (growth - 1))
+    growth.flags.writeable = False
+    factor.flags.writeable = False
+    return growth, factor
+
+
+def _lookup(monthly_i: np.ndarray, months: np.ndarray, column: int):
+    """
+    Look up the months in the factor table of the interest rate, if all borrowers share it.
+
+    Returns:
+        np.ndarray: the factors per month, or None if the rates differ or a month is not a whole number in the table.
+            Telling the distinct rates of a mixed batch apart costs more than calculating the factors directly.
+    """
+    rate = _single_value(monthly_i)
+    if rate is None or not np.isfinite(rate) or months.size == 0:
+        return None
+
+    # A single term is one lookup, e.g. the 420 months of every borrower in a batch
+    month = _single_value(months)
+    if month is not None:
+        index = np.array(month, ndmin=1)
+    elif months.dtype.kind in "iu":
+        index = months
+    else:
+        return None
+    if index.dtype.kind == "f":
+        if not (0 <= index[0] < _TABLE_MONTHS and index[0] % 1 == 0):
+            return None
+        index = index.astype(np.int64)
+    elif index.min() < 0 or index.max() >= _TABLE_MONTHS:
+        return None
+
+    factors = _factor_tables(float(rate))[column][index]
+    return np.broadcast_to(factors, months.shape) if month is not None else factors
+
+
+def _single_value(values: np.ndarray):
+    """Returns the value if every element equals it, else None."""
+    if values.size == 0:
+        return None
+    first = values.flat[0]
+    if values.size > 1 and any(values.strides) and not (values == first).all():
+        return None
+    return first
+
+
+def amortize(debt, payment, interest_rate, months: int, numpy_round: bool = False) -> tuple:
+    """
+    Calculate the amortization schedule per borrower, see `PaymentPhase._calculate_amortization`.
+
+    Every month the interest is rounded to cents before it is subtracted from the payment, which makes the schedule a
+    recurrence rather than a closed formula. Small batches are solved for all months at once (`_amortize_fixed_point`),
+    large batches step through the months with every step vectorized over the borrowers (`_amortize_scan`).
+
+    Args:
+        debt: the debt per borrower at the start of the payment phase
+        payment: the monthly payment per borrower, or per borrower and month
+        interest_rate: the annual interest rate per borrower (as a decimal)
+        months: the number of months to calculate
+        numpy_round: round like numpy floats instead of python floats
+
+    Returns:
+        tuple: the remaining debt, principal and interest arrays per borrower (rows) and month (columns)
+    """
+    debt = np.array(debt, dtype=np.float64, ndmin=1)[:, None]
+    monthly_interest_r = np.array(interest_rate, dtype=np.float64, ndmin=1)[:, None] / 12
+    payment = np.array(payment, dtype=np.float64)
+    if payment.ndim < 2:
+        payment = payment.reshape(-1, 1)
+    rows = np.broadcast_shapes(debt.shape, monthly_interest_r.shape, payment.shape[:1] + (1,))[0]
+    debt = np.broadcast_to(debt, (rows, 1))
+    monthly_interest_r = np.broadcast_to(monthly_interest_r, (rows, 1))
+    payment = np.broadcast_to(payment, (rows, months))
+
+    if rows < _SCAN_MIN_ROWS:
+        return _amortize_fixed_point(debt, payment, monthly_interest_r, numpy_round)
+    return _amortize_scan(debt, payment, monthly_interest_r, numpy_round)
+
+
+def truncate_at_payoff(debt, payment, remaining, principal, interest) -> tuple:
+    """
+    End every schedule in the month its debt is paid off, for schedules that pay more than the annuity payment.
+
+    `amortize` clamps the debt at zero but keeps charging the full payment. Here the last payment is lowered to what
+    was left of the debt plus the interest, and every later month is set to zero.
+
+    Args:
+        debt: the debt per borrower at the start of the schedule
+        payment: the monthly payment per borrower, or per borrower and month
+        remaining: the remaining debt per borrower and month, from `amortize`
+        principal: the principal per borrower and month, from `amortize`
+        interest: the interest per borrower and month, from `amortize`
+
+    Returns:
+        tuple: the number of months until the debt is paid off per borrower, and the payment and principal arrays
+    """
+    rows, months = remaining.shape
+    debt = np.broadcast_to(np.array(debt, dtype=np.float64, ndmin=1)[:, None], (rows, 1))
+    payment = np.array(payment, dtype=np.float64)
+    if payment.ndim < 2:
+        payment = payment.reshape(-1, 1)
+    payment = np.broadcast_to(payment, (rows, months))
+
+    # The clamp in `amortize` sets the debt to exactly zero, from the month it is paid off on
+    paid_off = remaining == 0
+    ends_early = paid_off.any(axis=1)
+    length = np.where(ends_early, np.argmax(paid_off, axis=1) + 1, months)
+
+    month = np.arange(months)
+    last = (month == length[:, None] - 1) & ends_early[:, None]
+    after = month >= length[:, None]
+    opening = np.concatenate([debt, remaining[:, :-1]], axis=1)
+
+    principal = np.where(last, opening, principal)
+    payment = np.where(last, round_cents(opening + interest), payment)
+    principal[after] = 0.0
+    payment[after] = 0.0
+    return length, payment, principal
+
+
+def _amortize_fixed_point(
+    debt: np.ndarray, payment: np.ndarray, monthly_interest_r: np.ndarray, numpy_round: bool
+) -> tuple:
+    """
+    Solve the amortization recurrence for all months at once.
+
+    We iterate on the whole interest column: derive the principal and remaining debt from a guess of the interest,
+    recompute the interest from that debt and repeat until nothing changes. Each pass fixes at least one more month, and
+    starting from the closed-form schedule it converges within a handful of passes.
+    """
+    rows, months = payment.shape
+
+    # Start from the unrounded closed-form schedule
+    growth = _lookup(monthly_interest_r, np.arange(months), _GROWTH)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        if growth is None:
+            growth = np.power(1 + monthly_interest_r, np.arange(months))
+        guess = np.where(monthly_interest_r == 0, 0.0, debt * growth * monthly_interest_r - payment * (growth - 1))
+    interest = round_cents(np.nan_to_num(guess), numpy_round)
+    principal = np.empty((rows, months))
+    remaining = np.empty((rows, months))
+
+    # Only the borrowers whose interest changed are recalculated, and only from the first month that changed
+    active = slice(None)
+    start = 0
+    for _ in range(months + 1):
+        opening = debt[active] if start == 0 else remaining[active, start - 1][:, None]
+        block_interest = interest[active, start:]
+        block_principal = round_cents(payment[active, start:] - block_interest, numpy_round)
+        block_remaining = _remaining_debt(opening, block_principal)
+        previous = np.concatenate([opening, block_remaining[:, :-1]], axis=1)
+        updated = round_cents(previous * monthly_interest_r[active], numpy_round)
+
+        changed = updated != block_interest
+        principal[active, start:] = block_principal
+        remaining[active, start:] = block_remaining
+        interest[active, start:] = updated
+
+        changed_rows = changed.any(axis=1)
+        if not changed_rows.any():
+            break
+        if not changed_rows.all():
+            changed = changed[changed_rows]
+            active = np.flatnonzero(changed_rows) if isinstance(active, slice) else active[changed_rows]
+        start += int(np.argmax(changed.any(axis=0)))
+
+    return remaining, principal, interest
+
+
+def _amortize_scan(debt: np.ndarray, payment: np.ndarray, monthly_interest_r: np.ndarray, numpy_round: bool) -> tuple:
+    """Step through the months, calculating each month for all borrowers at once."""
+    rows, months = payment.shape
+    remaining_balance = debt[:, 0].copy()
+    monthly_interest_r = monthly_interest_r[:, 0]
+
+    # Fill month-major arrays so every step writes a contiguous row
+    remaining = np.empty((months, rows))
+    principal = np.empty((months, rows))
+    interest = np.empty((months, rows))
+    for month in range(months):
+        interest[month] = round_cents(remaining_balance * monthly_interest_r, numpy_round)
+        principal[month] = round_cents(payment[:, month] - interest[month], numpy_round)
+        remaining_balance -= principal[month]
+        np.maximum(remaining_balance, 0.0, out=remaining_balance)
+        remaining[month] = remaining_balance
+
+    return remaining.T, principal.T, interest.T
+
+
+def _remaining_debt(debt: np.ndarray, principal: np.ndarray) -> np.ndarray:
+    """Subtract the principal payments from the debt month by month and clamp the debt at zero once it is paid off."""
+    # Accumulating the negated payments gives exactly the same floats as subtracting them one at a time
+    remaining = np.cumsum(np.concatenate([debt, -principal], axis=1), axis=1)[:, 1:]
+
+    # Once the debt drops below zero it is clamped, after which it stays at zero for the rest of the schedule
+    paid_off = np.logical_or.accumulate(remaining < 0, axis=1)
+    remaining[paid_off] = 0.0
+    return remaining
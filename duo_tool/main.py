@@ -5,7 +5,9 @@ import streamlit as st
 from loguru import logger
 from utils import check_amount_format, check_date_format
 
-from duo_tool.inputs import get_inputs, one_time_payment
+from duo_tool.inputs import get_inputs
+from duo_tool.pipeline import loan_pipeline
+from duo_tool.schedule import to_ordinal
 
 
 def option_custom_payment_date() -> pd.Timestamp:
@@ -59,6 +61,15 @@ def option_one_time_payment(start_date: pd.Timestamp, original_debt: int) -> Tup
     return payment_date, payment_amount
 
 
+@st.cache_resource
+def warm_up() -> None:
+    """
+    Calculate one loan once per server process, so the first submission does not wait for the lazily imported modules
+    and the factor tables of the kernels. Uses `get_inputs` directly to keep it out of the cache statistics.
+    """
+    get_inputs(35, pd.Timestamp("2024-01-01"), 10_000, 2.56, 24)
+
+
 def advanced_options():
     with st.expander("Klik hier voor de uitgebreide opties", expanded=False):
         st.write("**6. Veranderende rente**")
@@ -100,7 +111,7 @@ def app() -> None:
             "Type datum als maand-jaar, bijvoorbeeld 01-2024 ",
             value="01-2024",
         )
-        logger.info(f"{start_date}")
+        logger.info("{}", start_date)
         start_date = check_date_format(start_date)
 
         # Terugbetalingsregels
@@ -145,10 +156,10 @@ def app() -> None:
         # Check the custom_payment_date value to determine offset
         payment_offset = 24  # This is the standard 2 years from the aanloopfase
         if custom_payment_date:
-            delta = custom_payment_date.to_period("M") - start_date.to_period("M")
+            delta = to_ordinal(custom_payment_date) - to_ordinal(start_date)
 
             # Check the value for correctness
-            if delta.n <= 0 or delta.n > 84:
+            if delta <= 0 or delta > 84:
                 st.error(
                     """
                     De datum moet minstens 1 maand na het begin van de afloopfase zijn, en niet later dan 60 maanden na
@@ -158,8 +169,8 @@ def app() -> None:
                 raise ValueError("Wrong customer date")
 
             else:  # override the payment offset
-                payment_offset = delta.n
-        logger.info(f"Payment offset = {payment_offset} months.")
+                payment_offset = delta
+        logger.info("Payment offset = {} months.", payment_offset)
 
         # One time payment
         one_time_payment_date, one_time_payment_amount = option_one_time_payment(start_date, original_debt)
@@ -167,22 +178,23 @@ def app() -> None:
         # Upon submit
         submitted = st.form_submit_button("Klik om te berekenen..")
         if submitted:
-            inputs = get_inputs(years, start_date, original_debt, initial_interest, payment_offset)
-
-            # IF there is a one time payment we have to split up and override the inputs
-            if one_time_payment_date and one_time_payment_amount:
-                logger.info("One time payment > recalculating inputs")
-                inputs = one_time_payment(
-                    inputs=inputs,
-                    payment_amount=one_time_payment_amount,
-                    payment_date=one_time_payment_date,
-                    interest_perc=initial_interest,
-                    years=years,
-                    start_date=start_date,
-                    original_debt=original_debt,
-                    payment_offset=payment_offset,
-                    current_monthly_payment=inputs["monthly_payment"],
-                )
+            # Every session keeps its own pipeline, which only recalculates the phases that depend on changed fields
+            if "pipeline" not in st.session_state:
+                st.session_state.pipeline = loan_pipeline()
+            pipeline = st.session_state.pipeline
+            pipeline.update(
+                years=years,
+                start_date=start_date,
+                original_debt=original_debt,
+                interest_perc=initial_interest,
+                payment_offset=payment_offset,
+                payment_date=one_time_payment_date,
+                payment_amount=one_time_payment_amount,
+            )
+            inputs = pipeline.get("outputs")
+
+            # Only the rendering needs dates and a dataframe
+            debt_over_time = inputs["debt_over_time"].to_pandas()
 
             c1, c2, c3 = st.columns(3)
             with c1:
@@ -202,20 +214,19 @@ def app() -> None:
                 )
 
             with c3:
-                st.metric(
-                    label="**Schuld afgelost op:**", value=inputs["debt_over_time"]["month"].iloc[-1].strftime("%m-%Y")
-                )
+                st.metric(label="**Schuld afgelost op:**", value=debt_over_time["month"].iloc[-1].strftime("%m-%Y"))
 
             st.write("**Schuld door de tijd:**")
-            st.line_chart(
-                inputs["debt_over_time"].rename(columns={"debt": "Schuld", "month": "Jaar"}), x="Jaar", y="Schuld"
-            )
+            st.line_chart(debt_over_time.rename(columns={"debt": "Schuld", "month": "Jaar"}), x="Jaar", y="Schuld")
 
     # Add call for contributions
     github_url = "https://github.com/jarnos97/duo_tool"
     st.write("#")
     st.write("Bijdragen aan dit project? Zie [Github](%s)" % github_url)
 
+    # The page is already shown, so warming up does not delay the first render
+    warm_up()
+
 
 # Desired features:
 # [check] Determine monthly payment
@@ -0,0 +1,207 @@
+"""
+This module answers questions about a one time extra payment (lump sum) without recalculating the loan per attempt.
+
+After an extra payment the `ScheduleEngine` recalculates the monthly payment for the remaining debt and months, and the
+payments before it do not change. So the outcome of an extra payment in any month only needs the schedule without extra
+payments, the debt at the start of the payment phase after the extra payment and one annuity formula. This module
+evaluates every candidate month at once with the kernels, and searches the amount with a bisection over whole cents
+that runs for all months at once. The results equal those of `ScheduleEngine.calculate` with that one extra payment.
+"""
+import numpy as np
+import pandas as pd
+from pandas import Timestamp
+
+from duo_tool.events import ScheduleEngine
+from duo_tool.kernels import annuity_payment, compound_at, round_cents
+from duo_tool.schedule import to_datetime64, to_ordinal, to_timestamp
+
+
+class LumpSumOptimizer:
+    """Class to find the size and month of a one time extra payment for a loan"""
+
+    def __init__(
+        self, years: int, start_date: Timestamp, original_debt: float, interest_perc: float, payment_offset: int
+    ):
+        """
+        Args:
+            years: amount of years to pay back loan
+            start_date: the start date of the aanloopfase
+            original_debt: the original debt amount in euros
+            interest_perc: the interest percentage
+            payment_offset: the number of months after the start date to start paying back the loan.
+        """
+        self.original_debt = original_debt
+        self.interest_rate = interest_perc / 100
+        self.payment_offset = payment_offset
+        self.months = payment_offset + 12 * years
+
+        # The schedule without extra payments, which every extra payment starts from
+        outputs = ScheduleEngine(years, start_date, original_debt, interest_perc, payment_offset).calculate([])
+        self.schedule = outputs["debt_over_time"]
+        self.monthly_payment = outputs["monthly_payment"]
+        self.total_interest_paid = outputs["total_interest_paid"]
+        self._first_month = to_ordinal(start_date)
+
+    def evaluate(self, payment_date, amount) -> dict:
+        """
+        Calculate the outcome of an extra payment, for many months and/or amounts at once.
+
+        Args:
+            payment_date: the month of the extra payment, or an array of months
+            amount: the extra payment in euros, or an array of amounts
+
+        Returns:
+            dict: the monthly payment after the extra payment, the interest paid and the month of the last payment,
+                per month and amount.
+        """
+        rows, amount = np.broadcast_arrays(self._rows(payment_date), np.array(amount, dtype=np.float64, ndmin=1))
+        if (amount > self.schedule.debt[rows]).any():
+            raise ValueError("The extra payment cannot be higher than the debt in that month")
+        return self._evaluate(rows, amount, totals=True)
+
+    def amount_for_payment(
+        self, target_payment: float, first_date: Timestamp = None, last_date: Timestamp = None
+    ) -> dict:
+        """
+        Find the smallest extra payment that brings the monthly payment to at most `target_payment`.
+
+        By default the candidates are the months before the first payment, so the monthly payment stays below the
+        target for the whole payment phase. Later months need a smaller amount, as fewer payments are left to lower,
+        but the current monthly payment is paid until then. An extra payment of the whole remaining debt always works,
+        as it ends the loan.
+        Args:
+            target_payment: the highest acceptable monthly payment in euros
+            first_date: the first month to consider for the extra payment, by default the start date
+            last_date: the last month to consider for the extra payment, by default the month before the first payment
+
+        Returns:
+            dict: the month and amount of the smallest extra payment with the monthly payment and interest paid after
+                it, and the smallest amount for every candidate month.
+        """
+        if target_payment < 0:
+            raise ValueError("The monthly payment cannot be negative")
+        last_row = self.payment_offset - 1 if last_date is None else None
+        rows = self._candidates(first_date, last_date, last_row)
+        debt = self.schedule.debt[rows]
+
+        # The monthly payment only goes down with a higher amount, so bisect on whole cents for all months at once
+        low = np.full(len(rows), -1)
+        high = np.rint(debt * 100).astype(np.int64)
+        while (high - low > 1).any():
+            middle = (low + high) // 2
+            fits = self._evaluate(rows, np.minimum(middle / 100, debt))["monthly_payment"] <= target_payment
+            high = np.where(fits, middle, high)
+            low = np.where(fits, low, middle)
+
+        return self._best(rows, np.minimum(high / 100, debt))
+
+    def best_month(self, amount: float, first_date: Timestamp = None, last_date: Timestamp = None) -> dict:
+        """
+        Find the month in which an extra payment of `amount` saves the most interest.
+
+        Args:
+            amount: the extra payment in euros
+            first_date: the first month to consider, by default the start date
+            last_date: the last month to consider, by default the month before the last payment
+
+        Returns:
+            dict: the best month with the monthly payment and interest paid after the extra payment, and the interest
+                paid for every candidate month. Months in which the debt is lower than the amount are left out.
+        """
+        rows = self._candidates(first_date, last_date)
+        rows = rows[self.schedule.debt[rows] >= amount]
+        if not len(rows):
+            raise ValueError("The extra payment is higher than the debt in every month")
+        return self._best(rows, np.full(len(rows), float(amount)), by_interest=True)
+
+    def amount_to_finish_by(self, last_date: Timestamp) -> dict:
+        """
+        Find the smallest extra payment that ends the loan in or before `last_date`.
+
+        A smaller extra payment lowers the monthly payment but keeps the term, so the loan only ends early when the
+        extra payment is the whole remaining debt of that month.
+        Args:
+            last_date: the month the loan should be paid off
+
+        Returns:
+            dict: the month and amount of the smallest extra payment, the interest paid with it, and the amount for
+                every candidate month.
+        """
+        rows = self._candidates(last_date=last_date, last_row=self.months - 1)
+        return self._best(rows, self.schedule.debt[rows].copy())
+
+    def _rows(self, payment_date) -> np.ndarray:
+        """Convert one or more dates to rows of the schedule."""
+        months = pd.to_datetime(np.atleast_1d(payment_date)).values.astype("datetime64[M]")
+        rows = (months - to_datetime64(self._first_month)).astype(np.int64)
+        if ((rows < 0) | (rows >= self.months)).any():
+            raise ValueError("De extra aflossing moet binnen de looptijd van de lening vallen")
+        return rows
+
+    def _candidates(self, first_date: Timestamp = None, last_date: Timestamp = None, last_row: int = None):
+        """The rows from `first_date` up to and including `last_date`, by default all but the last month."""
+        first = 0 if first_date is None else int(self._rows(first_date)[0])
+        last = self.months - 2 if last_row is None else last_row
+        if last_date is not None:
+            last = min(last, int(self._rows(last_date)[0]))
+        if last < first:
+            raise ValueError("There are no months to choose from")
+        return np.arange(first, last + 1)
+
+    def _evaluate(self, rows: np.ndarray, amount: np.ndarray, totals: bool = False) -> dict:
+        """The outcome per extra payment, with the interest paid and last payment only if `totals`."""
+        debt = self.schedule.debt[rows] - amount
+        paid_off = debt == 0
+
+        # In the aanloopfase the debt compounds until the payment phase, starting with one month of interest
+        opening = debt.copy()
+        aanloopfase = rows < self.payment_offset - 1
+        opening[aanloopfase] = round_cents(debt[aanloopfase] * (1 + self.interest_rate / 12), numpy_round=True)
+        opening[aanloopfase] = compound_at(
+            opening[aanloopfase], self.interest_rate, self.payment_offset - rows[aanloopfase] - 2, numpy_round=True
+        )
+
+        # The monthly payment is recalculated for the months left after the extra payment
+        months_left = self.months - np.maximum(rows + 1, self.payment_offset)
+        payment = np.full(len(rows), self.monthly_payment)
+        recalculate = months_left > 0
+        payment[recalculate] = annuity_payment(
+            opening[recalculate], self.interest_rate, months_left[recalculate], numpy_round=True
+        )
+        payment[paid_off] = 0.0
+
+        outputs = {"monthly_payment": payment}
+        if totals:
+            outputs["total_interest_paid"] = self._interest_paid(rows, amount, payment, paid_off)
+            end = np.where(paid_off, rows, self.months - 1) + self._first_month
+            outputs["last_payment_month"] = to_datetime64(end)
+        return outputs
+
+    def _interest_paid(self, rows: np.ndarray, amount: np.ndarray, payment: np.ndarray, paid_off: np.ndarray):
+        """Sum the payments per extra payment like `ScheduleEngine.calculate`, to get the same rounding."""
+        # Up to the extra payment the payments do not change, after it the payment phase pays the new monthly payment
+        month = np.arange(self.months)
+        after = np.where(month < self.payment_offset, 0.0, payment[:, None])
+        payments = np.where(month <= rows[:, None], self.schedule.payment, after)
+        payments[np.arange(len(rows)), rows] += amount
+        total = payments.sum(axis=1)
+
+        # A paid off schedule ends with the extra payment, and summing fewer values can round differently
+        for idx in np.flatnonzero(paid_off):
+            total[idx] = payments[idx, : rows[idx] + 1].sum()
+        return round_cents(total - self.original_debt, numpy_round=True)
+
+    def _best(self, rows: np.ndarray, amounts: np.ndarray, by_interest: bool = False) -> dict:
+        """Gather the outcome of every candidate and pick the smallest amount or, `by_interest`, the least interest."""
+        outcome = self._evaluate(rows, amounts, totals=True)
+        best = int(np.argmin(outcome["total_interest_paid"] if by_interest else amounts))
+        return {
+            "payment_date": to_timestamp(self._first_month + rows[best]),
+            "amount": float(amounts[best]),
+            "monthly_payment": float(outcome["monthly_payment"][best]),
+            "total_interest_paid": float(outcome["total_interest_paid"][best]),
+            "last_payment_month": pd.Timestamp(outcome["last_payment_month"][best]),
+            "months": to_datetime64(self._first_month + rows),
+            "amounts": amounts,
+            "total_interest_paid_per_month": outcome["total_interest_paid"],
+        }
@@ -0,0 +1,196 @@
+"""
+This module calculates a loan as a small graph of phases, so interactive what-if edits only recalculate what changed.
+
+Every node is a step of the calculation, e.g. the aanloopfase or the payment phase, and names the inputs and earlier
+nodes it depends on. A node keeps its recent results by the values of the inputs it depends on, directly or through
+other nodes, so after an edit only the nodes downstream of the changed inputs are recalculated:
+- changing the years reuses the aanloopfase, which only depends on the start date, interest, debt and payment offset;
+- changing the extra payment reuses both phases, and continues the `ScheduleEngine` of the loan from the earliest
+  changed month instead of starting over.
+
+The results of `get_inputs` and `one_time_payment` go through the caches of `duo_tool.cache`, which are shared by all
+sessions and, with DUO_TOOL_STORE, by all processes. The phases are only calculated when those caches miss.
+
+A pipeline keeps state between calculations, so every Streamlit session has its own.
+"""
+from __future__ import annotations
+
+import functools
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable
+
+from loguru import logger
+
+from duo_tool.cache import cached_get_inputs, cached_one_time_payment
+from duo_tool.calculations import AanloopPhase, PaymentPhase
+from duo_tool.events import ScheduleEngine
+from duo_tool.inputs import combine_phases
+from duo_tool.instrumentation import count
+from duo_tool.schedule import to_ordinal, to_timestamp
+
+if TYPE_CHECKING:
+    from pandas import Timestamp
+
+
+class Pipeline:
+    """A graph of nodes calculated from named inputs, keeping the recent results of every node"""
+
+    def __init__(self, maxsize: int = 8):
+        """
+        Args:
+            maxsize: the number of results to keep per node, e.g. to switch back and forth between 15 and 35 years
+        """
+        self.maxsize = maxsize
+        self.inputs = {}
+        self._nodes = {}
+        self._depends_on = {}
+        self._results = {}
+
+    def add(self, name: str, func: Callable, *dependencies: str, lazy: tuple = ()) -> None:
+        """
+        Add a node that calls `func` with the values of its dependencies as keyword arguments.
+
+        Args:
+            name: the name of the node
+            func: the calculation of the node
+            dependencies: the names of inputs and of nodes that were added before
+            lazy: the names of nodes that are passed as a function returning their result, so they are only
+                calculated if `func` needs them
+        """
+        if name in self._nodes:
+            raise ValueError(f"The pipeline already has a node {name!r}")
+        inputs = set()
+        for dependency in dependencies + tuple(lazy):
+            inputs.update(self._depends_on.get(dependency, (dependency,)))
+        self._nodes[name] = (func, dependencies, tuple(lazy))
+        self._depends_on[name] = tuple(sorted(inputs))
+        self._results[name] = OrderedDict()
+
+    def update(self, **inputs) -> list:
+        """
+        Set the values of inputs, which must be hashable.
+
+        Returns:
+            list: the nodes that depend on a changed input, and are recalculated unless a recent result matches
+        """
+        changed = {name for name, value in inputs.items() if name not in self.inputs or self.inputs[name] != value}
+        self.inputs.update(inputs)
+        return [name for name, depends_on in self._depends_on.items() if changed.intersection(depends_on)]
+
+    def get(self, name: str):
+        """Returns the result of a node, calculating it and the nodes it depends on if needed."""
+        missing = [input_name for input_name in self._depends_on[name] if input_name not in self.inputs]
+        if missing:
+            raise ValueError(f"The node {name!r} needs the inputs {missing}")
+
+        key = tuple(self.inputs[input_name] for input_name in self._depends_on[name])
+        results = self._results[name]
+        if key in results:
+            results.move_to_end(key)
+            count("pipeline_hits", node=name)
+            return results[key]
+        count("pipeline_misses", node=name)
+
+        # Errors are not kept, so the next call tries again
+        func, dependencies, lazy = self._nodes[name]
+        arguments = {
+            dependency: self.get(dependency) if dependency in self._nodes else self.inputs[dependency]
+            for dependency in dependencies
+        }
+        arguments.update({node: functools.partial(self.get, node) for node in lazy})
+        result = func(**arguments)
+
+        results[key] = result
+        while len(results) > self.maxsize:
+            results.popitem(last=False)
+        return result
+
+    def clear(self) -> None:
+        """Remove the results of all nodes, the inputs are kept."""
+        for results in self._results.values():
+            results.clear()
+
+
+def _aanloopfase(start_date: Timestamp, interest_perc: float, original_debt: int, payment_offset: int) -> tuple:
+    """Returns the schedule of the aanloopfase and the debt after it."""
+    aanloopfase = AanloopPhase(start_date, interest_perc / 100, original_debt, payment_offset)
+    schedule = aanloopfase.calculate()
+    return schedule, aanloopfase.final_debt
+
+
+def _payment_phase(
+    aanloopfase: tuple, start_date: Timestamp, interest_perc: float, payment_offset: int, years: int
+) -> tuple:
+    """Returns the schedule of the payment phase and the monthly payment."""
+    first_payment_date = to_timestamp(to_ordinal(start_date) + payment_offset)
+    payment_phase = PaymentPhase(first_payment_date, interest_perc / 100, aanloopfase[1], 12 * years)
+    schedule = payment_phase.calculate()
+    return schedule, payment_phase.payment
+
+
+def _inputs(
+    years: int,
+    start_date: Timestamp,
+    original_debt: int,
+    interest_perc: float,
+    payment_offset: int,
+    aanloopfase: Callable,
+    payment_phase: Callable,
+) -> dict:
+    """The outputs of `get_inputs` from the shared cache, or combined from the phases of this pipeline."""
+
+    def combine() -> dict:
+        schedule, payment = payment_phase()
+        return combine_phases(aanloopfase()[0], schedule, original_debt, payment)
+
+    return cached_get_inputs(years, start_date, original_debt, interest_perc, payment_offset, compute=combine)
+
+
+def _outputs(
+    inputs: dict,
+    engine: ScheduleEngine,
+    payment_date: Timestamp,
+    payment_amount: int,
+    interest_perc: float,
+    years: int,
+    start_date: Timestamp,
+    original_debt: int,
+    payment_offset: int,
+) -> dict:
+    """The outputs of `get_inputs`, or of `one_time_payment` from the shared cache if there is a one time payment."""
+    if not (payment_date and payment_amount):
+        return inputs
+
+    logger.info("One time payment > recalculating inputs")
+    return cached_one_time_payment(
+        inputs=None,
+        payment_amount=payment_amount,
+        payment_date=payment_date,
+        interest_perc=interest_perc,
+        years=years,
+        start_date=start_date,
+        original_debt=original_debt,
+        payment_offset=payment_offset,
+        current_monthly_payment=inputs["monthly_payment"],
+        engine=engine,
+    )
+
+
+def loan_pipeline(maxsize: int = 8) -> Pipeline:
+    """
+    Returns the pipeline of a loan with an optional one time payment, see `get_inputs` and `one_time_payment`.
+
+    Its inputs are years, start_date, original_debt, interest_perc, payment_offset, payment_date and payment_amount,
+    and the "outputs" node gives the same results as `cached_get_inputs` and `cached_one_time_payment` in `main.app`.
+    """
+    loan = ("years", "start_date", "original_debt", "interest_perc", "payment_offset")
+
+    pipeline = Pipeline(maxsize)
+    pipeline.add("aanloopfase", _aanloopfase, "start_date", "interest_perc", "original_debt", "payment_offset")
+    pipeline.add(
+        "payment_phase", _payment_phase, "aanloopfase", "start_date", "interest_perc", "payment_offset", "years"
+    )
+    pipeline.add("inputs", _inputs, *loan, lazy=("aanloopfase", "payment_phase"))
+    pipeline.add("engine", ScheduleEngine, *loan)
+    pipeline.add("outputs", _outputs, "inputs", "engine", "payment_date", "payment_amount", *loan)
+    return pipeline
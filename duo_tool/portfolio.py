@@ -0,0 +1,181 @@
+"""
+This module projects the cash flows of a whole portfolio of borrowers per calendar month, e.g. for treasury planning.
+
+Every borrower's schedule is placed on a shared month axis by its start date, and the payments, interest, principal and
+outstanding debt are summed per month. The borrowers are calculated in chunks with `get_inputs_batch` and every chunk
+is reduced to its sums right away, so the memory use depends on the chunk size and the number of months, not on the
+number of borrowers.
+
+The sums are kept in whole cents as integers, so partial results can be merged in any order with exactly the same
+outcome. That allows chunks to be calculated in parallel processes and merged as they finish.
+"""
+import numpy as np
+import pandas as pd
+
+from duo_tool.batch import get_inputs_batch, iter_input_chunks, map_chunks
+from duo_tool.schedule import COLUMNS, Schedule, to_datetime64
+
+
+class Projection:
+    """The summed schedules of many borrowers per calendar month, in cents"""
+
+    __slots__ = ("first_month", "borrowers", "debt", "payment", "principal", "interest")
+
+    def __init__(
+        self,
+        first_month: int,
+        borrowers: np.ndarray,
+        debt: np.ndarray,
+        payment: np.ndarray,
+        principal: np.ndarray,
+        interest: np.ndarray,
+    ):
+        """
+        Args:
+            first_month: the month ordinal of the first month, see `duo_tool.schedule.to_ordinal`
+            borrowers: the number of borrowers with a schedule in every month
+            debt: the total outstanding debt at the end of every month in cents
+            payment: the total payments of every month in cents
+            principal: the total principal of every month in cents
+            interest: the total interest of every month in cents
+        """
+        self.first_month = first_month
+        self.borrowers = borrowers
+        self.debt = debt
+        self.payment = payment
+        self.principal = principal
+        self.interest = interest
+
+    @classmethod
+    def zeros(cls, first_month: int = 0, months: int = 0) -> "Projection":
+        """A projection of `months` months from the `first_month` ordinal on without any borrowers."""
+        return cls(first_month, *(np.zeros(months, dtype=np.int64) for _ in ("borrowers",) + COLUMNS))
+
+    @classmethod
+    def from_schedule(cls, schedule: Schedule) -> "Projection":
+        """The projection of a single schedule, e.g. of a loan with extra payments from the `ScheduleEngine`."""
+        if not len(schedule):
+            return cls.zeros()
+        columns = (np.rint(getattr(schedule, column) * 100).astype(np.int64) for column in COLUMNS)
+        return cls(int(schedule.month[0]), np.ones(len(schedule), dtype=np.int64), *columns)
+
+    @classmethod
+    def combine(cls, projections: list) -> "Projection":
+        """Sum projections, aligning them on their months. Gives the same result in any order."""
+        projections = [projection for projection in projections if len(projection)]
+        if not projections:
+            return cls.zeros()
+        first = min(projection.first_month for projection in projections)
+        stop = max(projection.first_month + len(projection) for projection in projections)
+        result = cls.zeros(first, stop - first)
+        for projection in projections:
+            start = projection.first_month - first
+            stop = start + len(projection)
+            for column in ("borrowers",) + COLUMNS:
+                getattr(result, column)[start:stop] += getattr(projection, column)
+        return result
+
+    def merge(self, other: "Projection") -> "Projection":
+        """Returns the sum of this and another projection."""
+        return Projection.combine([self, other])
+
+    @property
+    def month(self) -> np.ndarray:
+        """The month ordinals."""
+        return np.arange(self.first_month, self.first_month + len(self))
+
+    def __len__(self) -> int:
+        return len(self.borrowers)
+
+    def __repr__(self) -> str:
+        if not len(self):
+            return "Projection(0 months)"
+        return f"Projection({len(self)} months, {int(self.borrowers.max())} borrowers at most)"
+
+    def to_pandas(self) -> pd.DataFrame:
+        """Returns the projection as a dataframe in euros, with the first day of every month as a timestamp."""
+        month = to_datetime64(self.month).astype("datetime64[ns]")
+        euros = {column: getattr(self, column) / 100 for column in COLUMNS}
+        return pd.DataFrame({"month": month, "borrowers": self.borrowers, **euros})
+
+
+def project_chunk(years, start_month, original_debt, interest_perc, payment_offset) -> Projection:
+    """
+    Calculate the schedules of a chunk of borrowers and sum them per calendar month.
+
+    Args:
+        years: amount of years to pay back loan
+        start_month: the start of the aanloopfase per borrower as datetime64[M]
+        original_debt: the original debt amount in euros
+        interest_perc: the interest percentage
+        payment_offset: the number of months after the start date to start paying back the loan.
+
+    Returns:
+        Projection: the sums of the chunk
+    """
+    start_month = np.atleast_1d(np.asarray(start_month, dtype="datetime64[M]"))
+    schedule = get_inputs_batch(years, start_month, original_debt, interest_perc, payment_offset, schedule=True)
+    schedule = schedule["debt_over_time"]
+
+    # Borrowers with the same start month share their position on the month axis, so they are summed as a group
+    start = np.broadcast_to(start_month, schedule["length"].shape).astype(np.int64)
+    order = np.argsort(start, kind="stable")
+    start, length = start[order], schedule["length"][order]
+    groups = np.flatnonzero(np.concatenate([[True], start[1:] != start[:-1]]))
+    width = schedule["debt"].shape[1]
+    first = int(start[0])
+    months = int((start + length).max()) - first
+
+    # Every amount is a whole number of cents, which is summed as an integer so the sums are exact for any chunk size.
+    # The padding after the last payment is NaN, which counts as zero.
+    padding = np.arange(width) >= length[:, None]
+    sums = [_active(length, groups, width)]
+    for column in COLUMNS:
+        values = schedule[column][order]
+        np.copyto(values, 0.0, where=padding)
+        sums.append(np.add.reduceat(np.rint(values * 100).astype(np.int64), groups, axis=0))
+
+    # Shift the sums of every start month into place on the month axis
+    columns = [np.zeros(months + width, dtype=np.int64) for _ in sums]
+    for group, offset in enumerate(start[groups] - first):
+        stop = offset + width
+        for total, values in zip(columns, sums):
+            total[offset:stop] += values[group]
+    columns = [total[:months] for total in columns]
+    return Projection(first + 1970 * 12, *columns)
+
+
+def _active(length: np.ndarray, groups: np.ndarray, width: int) -> np.ndarray:
+    """The number of schedules per group and month, from a histogram of their lengths."""
+    sizes = np.diff(np.append(groups, len(length)))
+    group = np.repeat(np.arange(len(groups)), sizes)
+    ended = np.bincount(group * (width + 1) + length, minlength=len(groups) * (width + 1))
+    return sizes[:, None] - np.cumsum(ended.reshape(len(groups), width + 1), axis=1)[:, :width]
+
+
+def project_portfolio(
+    years, start_date, original_debt, interest_perc, payment_offset, chunk_size: int = 2_000, workers: int = 1
+) -> Projection:
+    """
+    Sum the schedules of many borrowers per calendar month, a chunk of borrowers at a time.
+
+    The borrower inputs are broadcast to one value per borrower, see `duo_tool.batch.broadcast_inputs`.
+    Args:
+        years: amount of years to pay back loan
+        start_date: the start date of the aanloopfase
+        original_debt: the original debt amount in euros
+        interest_perc: the interest percentage
+        payment_offset: the number of months after the start date to start paying back the loan.
+        chunk_size: the number of borrowers per chunk
+        workers: the number of processes. With 1 worker the chunks are calculated in this process.
+
+    Returns:
+        Projection: the number of borrowers, and the total debt, payment, principal and interest per month
+    """
+    chunks = iter_input_chunks(years, start_date, original_debt, interest_perc, payment_offset, chunk_size)
+
+    # The partial results are merged as they come in, so only a few chunks are in memory at a time
+    total = Projection.zeros()
+    for projection in map_chunks(project_chunk, (chunk[1:] for chunk in chunks), workers):
+        total = total.merge(projection)
+    return total
@@ -0,0 +1,129 @@
+"""
+This module contains the `Schedule`, the debt over time of a loan.
+
+A schedule holds one entry per month in contiguous numpy arrays: the month as an integer ordinal (year * 12 + month - 1)
+and the money columns. Slicing returns views, and concatenating schedules that are adjacent slices of the same arrays
+returns a view as well, so a loan can be calculated into one preallocated schedule phase by phase. Timestamps and
+dataframes are only created by `to_pandas`, when the schedule is shown.
+
+Pandas is only imported once a timestamp or dataframe is needed, so the calculations start without it.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from pandas import Timestamp
+
+# The money columns of a schedule, in the order of the dataframe
+COLUMNS = ("debt", "payment", "principal", "interest")
+
+
+def to_ordinal(date: Timestamp) -> int:
+    """Returns the month of a date as the number of months since the start of year 0."""
+    return date.year * 12 + date.month - 1
+
+
+def to_timestamp(ordinal: int) -> Timestamp:
+    """Returns the first day of the month of an ordinal as a timestamp."""
+    from pandas import Timestamp
+
+    return Timestamp(year=int(ordinal) // 12, month=int(ordinal) % 12 + 1, day=1)
+
+
+def to_datetime64(ordinals) -> np.ndarray:
+    """Returns month ordinals as numpy datetime64[M] months."""
+    return (np.asarray(ordinals, dtype=np.int64) - 1970 * 12).astype("datetime64[M]")
+
+
+class Schedule:
+    """The debt, payment, principal and interest of a loan per month"""
+
+    __slots__ = ("month", "debt", "payment", "principal", "interest")
+
+    def __init__(
+        self, month: np.ndarray, debt: np.ndarray, payment: np.ndarray, principal: np.ndarray, interest: np.ndarray
+    ):
+        """
+        Args:
+            month: the month ordinals, see `to_ordinal`
+            debt: the remaining debt at the end of every month
+            payment: the payment of every month
+            principal: the part of the payment that pays off debt
+            interest: the part of the payment that pays interest
+        """
+        self.month = month
+        self.debt = debt
+        self.payment = payment
+        self.principal = principal
+        self.interest = interest
+
+    @classmethod
+    def empty(cls, first_month: int, months: int, dtype=np.float64) -> "Schedule":
+        """Allocate a schedule of `months` consecutive months from the `first_month` ordinal on, to be filled in."""
+        month = np.arange(first_month, first_month + months, dtype=np.int32)
+        return cls(month, *(np.empty(months, dtype=dtype) for _ in COLUMNS))
+
+    @classmethod
+    def concat(cls, schedules: list) -> "Schedule":
+        """
+        Combine schedules into one, in the given order.
+
+        If the schedules are adjacent slices of the same schedule, the result is a view on it and nothing is copied.
+        """
+        columns = ("month",) + COLUMNS
+        return cls(*(_join([getattr(schedule, column) for schedule in schedules]) for column in columns))
+
+    def __len__(self) -> int:
+        return len(self.month)
+
+    def __repr__(self) -> str:
+        if not len(self):
+            return "Schedule(0 months)"
+        return f"Schedule({len(self)} months, {to_timestamp(self.month[0]):%m-%Y} to {self.last_month:%m-%Y})"
+
+    def __getitem__(self, key):
+        """Returns a column by name, or a view on a slice of the months."""
+        if isinstance(key, str):
+            return getattr(self, key)
+        if not isinstance(key, slice):
+            raise TypeError("A schedule can only be indexed by a column name or a slice")
+        return Schedule(self.month[key], self.debt[key], self.payment[key], self.principal[key], self.interest[key])
+
+    def copy(self) -> "Schedule":
+        """Returns a schedule with its own copy of the arrays."""
+        return Schedule(
+            self.month.copy(), self.debt.copy(), self.payment.copy(), self.principal.copy(), self.interest.copy()
+        )
+
+    @property
+    def last_month(self) -> Timestamp:
+        """The month of the last payment."""
+        return to_timestamp(self.month[-1])
+
+    def to_pandas(self) -> pd.DataFrame:
+        """Returns the schedule as a dataframe, with the first day of every month as a timestamp."""
+        import pandas as pd
+
+        month = to_datetime64(self.month).astype("datetime64[ns]")
+        return pd.DataFrame({"month": month, **{column: getattr(self, column) for column in COLUMNS}})
+
+
+def _join(arrays: list) -> np.ndarray:
+    """Concatenate arrays, as a view if they follow each other in memory."""
+    first = arrays[0]
+    itemsize = first.itemsize
+    address = first.__array_interface__["data"][0]
+    for array in arrays:
+        contiguous = array.dtype == first.dtype and (len(array) < 2 or array.strides[0] == itemsize)
+        if not contiguous or array.__array_interface__["data"][0] != address or array.base is not first.base:
+            return np.concatenate(arrays)
+        address += array.nbytes
+
+    # The arrays are consecutive pieces of the same buffer, so a view from the first one covers them all
+    if first.base is None:
+        return first
+    return np.lib.stride_tricks.as_strided(first, shape=(sum(len(array) for array in arrays),), strides=(itemsize,))
@@ -0,0 +1,541 @@
+"""
+A JSON service over HTTP for other systems that need the repayment numbers, without the streamlit app.
+
+Endpoints:
+- POST /inputs: the monthly payment, total interest paid and month of the last payment of a loan, see `get_inputs`.
+  The body has the start_date (month-year, e.g. 01-2024), years, original_debt, interest_perc and optionally the
+  payment_offset (24 by default) and schedule (false by default, true adds the debt over time).
+- POST /one_time_payment: the same with a one time extra payment, see `one_time_payment`. The body also has the
+  payment_date (month-year) and payment_amount.
+- GET /health: the status and the number of loans waiting to be calculated.
+- GET /metrics: the timers and counters in the Prometheus text format, when `duo_tool.instrumentation` is enabled.
+
+Concurrent requests that arrive within a short window are calculated together in one `get_inputs_batch` call, so a
+burst of requests costs about as much as a single one. The service refuses new loans with a 503 once too many are
+waiting (backpressure), answers a 504 when a loan is not calculated within the timeout, and keeps connections open
+between requests (HTTP/1.1 keep-alive). Only the standard library is used, `ServiceClient` talks to it from python.
+
+Run with: python -m duo_tool.service --port 8000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+from dataclasses import dataclass, replace
+from http import HTTPStatus
+from typing import TYPE_CHECKING
+
+import numpy as np
+from loguru import logger
+
+from duo_tool.batch import get_inputs_batch
+from duo_tool.inputs import one_time_payment
+from duo_tool.instrumentation import count, snapshot, to_prometheus
+from duo_tool.schedule import COLUMNS, to_datetime64, to_ordinal
+from duo_tool.validation import MAX_INTEREST_PERC, MAX_PAYMENT_OFFSET, OPTIONAL_COLUMNS, TERMS, check_amount, parse_date
+
+if TYPE_CHECKING:
+    from pandas import Timestamp
+
+# The largest request body in bytes, a loan takes about 200
+MAX_BODY_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class Loan:
+    """The inputs of one request, checked like the form does"""
+
+    years: int
+    start_date: Timestamp
+    original_debt: float
+    interest_perc: float
+    payment_offset: int
+    payment_date: Timestamp = None
+    payment_amount: float = None
+    schedule: bool = False
+
+
+def parse_loan(body: dict, one_time: bool = False) -> Loan:
+    """
+    Check and convert the body of a request, raising a ValueError that describes the first wrong field.
+
+    Args:
+        body: the decoded JSON body, see the module docstring for the fields
+        one_time: whether the loan has a one time extra payment
+
+    Returns:
+        Loan: the checked inputs
+    """
+    if not isinstance(body, dict):
+        raise ValueError("The body must be a JSON object")
+    fields = ["start_date", "years", "original_debt", "interest_perc"]
+    fields += ["payment_date", "payment_amount"] if one_time else []
+    missing = [field for field in fields if field not in body]
+    if missing:
+        raise ValueError(f"The body misses the fields {missing}")
+
+    try:
+        start_date = parse_date(body["start_date"])
+        years = int(body["years"])
+        original_debt = float(body["original_debt"])
+        interest_perc = float(body["interest_perc"])
+        payment_offset = body.get("payment_offset", OPTIONAL_COLUMNS["payment_offset"])
+    except (TypeError, ValueError) as error:
+        raise ValueError(f"Wrong loan: {error}")
+    if years not in TERMS:
+        raise ValueError(f"The years must be one of {TERMS}")
+    if not original_debt > 0:
+        raise ValueError("The original_debt must be above 0")
+    if not 0 <= interest_perc <= MAX_INTEREST_PERC:
+        raise ValueError(f"The interest_perc must be from 0 to {MAX_INTEREST_PERC}")
+    if not isinstance(payment_offset, int) or not 1 <= payment_offset <= MAX_PAYMENT_OFFSET:
+        raise ValueError(f"The payment_offset must be whole months from 1 to {MAX_PAYMENT_OFFSET}")
+
+    loan = Loan(years, start_date, original_debt, interest_perc, payment_offset, schedule=bool(body.get("schedule")))
+    if not one_time:
+        return loan
+
+    try:
+        payment_date = parse_date(body["payment_date"])
+        payment_amount = float(body["payment_amount"])
+        check_amount(payment_amount, upper_limit=original_debt)
+    except (TypeError, ValueError) as error:
+        raise ValueError(f"Wrong extra payment: {error}")
+    if payment_date < start_date:
+        raise ValueError("The payment_date cannot be before the start_date")
+    return replace(loan, payment_date=payment_date, payment_amount=payment_amount)
+
+
+def calculate_loans(loans: list) -> list:
+    """
+    Calculate many loans at once: all of them in one `get_inputs_batch` call, and the extra payments one by one.
+
+    When the batch cannot be calculated, the loans are calculated one by one, so only the loans that fail get an error.
+
+    Returns:
+        list: the outputs per loan, or the ValueError or ArithmeticError of a loan that cannot be calculated
+    """
+    try:
+        return _calculate_together(loans)
+    except (ValueError, ArithmeticError) as error:
+        if len(loans) == 1:
+            return [error]
+    return [calculate_loans([loan])[0] for loan in loans]
+
+
+def _calculate_together(loans: list) -> list:
+    """Calculate the loans in one batch, see `calculate_loans`."""
+    start_month = np.array([to_ordinal(loan.start_date) for loan in loans])
+    summary = get_inputs_batch(
+        [loan.years for loan in loans],
+        to_datetime64(start_month),
+        [loan.original_debt for loan in loans],
+        [loan.interest_perc for loan in loans],
+        [loan.payment_offset for loan in loans],
+    )
+    last_month = summary["last_payment_month"].astype(np.int64) + 1970 * 12
+    results = []
+    for idx, (loan, monthly_payment, interest_paid, last) in enumerate(
+        zip(loans, summary["monthly_payment"].tolist(), summary["total_interest_paid"].tolist(), last_month.tolist())
+    ):
+        result = {
+            "monthly_payment": monthly_payment,
+            "total_interest_paid": interest_paid,
+            "last_payment_month": _month_text(last),
+        }
+        if loan.payment_date is not None:
+            try:
+                outputs = one_time_payment(
+                    inputs=None,
+                    payment_amount=loan.payment_amount,
+                    payment_date=loan.payment_date,
+                    interest_perc=loan.interest_perc,
+                    years=loan.years,
+                    start_date=loan.start_date,
+                    original_debt=loan.original_debt,
+                    payment_offset=loan.payment_offset,
+                    current_monthly_payment=summary["monthly_payment"][idx],
+                )
+            except (ValueError, ArithmeticError) as error:
+                results.append(error)
+                continue
+            schedule = outputs["debt_over_time"]
+            result = {
+                "monthly_payment": float(outputs["monthly_payment"]),
+                "total_interest_paid": float(outputs["total_interest_paid"]),
+                "last_payment_month": _month_text(int(schedule.month[-1])),
+            }
+            if loan.schedule:
+                columns = {column: getattr(schedule, column) for column in COLUMNS}
+                result["debt_over_time"] = _schedule_json(schedule.month, columns)
+        results.append(result)
+
+    # The schedules without extra payments are calculated together as well, only for the loans that ask for them
+    rows = [idx for idx, loan in enumerate(loans) if loan.schedule and loan.payment_date is None]
+    if rows:
+        schedules = get_inputs_batch(
+            [loans[idx].years for idx in rows],
+            to_datetime64(start_month[rows]),
+            [loans[idx].original_debt for idx in rows],
+            [loans[idx].interest_perc for idx in rows],
+            [loans[idx].payment_offset for idx in rows],
+            schedule=True,
+        )["debt_over_time"]
+        for row, idx in enumerate(rows):
+            length = int(schedules["length"][row])
+            month = start_month[idx] + np.arange(length)
+            results[idx]["debt_over_time"] = _schedule_json(
+                month, {column: schedules[column][row, :length] for column in COLUMNS}
+            )
+    return results
+
+
+def _month_text(ordinal: int) -> str:
+    """Returns the month of an ordinal as month-year, like the dates in the requests."""
+    return f"{ordinal % 12 + 1:02d}-{ordinal // 12}"
+
+
+def _schedule_json(month: np.ndarray, columns: dict) -> dict:
+    """The debt over time as lists per column, with the months as month-year."""
+    return {
+        "month": [_month_text(ordinal) for ordinal in month.tolist()],
+        **{column: values.tolist() for column, values in columns.items()},
+    }
+
+
+class Coalescer:
+    """Collects the loans of concurrent requests and calculates them together"""
+
+    def __init__(self, window: float = 0.002, max_batch: int = 2048, max_pending: int = 20_000):
+        """
+        Args:
+            window: the seconds to wait for more loans after the first one arrives
+            max_batch: the most loans per calculation
+            max_pending: the most loans waiting to be calculated, after which `submit` refuses new ones
+        """
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = asyncio.Queue(max_pending)
+        self.batches = 0
+        self.loans = 0
+
+    @property
+    def pending(self) -> int:
+        """The number of loans waiting to be calculated."""
+        return self._queue.qsize()
+
+    def submit(self, loan: Loan) -> asyncio.Future:
+        """Queue a loan and return the future of its outputs, or raise asyncio.QueueFull if too many are waiting."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((loan, future))
+        return future
+
+    async def run(self) -> None:
+        """Calculate the queued loans batch by batch, until cancelled."""
+        while True:
+            items = [await self._queue.get()]
+
+            # Give concurrent requests the window to join, unless a full batch is already waiting
+            if self._queue.qsize() < self.max_batch - 1:
+                await asyncio.sleep(self.window)
+            while len(items) < self.max_batch and not self._queue.empty():
+                items.append(self._queue.get_nowait())
+
+            # Requests that timed out are cancelled, so they are not calculated
+            items = [(loan, future) for loan, future in items if not future.done()]
+            if not items:
+                continue
+
+            # The calculation runs in a thread, so the event loop keeps accepting the requests of the next batch
+            try:
+                results = await asyncio.to_thread(calculate_loans, [loan for loan, _ in items])
+            except Exception as error:
+                logger.exception("Calculating a batch failed")
+                results = [error] * len(items)
+
+            self.batches += 1
+            self.loans += len(items)
+            count("service_batches")
+            count("service_loans", len(items))
+            for (_, future), result in zip(items, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+class Service:
+    """The HTTP server in front of a `Coalescer`"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        window: float = 0.002,
+        max_batch: int = 2048,
+        max_pending: int = 20_000,
+        timeout: float = 5.0,
+        keep_alive: float = 15.0,
+        backlog: int = 1024,
+    ):
+        """
+        Args:
+            host: the address to listen on
+            port: the port to listen on, 0 picks a free one
+            window: the seconds to wait for more loans after the first one arrives
+            max_batch: the most loans per calculation
+            max_pending: the most loans waiting to be calculated, after which requests get a 503
+            timeout: the seconds a request may take before it gets a 504
+            keep_alive: the seconds an idle connection stays open
+            backlog: the most connections waiting to be accepted, a burst of new clients beyond it waits for retries
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.backlog = backlog
+        self._coalescer_args = (window, max_batch, max_pending)
+        self.coalescer = None
+        self._server = None
+        self._worker = None
+        self._connections = set()
+
+    async def start(self) -> None:
+        """Start listening, after which `port` is the port that is used."""
+        self.coalescer = Coalescer(*self._coalescer_args)
+        self._worker = asyncio.create_task(self.coalescer.run())
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port, backlog=self.backlog)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("Listening on http://{}:{}", self.host, self.port)
+
+    async def stop(self) -> None:
+        """Stop listening and calculating, and close the open connections."""
+        self._server.close()
+        for task in self._connections:
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+        self._worker.cancel()
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def __aenter__(self) -> "Service":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    async def handle(self, method: str, path: str, body: bytes) -> tuple:
+        """
+        Answer a request.
+
+        Returns:
+            tuple: the HTTP status and the JSON response
+        """
+        if path == "/metrics" and method == "GET":
+            return HTTPStatus.OK, to_prometheus(snapshot())
+        if path == "/health":
+            if method != "GET":
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Use GET"}
+            return HTTPStatus.OK, {"status": "ok", "pending": self.coalescer.pending}
+        if path not in ("/inputs", "/one_time_payment"):
+            return HTTPStatus.NOT_FOUND, {"error": f"Unknown path {path}"}
+        if method != "POST":
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Use POST"}
+
+        try:
+            loan = parse_loan(json.loads(body or b"null"), one_time=path == "/one_time_payment")
+        except ValueError as error:
+            return HTTPStatus.BAD_REQUEST, {"error": str(error)}
+
+        try:
+            future = self.coalescer.submit(loan)
+        except asyncio.QueueFull:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Too many requests, try again later"}
+        try:
+            return HTTPStatus.OK, await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            return HTTPStatus.GATEWAY_TIMEOUT, {"error": f"The loan was not calculated within {self.timeout}s"}
+        except (ValueError, ArithmeticError) as error:
+            return HTTPStatus.BAD_REQUEST, {"error": str(error)}
+        except Exception:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "The loan could not be calculated"}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answer the requests of one connection, until the client closes it or it is idle for `keep_alive` seconds."""
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(_read_request(reader), self.keep_alive)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    break
+                if request is None:
+                    break
+                if isinstance(request, HTTPStatus):
+                    writer.write(_response(request, {"error": request.phrase}, keep_alive=False))
+                    break
+
+                method, path, version, headers, body = request
+                status, payload = await self.handle(method, path, body)
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+            self._connections.discard(task)
+
+
+async def _read_request(reader: asyncio.StreamReader):
+    """
+    Read one request from the connection.
+
+    Returns:
+        the method, path, HTTP version, headers and body, None when the connection is closed, or the HTTP status of a
+        request that cannot be read.
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    parts = request_line.decode("latin-1").split()
+    if len(parts) != 3:
+        return HTTPStatus.BAD_REQUEST
+    method, path, version = parts
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        return HTTPStatus.BAD_REQUEST
+    if length > MAX_BODY_SIZE:
+        return HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+    body = await reader.readexactly(length) if length > 0 else b""
+    return method, path.split("?")[0], version, headers, body
+
+
+def _response(status: HTTPStatus, payload, keep_alive: bool) -> bytes:
+    """Encode a JSON response, or a plain text response for a string."""
+    text = isinstance(payload, str)
+    body = payload.encode() if text else json.dumps(payload).encode()
+    headers = [
+        f"HTTP/1.1 {status.value} {status.phrase}",
+        f"Content-Type: {'text/plain; version=0.0.4' if text else 'application/json'}",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    if status == HTTPStatus.SERVICE_UNAVAILABLE:
+        headers.append("Retry-After: 1")
+    return ("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body
+
+
+class ServiceClient:
+    """Sends JSON requests to the service over one keep-alive connection"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8000):
+        """
+        Args:
+            host: the address of the service
+            port: the port of the service
+        """
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+
+    async def request(self, method: str, path: str, body: dict = None) -> tuple:
+        """
+        Send a request, opening the connection first if needed.
+
+        Returns:
+            tuple: the HTTP status code and the decoded JSON response, or the text of a text response
+        """
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        data = b"" if body is None else json.dumps(body).encode()
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(data)}\r\n"
+        self._writer.write(f"{head}Content-Type: application/json\r\n\r\n".encode("latin-1") + data)
+        await self._writer.drain()
+
+        status = int((await self._reader.readline()).split()[1])
+        headers = {}
+        while (line := await self._reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        body = await self._reader.readexactly(int(headers["content-length"]))
+        payload = json.loads(body) if headers.get("content-type") == "application/json" else body.decode()
+
+        # The service closes the connection after an error it cannot recover from
+        if headers.get("connection") == "close":
+            await self.close()
+        return status, payload
+
+    async def inputs(self, **loan) -> tuple:
+        """POST a loan to /inputs, see the module docstring for the fields."""
+        return await self.request("POST", "/inputs", loan)
+
+    async def one_time_payment(self, **loan) -> tuple:
+        """POST a loan with an extra payment to /one_time_payment, see the module docstring for the fields."""
+        return await self.request("POST", "/one_time_payment", loan)
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._reader = self._writer = None
+
+    async def __aenter__(self) -> "ServiceClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="the address to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="the port to listen on")
+    parser.add_argument("--window", type=float, default=2.0, help="milliseconds to wait for more loans per batch")
+    parser.add_argument("--max-batch", type=int, default=2048, help="the most loans per calculation")
+    parser.add_argument("--max-pending", type=int, default=20_000, help="the most waiting loans before a 503")
+    parser.add_argument("--timeout", type=float, default=5.0, help="seconds per request before a 504")
+    parser.add_argument("--keep-alive", type=float, default=15.0, help="seconds an idle connection stays open")
+    args = parser.parse_args()
+
+    # Do not log every monthly payment, it would slow down every request
+    logger.disable("duo_tool.calculations")
+    logger.disable("duo_tool.events")
+    logger.disable("duo_tool.inputs")
+    service = Service(
+        args.host, args.port, args.window / 1000, args.max_batch, args.max_pending, args.timeout, args.keep_alive
+    )
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+This module simulates the interest rate over the term of the loan, to show how uncertain the total interest is.
+
+DUO fixes the interest rate for periods of 5 years, and at every reset the monthly payment is recalculated for the
+remaining debt and months (see the rate schedule of `get_inputs`). The rate at each reset is drawn from a
+`RateModel`, for many paths at once. Every rate period is a single `amortize` call for all paths of a chunk, so the
+memory use is bounded by the chunk size, not by the number of paths.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+from pandas import Timestamp
+
+from duo_tool.batch import chunk_ranges, map_chunks
+from duo_tool.kernels import amortize, annuity_payment, payment_after_aanloopfase, round_cents, truncate_at_payoff
+
+
+@dataclass(frozen=True)
+class RateModel:
+    """
+    Mean-reverting model of the interest percentage at each reset.
+
+    Every reset the rate moves `reversion` of the way towards `mean`, plus a normal shock with standard deviation
+    `volatility`. The result is rounded to two decimals and kept at or above `floor`, like the DUO rate.
+    """
+
+    mean: float = 2.5
+    reversion: float = 0.3
+    volatility: float = 0.75
+    floor: float = 0.0
+
+    def sample(self, rng: np.random.Generator, paths: int, resets: int, start_perc: float) -> np.ndarray:
+        """
+        Draw the interest percentage at every reset.
+
+        Returns:
+            np.ndarray: the interest percentage per path (rows) and reset (columns)
+        """
+        shocks = rng.normal(0.0, self.volatility, size=(paths, resets))
+        rates = np.empty((paths, resets))
+        previous = np.full(paths, float(start_perc))
+        for reset in range(resets):
+            previous = previous + self.reversion * (self.mean - previous) + shocks[:, reset]
+            previous = np.maximum(np.round(previous, 2), self.floor)
+            rates[:, reset] = previous
+        return rates
+
+
+def get_simulation(
+    years: int,
+    start_date: Timestamp,
+    original_debt: float,
+    interest_perc: float,
+    payment_offset: int,
+    model: RateModel = RateModel(),
+    paths: int = 10_000,
+    seed: int = None,
+    reset_months: int = 60,
+    percentiles: tuple = (5, 25, 50, 75, 95),
+    chunk_size: int = 10_000,
+    workers: int = 1,
+) -> dict:
+    """
+    Gather the percentiles of the monthly payment, total interest paid and month of the last payment over rate paths.
+
+    The aanloopfase and the first period of the payment phase use `interest_perc`, every later period a simulated rate.
+    With the same seed and chunk size the results do not depend on the number of workers.
+    Args:
+        years: amount of years to pay back loan
+        start_date: the start date of the aanloopfase
+        original_debt: the original debt amount in euros
+        interest_perc: the current interest percentage
+        payment_offset: the number of months after the start date to start paying back the loan.
+        model: the model to draw the interest percentages from
+        paths: the number of rate paths
+        seed: the seed of the random generator, for reproducible results
+        reset_months: the number of months the interest rate is fixed for
+        percentiles: the percentiles to report
+        chunk_size: the number of paths calculated at once
+        workers: the number of processes, None for one per cpu
+
+    Returns:
+        dict: the percentiles, and for each of them the monthly payment per rate period, the total interest paid and
+            the month of the last payment. Also the mean total interest paid.
+    """
+    # Every chunk gets its own random generator, so the paths are the same whichever process calculates them
+    chunks = chunk_ranges(paths, chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    arguments = [
+        (years, original_debt, interest_perc, payment_offset, model, reset_months, stop - start, s)
+        for (start, stop), s in zip(chunks, seeds)
+    ]
+    results = list(map_chunks(_simulate_chunk, arguments, workers))
+
+    payments, interest_paid, payment_months = (np.concatenate(values) for values in zip(*results))
+    last_payment = np.datetime64(Timestamp(start_date), "M") + payment_offset + payment_months - 1
+    return {
+        "percentiles": list(percentiles),
+        "monthly_payment": np.percentile(payments, percentiles, axis=0, method="nearest"),
+        "total_interest_paid": np.percentile(interest_paid, percentiles, method="nearest"),
+        "last_payment_month": np.percentile(last_payment.astype(np.int64), percentiles, method="nearest").astype(
+            "datetime64[M]"
+        ),
+        "expected_total_interest_paid": round(float(interest_paid.mean()), 2),
+    }
+
+
+def _simulate_chunk(
+    years: int,
+    original_debt: float,
+    interest_perc: float,
+    payment_offset: int,
+    model: RateModel,
+    reset_months: int,
+    paths: int,
+    seed: np.random.SeedSequence,
+) -> tuple:
+    """
+    Calculate the payment phase for a chunk of rate paths.
+
+    Returns:
+        tuple: the monthly payment per path and rate period, and the interest paid and number of payments per path.
+    """
+    months = 12 * years
+    first_months = np.arange(0, months, reset_months)
+
+    # Draw the interest rates of all periods after the first
+    rates = np.empty((paths, len(first_months)))
+    rates[:, 0] = interest_perc
+    rates[:, 1:] = model.sample(np.random.default_rng(seed), paths, len(first_months) - 1, interest_perc)
+    rates /= 100
+
+    # Every path starts from the debt after the aanloopfase of `get_inputs`
+    balance, _ = payment_after_aanloopfase(original_debt, interest_perc / 100, payment_offset, months)
+    balance = np.repeat(balance, paths)
+    payments = np.empty((paths, len(first_months)))
+    total_paid = np.zeros(paths)
+    payment_months = np.full(paths, months)
+    for period, first in enumerate(first_months):
+        stop = min(first + reset_months, months)
+
+        # At every reset the monthly payment is recalculated for the remaining debt and months, unless the rate stays
+        # the same, like a rate schedule without a change in `get_inputs`
+        payments[:, period] = annuity_payment(balance, rates[:, period], months - first, numpy_round=True)
+        if period > 0:
+            same_rate = (rates[:, period] == rates[:, period - 1]) & (balance > 0)
+            payments[same_rate, period] = payments[same_rate, period - 1]
+        remaining, principal, interest = amortize(
+            balance, payments[:, period], rates[:, period], stop - first, numpy_round=True
+        )
+
+        # The first month without debt, if the rounding pays it off before the end of the term
+        length, truncated, _ = truncate_at_payoff(balance, payments[:, period], remaining, principal, interest)
+        paid_off = (remaining == 0).any(axis=1) & (payment_months == months)
+        payment_months[paid_off] = first + length[paid_off]
+
+        # Nothing is paid after that month, and the last payment is only what was left of the debt
+        early = payment_months < months
+        total_paid += np.where(early, truncated.sum(axis=1), payments[:, period] * (stop - first))
+        balance = remaining[:, -1]
+
+    return payments, round_cents(total_paid - original_debt, numpy_round=True), payment_months
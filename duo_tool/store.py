@@ -0,0 +1,180 @@
+"""
+This module stores calculated schedules on disk, so all processes on a host share them instead of recalculating.
+
+A result of `get_inputs` or `one_time_payment` is stored under a hash of its normalized inputs, as two files:
+- <hash>.npy: the debt, payment, principal and interest columns as one (4, months) float64 array. Every column is a
+  contiguous row, so a schedule is read with a memory map without copying: the operating system shares the pages
+  between all processes that read it.
+- <hash>.json: the first month and the other values of the result. It is written last, so it marks a complete entry.
+
+Writers write to a temporary file and rename it into place, which is atomic, so readers never see half an entry and
+concurrent writers of the same entry are harmless. The store is kept below a size limit by evicting the least
+recently read entries, under a file lock so processes do not evict at the same time. Readers that still have an
+evicted entry memory-mapped keep reading it, as the data stays until the last map is closed.
+
+Set DUO_TOOL_STORE to a directory to use a store in `duo_tool.cache`, and DUO_TOOL_STORE_MAX_BYTES to limit its size.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from duo_tool.schedule import COLUMNS, Schedule, to_ordinal, to_timestamp
+
+# Part of every key, so a change of the file format never reads old entries
+FORMAT_VERSION = 1
+
+# The default size limit of a store in bytes
+MAX_BYTES = 512 * 2**20
+
+
+class ScheduleStore:
+    """Stores results with a schedule in a directory, shared by all processes on the host"""
+
+    def __init__(self, directory: Path, max_bytes: int = MAX_BYTES):
+        """
+        Args:
+            directory: the directory of the store, created if it does not exist
+            max_bytes: the size limit of the stored files, beyond which the least recently read entries are evicted
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        # Evict on the first write, and after that once a tenth of the limit has been written
+        self._written = max_bytes // 10
+
+    @classmethod
+    def from_environment(cls):
+        """Returns the store in DUO_TOOL_STORE, or None if it is not set."""
+        directory = os.environ.get("DUO_TOOL_STORE")
+        if not directory:
+            return None
+        return cls(directory, int(os.environ.get("DUO_TOOL_STORE_MAX_BYTES", MAX_BYTES)))
+
+    @staticmethod
+    def key(*inputs) -> str:
+        """
+        Returns the name of the entry of normalized inputs, e.g. those of `duo_tool.cache._normalize`.
+
+        The inputs are hashed by their text, so equal inputs must have equal types: a float 10000.0 and an int 10000
+        give different keys.
+        """
+        text = repr((FORMAT_VERSION,) + tuple(str(value) if hasattr(value, "strftime") else value for value in inputs))
+        return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+    def get(self, key: str):
+        """
+        Read an entry, with its schedule memory-mapped.
+
+        Returns:
+            dict: the result as it was stored, with a read-only schedule, or None if there is no entry for the key
+        """
+        try:
+            metadata = json.loads(self._path(key, ".json").read_text())
+            first_month = int(metadata.pop("first_month"))
+            columns = np.load(self._path(key, ".npy"), mmap_mode="r")
+        except (FileNotFoundError, ValueError, KeyError, TypeError, AttributeError):
+            # A file that is missing or cannot be read is a miss, the entry is calculated and written again
+            self.misses += 1
+            return None
+
+        # Mark the entry as recently read, for the eviction
+        try:
+            os.utime(self._path(key, ".json"))
+        except FileNotFoundError:
+            pass
+        self.hits += 1
+
+        month = np.arange(first_month, first_month + columns.shape[1], dtype=np.int32)
+        result = {"debt_over_time": Schedule(month, *columns)}
+        for name, value in metadata.items():
+            result[name] = to_timestamp(value["month"]) if isinstance(value, dict) else np.float64(value)
+        return result
+
+    def put(self, key: str, result: dict) -> None:
+        """
+        Store a result with a schedule in "debt_over_time" and numbers or timestamps as the other values.
+
+        The values are read back as numpy floats and timestamps.
+        """
+        schedule = result["debt_over_time"]
+        metadata = {"first_month": int(schedule.month[0]) if len(schedule) else 0}
+        for name, value in result.items():
+            if name != "debt_over_time":
+                metadata[name] = {"month": to_ordinal(value)} if hasattr(value, "strftime") else float(value)
+
+        columns = np.stack([np.asarray(getattr(schedule, column), dtype=np.float64) for column in COLUMNS])
+        self._write(key, ".npy", lambda file: np.save(file, columns))
+        self._write(key, ".json", lambda file: file.write(json.dumps(metadata).encode()))
+
+        self._written += columns.nbytes
+        if self._written >= self.max_bytes // 10:
+            self.evict()
+
+    def get_or_compute(self, key: str, compute: Callable[[], dict]) -> dict:
+        """Returns the stored result for the key, or computes and stores it."""
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.put(key, result)
+        return result
+
+    def evict(self) -> int:
+        """
+        Remove the least recently read entries until the store is below 90% of its size limit.
+
+        Returns:
+            int: the number of entries removed
+        """
+        self._written = 0
+        with open(self.directory / ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = {}
+            for path in self.directory.iterdir():
+                if path.suffix not in (".npy", ".json"):
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                size, last_read = entries.get(path.stem, (0, 0.0))
+                last_read = stat.st_mtime if path.suffix == ".json" else last_read
+                entries[path.stem] = (size + stat.st_size, last_read)
+
+            size = sum(entry_size for entry_size, _ in entries.values())
+            removed = 0
+            for key, (entry_size, _) in sorted(entries.items(), key=lambda entry: entry[1][1]):
+                if size <= 0.9 * self.max_bytes:
+                    break
+                # Remove the marker first, so readers do not find an entry without its schedule
+                for suffix in (".json", ".npy"):
+                    self._path(key, suffix).unlink(missing_ok=True)
+                size -= entry_size
+                removed += 1
+        return removed
+
+    def info(self) -> dict:
+        """Returns the hit and miss counters of this process, and the number of entries and bytes on disk."""
+        files = [path.stat().st_size for path in self.directory.glob("*.npy")]
+        return {"hits": self.hits, "misses": self.misses, "entries": len(files), "bytes": sum(files)}
+
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.directory / f"{key}{suffix}"
+
+    def _write(self, key: str, suffix: str, write: Callable) -> None:
+        """Write a file under a temporary name and rename it into place, so it appears complete or not at all."""
+        temporary = self.directory / f".{key}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temporary, "wb") as file:
+                write(file)
+            os.replace(temporary, self._path(key, suffix))
+        finally:
+            temporary.unlink(missing_ok=True)
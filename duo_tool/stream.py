@@ -0,0 +1,204 @@
+"""
+This module streams the debt over time of many borrowers, for exports that do not fit in memory.
+
+The borrowers are calculated in chunks with `get_inputs_batch`, and every chunk is yielded as one long table with a
+row per borrower and month. Only one chunk is in memory at a time, so the memory use depends on the chunk size, not on
+the number of borrowers. The rows per borrower equal the debt over time of `get_inputs`.
+
+The writers stream chunks straight to a CSV or Parquet file, as they come. Parquet needs the optional pyarrow package,
+and is much faster to write than CSV.
+"""
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from duo_tool.batch import get_inputs_batch, iter_input_chunks
+from duo_tool.schedule import COLUMNS
+
+
+def iter_chunks(
+    years, start_date, original_debt, interest_perc, payment_offset, chunk_size: int = 1_000
+) -> Iterator[dict]:
+    """
+    Calculate the debt over time of many borrowers, a chunk of borrowers at a time.
+
+    The borrower inputs are broadcast to one value per borrower, see `duo_tool.batch.broadcast_inputs`.
+    Args:
+        years: amount of years to pay back loan
+        start_date: the start date of the aanloopfase
+        original_debt: the original debt amount in euros
+        interest_perc: the interest percentage
+        payment_offset: the number of months after the start date to start paying back the loan.
+        chunk_size: the number of borrowers per chunk. A chunk has about chunk_size * months rows.
+
+    Yields:
+        dict: the borrower (its index in the inputs), month and the money columns of the schedule, one array each with
+            a row per borrower and month, ordered by borrower and month.
+    """
+    for start, years, start_month, *chunk in iter_input_chunks(
+        years, start_date, original_debt, interest_perc, payment_offset, chunk_size
+    ):
+        schedule = get_inputs_batch(years, start_month, *chunk, schedule=True)["debt_over_time"]
+        yield to_rows(schedule, start_month, np.arange(start, start + len(start_month)))
+
+
+def iter_rows(
+    years, start_date, original_debt, interest_perc, payment_offset, chunk_size: int = 1_000
+) -> Iterator[tuple]:
+    """
+    Calculate the debt over time of many borrowers one row at a time, see `iter_chunks`.
+
+    Yields:
+        tuple: the borrower, the first day of the month as a timestamp, and the debt, payment, principal and interest.
+    """
+    for chunk in iter_chunks(years, start_date, original_debt, interest_perc, payment_offset, chunk_size):
+        frame = to_frame(chunk)
+        yield from frame.itertuples(index=False, name=None)
+
+
+def to_frame(chunk: dict) -> pd.DataFrame:
+    """Returns a chunk as a dataframe, with the first day of every month as a timestamp."""
+    return pd.DataFrame(
+        {
+            column: values.astype("datetime64[ns]") if values.dtype.kind == "M" else values
+            for column, values in chunk.items()
+        }
+    )
+
+
+def to_rows(schedule: dict, start_month: np.ndarray, borrower: np.ndarray) -> dict:
+    """
+    Convert the padded schedules of `get_inputs_batch` to a chunk with a row per borrower and month.
+
+    Args:
+        schedule: the debt over time of `get_inputs_batch`, with a row per borrower
+        start_month: the start month of the aanloopfase per borrower, as datetime64[M]
+        borrower: the number of every borrower
+
+    Returns:
+        dict: the borrower, month and the money columns, ordered by borrower and month
+    """
+    rows, month = np.nonzero(np.arange(schedule["debt"].shape[1]) < schedule["length"][:, None])
+    return {
+        "borrower": borrower[rows],
+        "month": start_month[rows] + month,
+        **{column: schedule[column][rows, month] for column in COLUMNS},
+    }
+
+
+class CsvWriter:
+    """Writes chunks to a CSV file as they come, with the columns of the first chunk as the header"""
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: the file to write, which is overwritten
+        """
+        self._file = open(path, "w", newline="")
+        self.rows = 0
+
+    def write(self, chunk: dict) -> None:
+        """Append the rows of a chunk to the file."""
+        to_frame(chunk).to_csv(self._file, header=self.rows == 0, index=False, date_format="%Y-%m-%d")
+        self.rows += len(next(iter(chunk.values())))
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "CsvWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class ParquetWriter:
+    """Writes chunks to a Parquet file as they come, every chunk as its own row group"""
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: the file to write, which is overwritten
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as error:
+            raise ImportError("Writing Parquet files needs pyarrow, install it with `pip install pyarrow`") from error
+
+        self._pa, self._pq = pa, pq
+        self._path = path
+        self._writer = None
+        self.rows = 0
+
+    def write(self, chunk: dict) -> None:
+        """Append the rows of a chunk to the file, as dates for the months."""
+        pa = self._pa
+        table = pa.table(
+            {
+                column: pa.array(values.astype("datetime64[D]"), pa.date32()) if values.dtype.kind == "M" else values
+                for column, values in chunk.items()
+            }
+        )
+        # The schema is only known once the first chunk arrives
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self._path, table.schema)
+        self._writer.write_table(table)
+        self.rows += table.num_rows
+
+    def close(self) -> None:
+        # Without any chunks, write an empty table so there is a valid file
+        if self._writer is None:
+            self._pq.write_table(self._pa.table({}), self._path)
+        else:
+            self._writer.close()
+
+    def __enter__(self) -> "ParquetWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+# The writer per file extension
+WRITERS = {".csv": CsvWriter, ".parquet": ParquetWriter}
+
+
+def open_writer(path: Path):
+    """Returns a `CsvWriter` or `ParquetWriter` for the file, based on the extension."""
+    path = Path(path)
+    if path.suffix not in WRITERS:
+        raise ValueError(f"Unknown file type {path.suffix!r}, choose from {list(WRITERS)}")
+    return WRITERS[path.suffix](path)
+
+
+def write_chunks(path: Path, chunks: Iterable[dict]) -> int:
+    """
+    Write chunks of rows to a CSV or Parquet file, one chunk at a time, see `open_writer`.
+
+    Args:
+        path: the file to write, which is overwritten
+        chunks: the chunks to write, e.g. from `iter_chunks`
+
+    Returns:
+        int: the number of rows written
+    """
+    with open_writer(path) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    return writer.rows
+
+
+def write_schedules(
+    path: Path, years, start_date, original_debt, interest_perc, payment_offset, chunk_size: int = 1_000
+) -> int:
+    """
+    Calculate the debt over time of many borrowers and stream it to a CSV or Parquet file, based on the extension.
+
+    Returns:
+        int: the number of rows written
+    """
+    chunks = iter_chunks(years, start_date, original_debt, interest_perc, payment_offset, chunk_size)
+    return write_chunks(path, chunks)
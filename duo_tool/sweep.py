@@ -0,0 +1,64 @@
+"""
+This module evaluates a grid of loans: every combination of the given terms, debts, interest percentages and offsets.
+
+The grid is split into chunks of consecutive grid points, and every chunk is a single call to `get_inputs_batch`. The
+chunks are spread over a pool of processes. A worker only receives the axes and the range of its chunk and builds its
+own grid points, so nothing the size of the grid is sent between processes.
+"""
+import numpy as np
+import pandas as pd
+from pandas import Timestamp
+
+from duo_tool.batch import chunk_ranges, get_inputs_batch, map_chunks
+
+# The name of the input columns of the result, in the order of the grid axes
+AXES = ["years", "original_debt", "interest_perc", "payment_offset"]
+
+
+def get_sweep(
+    years,
+    start_date: Timestamp,
+    original_debt,
+    interest_perc,
+    payment_offset,
+    workers: int = None,
+    chunk_size: int = 100_000,
+) -> pd.DataFrame:
+    """
+    Gather the monthly payment and total interest paid for every combination of the inputs.
+
+    The result has one row per combination, e.g. pivot it on two of the inputs to show a heatmap.
+    Args:
+        years: one or more amounts of years to pay back loan
+        start_date: the start date of the aanloopfase
+        original_debt: one or more original debt amounts in euros
+        interest_perc: one or more interest percentages
+        payment_offset: one or more numbers of months after the start date to start paying back the loan.
+        workers: the number of processes, by default one per cpu. With 1 worker the grid is calculated in this process.
+        chunk_size: the number of grid points per chunk
+
+    Returns:
+        pd.DataFrame: the inputs, monthly payment, interest paid and month of the last payment per combination.
+    """
+    axes = [np.atleast_1d(np.asarray(values)) for values in [years, original_debt, interest_perc, payment_offset]]
+    size = int(np.prod([len(axis) for axis in axes]))
+    if size == 0:
+        raise ValueError("Every input needs at least one value")
+    chunks = [(axes, start_date, start, stop) for start, stop in chunk_ranges(size, chunk_size)]
+    results = list(map_chunks(_evaluate_chunk, chunks, workers))
+
+    return pd.DataFrame({column: np.concatenate([result[column] for result in results]) for column in results[0]})
+
+
+def _evaluate_chunk(axes: list, start_date: Timestamp, start: int, stop: int) -> dict:
+    """Calculate the grid points from `start` up to (not including) `stop`."""
+    index = np.unravel_index(np.arange(start, stop), [len(axis) for axis in axes])
+    inputs = {name: axis[idx] for name, axis, idx in zip(AXES, axes, index)}
+
+    outputs = get_inputs_batch(start_date=start_date, **inputs)
+    return {
+        **inputs,
+        "monthly_payment": outputs["monthly_payment"],
+        "total_interest_paid": outputs["total_interest_paid"],
+        "last_payment_month": outputs["last_payment_month"].astype("datetime64[ns]"),
+    }
@@ -1,6 +1,4 @@
-import datetime
-import streamlit as st
-import pandas as pd
+from duo_tool.validation import check_amount, parse_date
 
 
 def diff_month(d1, d2):
@@ -9,17 +7,22 @@ def diff_month(d1, d2):
 
 def check_date_format(date: str, date_format: str = '%m-%Y'):
     try:
-        datetime.datetime.strptime(date, date_format)
+        return parse_date(date, date_format)
     except ValueError:
+        import streamlit as st
+
         st.error("Verkeerde datum. Type je datum als maand-jaar > '01-2026'")
-        raise ValueError('Wrong date format')
-    return pd.to_datetime(date)
+        raise
 
 
 def check_amount_format(amount: int, lower_limit: int = 0, upper_limit: int = None):
+    # Streamlit is only needed to show an error, so batch code can use this module without it
     if amount <= lower_limit:
+        import streamlit as st
+
         st.error(f'Het getal moet groter dan {lower_limit} zijn.')
-        raise ValueError('Amount too low')
-    if upper_limit and amount > upper_limit:
+    elif upper_limit and amount > upper_limit:
+        import streamlit as st
+
         st.error(f'Het getal moet kleiner of gelijk zijn aan {upper_limit}')
-        raise ValueError('Amount too high')
+    check_amount(amount, lower_limit, upper_limit)
@@ -0,0 +1,141 @@
+"""
+This module checks the inputs of a loan without streamlit, so the checks also work headless.
+
+The checks are the same as those of the form: `duo_tool.utils` shows their errors in the app, the batch runner
+(`duo_tool.cli`) reports them per row of the borrower file.
+"""
+from __future__ import annotations
+
+import datetime
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from pandas import Timestamp
+
+# The format of the dates in the form and in borrower files: month-year, e.g. 01-2026
+DATE_FORMAT = "%m-%Y"
+
+# The repayment terms in years, and the range of the payment offset in months
+TERMS = (15, 35)
+MAX_PAYMENT_OFFSET = 84
+
+# The highest interest percentage, higher ones overflow the annuity factor
+MAX_INTEREST_PERC = 100
+
+# The columns of a borrower file, and the value of the optional ones when they are missing
+REQUIRED_COLUMNS = ("start_date", "years", "original_debt", "interest_perc")
+OPTIONAL_COLUMNS = {"payment_offset": 24, "payment_date": None, "payment_amount": None}
+
+# The separator between the extra payments of one borrower in the payment_date and payment_amount columns
+EVENT_SEPARATOR = ";"
+
+
+def parse_date(date: str, date_format: str = DATE_FORMAT) -> Timestamp:
+    """Returns the date as a timestamp, or raises a ValueError if it does not match the format."""
+    from pandas import Timestamp
+
+    try:
+        return Timestamp(datetime.datetime.strptime(date, date_format))
+    except (TypeError, ValueError):
+        raise ValueError("Wrong date format")
+
+
+def check_amount(amount: float, lower_limit: float = 0, upper_limit: float = None) -> None:
+    """Raises a ValueError if the amount is not above `lower_limit` or, if given, above `upper_limit`."""
+    if amount <= lower_limit:
+        raise ValueError("Amount too low")
+    if upper_limit and amount > upper_limit:
+        raise ValueError("Amount too high")
+
+
+def validate_borrowers(frame: pd.DataFrame, first_row: int = 0) -> dict:
+    """
+    Check and convert a chunk of a borrower file.
+
+    Args:
+        frame: the borrowers, one per row, with the `REQUIRED_COLUMNS` and optionally the `OPTIONAL_COLUMNS`
+        first_row: the row number of the first borrower in the file, for the error messages
+
+    Returns:
+        dict: the start month (datetime64[M]), years, original debt, interest percentage and payment offset arrays,
+            and the extra payments: a list of (date, amount) pairs per borrower.
+    """
+    import pandas as pd
+
+    missing = [column for column in REQUIRED_COLUMNS if column not in frame]
+    if missing:
+        raise ValueError(f"The borrower file misses the columns {missing}")
+    frame = frame.assign(**{column: value for column, value in OPTIONAL_COLUMNS.items() if column not in frame})
+
+    # Blank cells of an optional column get its default as well
+    frame = frame.fillna({column: value for column, value in OPTIONAL_COLUMNS.items() if value is not None})
+
+    # Dates can be month-year text or, in Parquet files, dates already
+    if pd.api.types.is_string_dtype(frame["start_date"]):
+        start_date = pd.to_datetime(frame["start_date"], format=DATE_FORMAT, errors="coerce")
+    else:
+        start_date = pd.to_datetime(frame["start_date"], errors="coerce")
+    years = pd.to_numeric(frame["years"], errors="coerce")
+    original_debt = pd.to_numeric(frame["original_debt"], errors="coerce")
+    interest_perc = pd.to_numeric(frame["interest_perc"], errors="coerce")
+    payment_offset = pd.to_numeric(frame["payment_offset"], errors="coerce")
+    whole_offset = payment_offset.between(1, MAX_PAYMENT_OFFSET) & (payment_offset % 1 == 0)
+
+    checks = {
+        "the start_date must be month-year, e.g. 01-2026": start_date.notna(),
+        f"the years must be one of {TERMS}": years.isin(TERMS),
+        "the original_debt must be above 0": original_debt > 0,
+        f"the interest_perc must be from 0 to {MAX_INTEREST_PERC}": interest_perc.between(0, MAX_INTEREST_PERC),
+        f"the payment_offset must be whole months from 1 to {MAX_PAYMENT_OFFSET}": whole_offset,
+    }
+    for message, valid in checks.items():
+        invalid = np.flatnonzero(~valid.to_numpy(dtype=bool))
+        if len(invalid):
+            raise ValueError(f"{_rows(invalid + first_row)}: {message}")
+
+    start_month = start_date.to_numpy().astype("datetime64[M]")
+    events = [
+        _parse_events(dates, amounts, start_month[idx], original_debt.iloc[idx], first_row + idx)
+        for idx, (dates, amounts) in enumerate(zip(frame["payment_date"], frame["payment_amount"]))
+    ]
+    return {
+        "start_month": start_month,
+        "years": years.to_numpy(dtype=np.int64),
+        "original_debt": original_debt.to_numpy(dtype=np.float64),
+        "interest_perc": interest_perc.to_numpy(dtype=np.float64),
+        "payment_offset": payment_offset.to_numpy(dtype=np.int64),
+        "events": events,
+    }
+
+
+def _parse_events(dates, amounts, start_month: np.datetime64, original_debt: float, row: int) -> list:
+    """Returns the (date, amount) pairs of the extra payments of a borrower, checked like the form does."""
+    import pandas as pd
+
+    if pd.isna(dates) and pd.isna(amounts):
+        return []
+    dates, amounts = str(dates).split(EVENT_SEPARATOR), str(amounts).split(EVENT_SEPARATOR)
+    if len(dates) != len(amounts):
+        raise ValueError(f"Row {row}: the payment_date and payment_amount need the same number of extra payments")
+
+    events = []
+    for text_date, text_amount in zip(dates, amounts):
+        try:
+            date, amount = parse_date(text_date.strip()), float(text_amount)
+            check_amount(amount, upper_limit=original_debt)
+        except ValueError as error:
+            raise ValueError(f"Row {row}: wrong extra payment of {text_amount} in {text_date}: {error}")
+        if np.datetime64(date, "M") < start_month:
+            raise ValueError(f"Row {row}: the extra payment of {date:%m-%Y} is before the start of the aanloopfase")
+        events.append((date, amount))
+    return events
+
+
+def _rows(rows: np.ndarray, limit: int = 5) -> str:
+    """Describe the row numbers of a check that fails, e.g. 'Rows 3, 8 and 12 more'."""
+    shown = ", ".join(str(row) for row in rows[:limit])
+    more = f" and {len(rows) - limit} more" if len(rows) > limit else ""
+    return f"Row{'s' if len(rows) > 1 else ''} {shown}{more}"
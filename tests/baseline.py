@@ -0,0 +1,142 @@
+"""
+The original pandas implementation of `get_inputs` and `one_time_payment`, before the calculations were vectorized.
+
+The tests compare the current implementation with it, so the optimizations do not change any result. Only the logging
+is left out.
+"""
+import numpy as np
+import pandas as pd
+from pandas import Timestamp
+
+
+def monthly_compound(original_debt: float, months_passed: int, interest: float) -> float:
+    return round(original_debt * (pow((1 + interest / 12), months_passed)), 2)
+
+
+def monthly_payment(remaining_debt: float, interest: float, months: int) -> float:
+    if interest == 0:
+        return round(remaining_debt / months, 2)
+    i = interest / 12
+    n = months
+    payment = ((1 + i) ** n * i) / ((1 + i) ** n - 1) * remaining_debt
+    return round(payment, 2)
+
+
+def amortize(debt: float, payment: float, interest: float, months: int) -> list:
+    """Returns the (debt, principal, interest) of every month of the payment phase."""
+    monthly_interest_r = interest / 12
+    remaining_balance = debt
+    schedule = []
+    for _ in range(months):
+        interest_payment = round(remaining_balance * monthly_interest_r, 2)
+        principal_payment = round(payment - interest_payment, 2)
+        remaining_balance -= principal_payment
+        remaining_balance = max(0, remaining_balance)
+        schedule.append((remaining_balance, principal_payment, interest_payment))
+    return schedule
+
+
+def aanloopfase(start_date: Timestamp, interest_rate: float, debt: float, payment_offset: int) -> tuple:
+    """Returns the aanloopfase dataframe and the debt after the aanloopfase."""
+    aanloopfase_dates = pd.date_range(start=start_date, freq="MS", periods=payment_offset)
+    current_debt = [monthly_compound(debt, x, interest_rate) for x in range(payment_offset)]
+    aanloopfase_df = pd.DataFrame(zip(aanloopfase_dates, current_debt), columns=["month", "debt"])
+    aanloopfase_df[["payment", "principal", "interest"]] = 0.0
+    return aanloopfase_df, aanloopfase_df["debt"].iloc[-1]
+
+
+def payment_phase(start_date: Timestamp, interest_rate: float, debt: float, months: int) -> tuple:
+    """Returns the payment phase dataframe and the monthly payment."""
+    payment = monthly_payment(debt, interest_rate, months)
+    payment_dates = pd.date_range(start=start_date, freq="MS", periods=months)
+    schedule = amortize(debt, payment, interest_rate, months)
+    rows = [
+        {"month": month, "debt": remaining, "payment": payment, "principal": principal, "interest": interest}
+        for month, (remaining, principal, interest) in zip(payment_dates, schedule)
+    ]
+    return pd.DataFrame(rows), payment
+
+
+def get_inputs(
+    years: int, start_date: Timestamp, original_debt: int, interest_perc: float, payment_offset: int
+) -> dict:
+    interest_rate = interest_perc / 100
+    months = 12 * years
+
+    aanloopfase_df, debt_after_aanloopfase = aanloopfase(start_date, interest_rate, original_debt, payment_offset)
+
+    first_payment_date = start_date + pd.DateOffset(months=payment_offset)
+    payment_phase_df, payment = payment_phase(first_payment_date, interest_rate, debt_after_aanloopfase, months)
+
+    df = pd.concat([aanloopfase_df, payment_phase_df], axis=0).reset_index(drop=True)
+    interest_paid = round(df["payment"].sum() - original_debt, 2)
+
+    return {"debt_over_time": df, "total_interest_paid": interest_paid, "monthly_payment": payment}
+
+
+def one_time_payment(
+    inputs: dict,
+    payment_amount: int,
+    payment_date: Timestamp,
+    interest_perc: float,
+    years: int,
+    start_date: Timestamp,
+    original_debt: int,
+    payment_offset: int,
+    current_monthly_payment: float,
+) -> dict:
+    interest_rate = interest_perc / 100
+
+    df = inputs["debt_over_time"]
+    idx = df.loc[df["month"] == payment_date].index[0]
+    df = df[: idx + 1].copy()
+
+    if df["debt"].iloc[idx] < payment_amount:
+        raise ValueError("The debt on the payment date is lower than the payment")
+    if df["debt"].iloc[idx] == payment_amount:
+        raise NotImplementedError("to be implemented")
+
+    df.at[idx, "debt"] -= payment_amount
+    df.at[idx, "payment"] += payment_amount
+    df.at[idx, "principal"] += payment_amount
+
+    if payment_date > start_date + pd.DateOffset(months=payment_offset - 1):
+        first_payment_date = start_date + pd.DateOffset(months=payment_offset)
+        months_passed = (
+            12 * (payment_date.year - first_payment_date.year) + payment_date.month - first_payment_date.month
+        )
+        months_left = (years * 12) - months_passed
+        rest_df, updated_payment = payment_phase(payment_date, interest_rate, df["debt"].iloc[-1], months_left)
+        rest_df = rest_df.drop(index=df.index[0], axis=0)
+
+        df = pd.concat([df, rest_df], axis=0).reset_index(drop=True)
+        interest_paid = round(df["payment"].sum() - original_debt, 2)
+
+        return {
+            "debt_over_time": df,
+            "total_interest_paid": interest_paid,
+            "monthly_payment": round(np.mean([updated_payment, current_monthly_payment]), 2),
+        }
+
+    debt_plus_interest = round(df["debt"].iloc[idx] * (pow((1 + interest_rate / 12), 1)), 2)
+    aanloopfase_df, debt_after_aanloopfase = aanloopfase(
+        payment_date + pd.DateOffset(months=1), interest_rate, debt_plus_interest, payment_offset - idx - 1
+    )
+    aanloopfase_df = pd.concat([df, aanloopfase_df], axis=0).reset_index(drop=True)
+
+    first_payment_date = start_date + pd.DateOffset(months=payment_offset)
+    payment_phase_df, payment = payment_phase(first_payment_date, interest_rate, debt_after_aanloopfase, 12 * years)
+
+    df = pd.concat([aanloopfase_df, payment_phase_df], axis=0).reset_index(drop=True)
+    interest_paid = round(df["payment"].sum() - original_debt, 2)
+
+    return {"debt_over_time": df, "total_interest_paid": interest_paid, "monthly_payment": payment}
+
+
+def assert_same_outputs(expected: dict, outputs: dict) -> None:
+    """Assert the outputs equal the baseline outputs exactly, with the schedule as a dataframe."""
+    expected_df = expected["debt_over_time"].astype({"month": "datetime64[ns]"})
+    df = outputs["debt_over_time"].to_pandas().astype({"month": "datetime64[ns]"})
+    pd.testing.assert_frame_equal(df, expected_df, check_exact=True, check_dtype=False)
+    assert outputs["total_interest_paid"] == expected["total_interest_paid"]
+    assert outputs["monthly_payment"] == expected["monthly_payment"]
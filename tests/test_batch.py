@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from duo_tool.batch import get_extra_payment_sweep, get_inputs_batch
+from duo_tool.inputs import get_inputs
+
+
+def _loans(seed: int, n: int) -> dict:
+    """Random loans as arrays, in the argument order of `get_inputs`."""
+    rng = np.random.default_rng(seed)
+    return {
+        "years": rng.choice([15, 35], n),
+        "start_date": pd.to_datetime(
+            [f"{year}-{month:02d}-01" for year, month in rng.integers([2020, 1], [2031, 13], (n, 2))]
+        ),
+        "original_debt": np.where(rng.random(n) < 0.5, rng.integers(100, 150_000, n), 30_000).astype(float),
+        "interest_perc": np.where(
+            rng.random(n) < 0.5, rng.choice([0, 0.46, 2.56, 2.95], n), rng.uniform(0, 6, n).round(2)
+        ),
+        "payment_offset": rng.integers(1, 85, n),
+    }
+
+
+def _loan(loans: dict, idx: int) -> tuple:
+    return tuple(values[idx].item() if isinstance(values, np.ndarray) else values[idx] for values in loans.values())
+
+
+def test_get_inputs_batch_equals_get_inputs():
+    loans = _loans(0, 200)
+    outputs = get_inputs_batch(*loans.values(), schedule=True)
+    schedules = outputs["debt_over_time"]
+    for idx in range(200):
+        expected = get_inputs(*_loan(loans, idx))
+        assert outputs["monthly_payment"][idx] == expected["monthly_payment"]
+        assert outputs["total_interest_paid"][idx] == expected["total_interest_paid"]
+        assert pd.Timestamp(outputs["last_payment_month"][idx]) == expected["last_payment_month"]
+
+        length = schedules["length"][idx]
+        assert length == len(expected["debt_over_time"])
+        for column in ["debt", "payment", "principal", "interest"]:
+            np.testing.assert_array_equal(schedules[column][idx, :length], getattr(expected["debt_over_time"], column))
+            assert np.isnan(schedules[column][idx, length:]).all()
+
+
+def test_get_inputs_batch_broadcasts_single_values():
+    outputs = get_inputs_batch(35, pd.Timestamp("2024-01-01"), [10_000, 20_000], 2.56, 24)
+    expected = [
+        get_inputs(35, pd.Timestamp("2024-01-01"), debt, 2.56, 24)["monthly_payment"] for debt in [10_000, 20_000]
+    ]
+    assert outputs["monthly_payment"].tolist() == expected
+
+
+def test_get_inputs_batch_rejects_offset_below_one():
+    with pytest.raises(ValueError):
+        get_inputs_batch(35, pd.Timestamp("2024-01-01"), 10_000, 2.56, [24, 0])
+
+
+@pytest.mark.parametrize(
+    "loan", [(35, pd.Timestamp("2024-01-01"), 30_000, 2.56, 24), (15, pd.Timestamp("2021-07-01"), 8_000, 0, 1)]
+)
+def test_extra_payment_sweep_equals_get_inputs(loan):
+    extra_payment = [0, 0.01, 25, 100, 1_000]
+    outputs = get_extra_payment_sweep(*loan, extra_payment)
+    for idx, amount in enumerate(extra_payment):
+        expected = get_inputs(*loan, extra_payment=amount)
+        assert outputs["monthly_payment"] == expected["monthly_payment"]
+        assert outputs["total_interest_paid"][idx] == expected["total_interest_paid"]
+        assert pd.Timestamp(outputs["last_payment_month"][idx]) == expected["last_payment_month"]
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from duo_tool import cache
+from duo_tool.cache import LRUCache, cached_get_inputs, cached_one_time_payment
+from duo_tool.inputs import get_inputs, one_time_payment
+from duo_tool.schedule import Schedule
+
+LOAN = (35, pd.Timestamp("2024-01-01"), 30_000, 2.56, 24)
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    """Start every test without cached results, and without the store on disk."""
+    monkeypatch.setattr(cache, "store", None)
+    cache.inputs_cache.clear()
+    cache.one_time_payment_cache.clear()
+    yield
+    cache.inputs_cache.clear()
+    cache.one_time_payment_cache.clear()
+
+
+def _result(value: float) -> dict:
+    """A result with a one month schedule, like those of `get_inputs`."""
+    schedule = Schedule.empty(24288, 1)
+    for column in ["debt", "payment", "principal", "interest"]:
+        getattr(schedule, column)[:] = value
+    return {"debt_over_time": schedule, "total_interest_paid": value}
+
+
+def test_evicts_the_least_recently_used():
+    lru = LRUCache(maxsize=2)
+    calls = []
+
+    def get(key):
+        return lru.get(key, lambda: calls.append(key) or _result(key))
+
+    get(1)
+    get(2)
+    get(1)  # 2 is now the least recently used
+    get(3)
+    assert calls == [1, 2, 3]
+
+    get(1)
+    get(3)
+    get(2)  # 2 was evicted, and its calculation evicts 1
+    get(1)
+    assert calls == [1, 2, 3, 2, 1]
+    assert lru.info() == {"hits": 3, "misses": 5, "size": 2, "maxsize": 2}
+
+
+def test_counts_hits_and_misses():
+    lru = LRUCache(maxsize=10)
+    for key in [1, 2, 1, 1, 3, 2]:
+        assert lru.get(key, lambda: _result(key))["total_interest_paid"] == key
+    assert lru.info() == {"hits": 3, "misses": 3, "size": 3, "maxsize": 10}
+
+    lru.clear()
+    assert lru.info() == {"hits": 0, "misses": 0, "size": 0, "maxsize": 10}
+
+
+def test_errors_are_not_cached():
+    lru = LRUCache()
+
+    def fail():
+        raise ValueError("Amount too high")
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            lru.get("key", fail)
+    assert lru.info()["misses"] == 2 and lru.info()["size"] == 0
+
+
+def test_results_are_copies():
+    lru = LRUCache()
+    first = lru.get("key", lambda: _result(1.0))
+    first["debt_over_time"].debt[:] = -1
+    first["total_interest_paid"] = -1
+
+    second = lru.get("key", lambda: _result(2.0))
+    assert second["debt_over_time"].debt.tolist() == [1.0]
+    assert second["total_interest_paid"] == 1.0
+    assert not np.shares_memory(first["debt_over_time"].debt, second["debt_over_time"].debt)
+
+
+def test_read_only_results_are_shared():
+    """Schedules from the store cannot be changed, so they are returned without copying."""
+    result = _result(1.0)
+    for column in ["debt", "payment", "principal", "interest"]:
+        getattr(result["debt_over_time"], column).flags.writeable = False
+    lru = LRUCache()
+    first, second = lru.get("key", lambda: result), lru.get("key", lambda: result)
+    assert first["debt_over_time"].debt is second["debt_over_time"].debt
+    with pytest.raises(ValueError):
+        first["debt_over_time"].debt[0] = -1
+
+
+def test_cached_get_inputs_equals_get_inputs():
+    expected = get_inputs(*LOAN)
+    for args in [LOAN, (35.0, "2024-01-01", 30_000.0, 2.56, np.int64(24))]:
+        outputs = cached_get_inputs(*args)
+        assert outputs["monthly_payment"] == expected["monthly_payment"]
+        assert outputs["total_interest_paid"] == expected["total_interest_paid"]
+        np.testing.assert_array_equal(outputs["debt_over_time"].debt, expected["debt_over_time"].debt)
+
+    # Equal inputs of other types give the same key
+    assert cache.inputs_cache.info()["hits"] == 1
+
+
+def test_cached_one_time_payment_equals_one_time_payment():
+    years, start_date, original_debt, interest_perc, payment_offset = LOAN
+    inputs = get_inputs(*LOAN)
+    arguments = dict(
+        inputs=None,
+        payment_amount=5_000,
+        payment_date=pd.Timestamp("2030-03-01"),
+        interest_perc=interest_perc,
+        years=years,
+        start_date=start_date,
+        original_debt=original_debt,
+        payment_offset=payment_offset,
+        current_monthly_payment=inputs["monthly_payment"],
+    )
+    expected = one_time_payment(**arguments)
+    for _ in range(2):
+        outputs = cached_one_time_payment(**arguments)
+        assert outputs["monthly_payment"] == expected["monthly_payment"]
+        assert outputs["total_interest_paid"] == expected["total_interest_paid"]
+        np.testing.assert_array_equal(outputs["debt_over_time"].debt, expected["debt_over_time"].debt)
+    assert cache.one_time_payment_cache.info()["hits"] == 1
+
+    # The deprecated inputs still warn on a hit
+    with pytest.warns(DeprecationWarning, match="pass None"):
+        cached_one_time_payment(**{**arguments, "inputs": inputs})
@@ -0,0 +1,122 @@
+import random
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from duo_tool import cli
+from duo_tool.events import ExtraPayment, ScheduleEngine
+from duo_tool.inputs import get_inputs
+from duo_tool.schedule import COLUMNS
+
+
+def _borrowers(seed: int, n: int) -> pd.DataFrame:
+    """Random borrowers as in a borrower file, a third of them with one or two extra payments."""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        start = pd.Timestamp(f"{rng.randint(2020, 2030)}-{rng.randint(1, 12):02d}-01")
+        original_debt = round(rng.uniform(1_000, 90_000), 2)
+        row = {
+            "start_date": f"{start:%m-%Y}",
+            "years": rng.choice([15, 35]),
+            "original_debt": original_debt,
+            "interest_perc": rng.choice([0, 0.46, 2.56, 2.95]),
+            "payment_offset": rng.randint(1, 84),
+            "payment_date": None,
+            "payment_amount": None,
+        }
+        if rng.random() < 1 / 3:
+            dates = sorted(start + pd.DateOffset(months=rng.randint(0, 120)) for _ in range(rng.randint(1, 2)))
+            row["payment_date"] = ";".join(f"{date:%m-%Y}" for date in dates)
+            row["payment_amount"] = ";".join(str(rng.randint(100, int(original_debt / 4))) for _ in dates)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def _expected(row) -> dict:
+    """The outputs of a borrower, with the engine for the extra payments like the batch runner."""
+    loan = (row.years, pd.to_datetime(row.start_date, format="%m-%Y"), row.original_debt, row.interest_perc)
+    if pd.isna(row.payment_date):
+        return get_inputs(*loan, row.payment_offset)
+    events = [
+        ExtraPayment(pd.to_datetime(date, format="%m-%Y"), float(amount))
+        for date, amount in zip(row.payment_date.split(";"), row.payment_amount.split(";"))
+    ]
+    return ScheduleEngine(*loan, row.payment_offset).calculate(events)
+
+
+def _main(monkeypatch, *args) -> int:
+    monkeypatch.setattr(sys, "argv", ["duo_tool.cli", *map(str, args)])
+    return cli.main()
+
+
+def test_end_to_end(tmp_path, monkeypatch):
+    borrowers = _borrowers(0, 25)
+    borrowers.to_csv(tmp_path / "borrowers.csv", index=False)
+    summary_path, schedules_path = tmp_path / "summary.csv", tmp_path / "schedules.parquet"
+    args = [tmp_path / "borrowers.csv", "--summary", summary_path, "--schedules", schedules_path]
+    assert _main(monkeypatch, *args, "--workers", 2, "--chunk-size", 4) == 0
+
+    summary = pd.read_csv(summary_path, parse_dates=["last_payment_month"])
+    schedules = pd.read_parquet(schedules_path)
+    assert summary["borrower"].tolist() == list(range(len(borrowers)))
+    assert schedules["borrower"].is_monotonic_increasing
+    for row, (_, result), (_, schedule) in zip(
+        borrowers.itertuples(), summary.iterrows(), schedules.groupby("borrower")
+    ):
+        expected = _expected(row)
+        expected_schedule = expected["debt_over_time"]
+        assert result["monthly_payment"] == expected["monthly_payment"]
+        assert result["total_interest_paid"] == expected["total_interest_paid"]
+        assert result["last_payment_month"] == expected_schedule.last_month
+        assert pd.to_datetime(schedule["month"]).tolist() == expected_schedule.to_pandas()["month"].tolist()
+        for column in COLUMNS:
+            np.testing.assert_array_equal(schedule[column], getattr(expected_schedule, column))
+
+    # The same file calculated in this process gives the same files
+    serial = [args[0], "--schedules", tmp_path / "serial.csv", "--workers", 1, "--chunk-size", 7]
+    assert _main(monkeypatch, *serial) == 0
+    pd.testing.assert_frame_equal(
+        pd.read_csv(tmp_path / "serial.csv", float_precision="round_trip"), schedules.astype({"month": str})
+    )
+
+
+def test_parquet_input(tmp_path):
+    pytest.importorskip("pyarrow")
+    borrowers = _borrowers(1, 10)
+    borrowers.to_parquet(tmp_path / "borrowers.parquet")
+    assert cli.run(tmp_path / "borrowers.parquet", tmp_path / "summary.parquet", workers=1, chunk_size=3) == 10
+    summary = pd.read_parquet(tmp_path / "summary.parquet")
+    assert summary["total_interest_paid"].tolist() == [
+        _expected(row)["total_interest_paid"] for row in borrowers.itertuples()
+    ]
+
+
+def test_arguments(tmp_path, monkeypatch, capsys):
+    # An output file is required
+    with pytest.raises(SystemExit) as exit_info:
+        _main(monkeypatch, tmp_path / "borrowers.csv")
+    assert exit_info.value.code == 2
+    assert "--summary and/or --schedules" in capsys.readouterr().err
+
+    with pytest.raises(SystemExit):
+        _main(monkeypatch, tmp_path / "borrowers.csv", "--summary", tmp_path / "summary.csv", "--workers", "two")
+    with pytest.raises(ValueError):
+        cli.run(tmp_path / "borrowers.csv")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_wrong_borrower_leaves_no_output(tmp_path, monkeypatch, workers):
+    borrowers = _borrowers(2, 12)
+    borrowers.loc[9, "interest_perc"] = -1
+    borrowers.to_csv(tmp_path / "borrowers.csv", index=False)
+    args = [tmp_path / "borrowers.csv", "--summary", tmp_path / "summary.csv", "--workers", workers]
+    assert _main(monkeypatch, *args, "--chunk-size", 4) == 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["borrowers.csv"]
+
+
+def test_unknown_file_type(tmp_path, monkeypatch):
+    (tmp_path / "borrowers.xlsx").write_text("")
+    assert _main(monkeypatch, tmp_path / "borrowers.xlsx", "--summary", tmp_path / "summary.csv") == 1
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from duo_tool.draagkracht import MINIMUM_WAGE, REGIMES, draagkracht, get_draagkracht_scenarios, income_paths
+from duo_tool.inputs import get_inputs
+
+LOANS = [(35, 30_000, 2.56, 24), (15, 12_000, 0.46, 7), (35, 50_000, 0, 84)]
+
+
+@pytest.mark.parametrize("years", REGIMES)
+def test_draagkracht_around_the_threshold(years):
+    percentage, threshold = REGIMES[years]
+    threshold_income = threshold * MINIMUM_WAGE
+    income = [0, threshold_income - 1_000, threshold_income, threshold_income + 1, threshold_income + 12_000]
+    expected = [0, 0, 0, round(percentage / 12, 2), round(1_000 * percentage, 2)]
+    assert draagkracht(income, years).tolist() == expected
+
+    # The threshold follows the minimum wage
+    assert draagkracht(threshold_income, years, minimum_wage=MINIMUM_WAGE / 2) == round(
+        threshold_income / 2 * percentage / 12, 2
+    )
+
+
+def test_draagkracht_of_unknown_term():
+    with pytest.raises(ValueError):
+        draagkracht(50_000, 20)
+
+
+def test_income_paths():
+    np.testing.assert_allclose(income_paths(30_000, [0.0, 0.1], 3), [[30_000] * 3, [30_000, 33_000, 36_300]])
+
+    # The growth of the last year does not count, as there is no next year
+    np.testing.assert_allclose(income_paths(30_000, [[0.5, 0.0, 0.3]], 3), [[30_000, 45_000, 45_000]])
+
+
+@pytest.mark.parametrize("loan", LOANS)
+def test_income_above_the_cap_equals_get_inputs(loan):
+    years, original_debt, interest_perc, payment_offset = loan
+    expected = get_inputs(years, pd.Timestamp("2024-01-01"), original_debt, interest_perc, payment_offset)
+    outputs = get_draagkracht_scenarios(*loan, income_paths(1_000_000, [0.0, 0.02], years))
+    assert outputs["monthly_payment"] == expected["monthly_payment"]
+    assert outputs["total_interest_paid"].tolist() == [expected["total_interest_paid"]] * 2
+    assert outputs["forgiven_debt"].tolist() == [0, 0]
+    assert outputs["capped_months"].tolist() == [0, 0]
+
+
+@pytest.mark.parametrize("loan", LOANS)
+def test_income_at_or_below_the_threshold_pays_nothing(loan):
+    years, original_debt, interest_perc, payment_offset = loan
+    threshold_income = REGIMES[years][1] * MINIMUM_WAGE
+    outputs = get_draagkracht_scenarios(*loan, income_paths(threshold_income, [0.0, -0.01], years))
+
+    # Without payments the debt after the aanloopfase grows with the interest, and all of it is forgiven
+    debt = get_inputs(years, pd.Timestamp("2024-01-01"), original_debt, interest_perc, payment_offset)[
+        "debt_over_time"
+    ].debt[payment_offset - 1]
+    assert outputs["total_paid"].tolist() == [0, 0]
+    assert outputs["capped_months"].tolist() == [12 * years] * 2
+    assert (outputs["forgiven_debt"] >= debt).all()
+    if interest_perc == 0:
+        assert outputs["forgiven_debt"].tolist() == [debt, debt]
+
+
+def test_income_between_threshold_and_cap():
+    loan = LOANS[0]
+    years = loan[0]
+    uncapped = get_draagkracht_scenarios(*loan, income_paths(1_000_000, 0.0, years))["monthly_payment"]
+
+    # The income at which the draagkracht equals the payment, and incomes around it
+    percentage, threshold = REGIMES[years]
+    break_even = threshold * MINIMUM_WAGE + uncapped * 12 / percentage
+    income = np.full((3, years), break_even)
+    income[0, :10] = break_even - 3_000
+    income[1, 20:] = break_even - 600
+    income[2, :] = break_even - 6_000
+    outputs = get_draagkracht_scenarios(*loan, income)
+
+    assert outputs["capped_months"].tolist() == [120, 12 * (years - 20), 12 * years]
+    assert (outputs["forgiven_debt"] > 0).all()
+    assert outputs["forgiven_debt"][2] > outputs["forgiven_debt"][0]
+    assert (outputs["total_paid"] < uncapped * 12 * years).all()
+
+    # Every month pays the draagkracht of its year, or the payment if that is lower
+    cap = np.repeat(draagkracht(income, years), 12, axis=1)
+    np.testing.assert_allclose(outputs["total_paid"], np.minimum(cap, uncapped).sum(axis=1), atol=0.005)
+
+
+def test_income_per_year():
+    with pytest.raises(ValueError):
+        get_draagkracht_scenarios(35, 30_000, 2.56, 24, np.full((2, 34), 50_000))
@@ -0,0 +1,143 @@
+import random
+
+import baseline
+import numpy as np
+import pandas as pd
+import pytest
+
+from duo_tool.events import ExtraPayment, ScheduleEngine
+from duo_tool.inputs import get_inputs, one_time_payment
+
+START_DATE = pd.Timestamp("2024-01-01")
+LOAN = {"years": 35, "start_date": START_DATE, "original_debt": 30_000, "interest_perc": 2.56, "payment_offset": 24}
+
+
+def _one_time_payment(inputs: dict, amount: float, month: int) -> dict:
+    """Extra payment of `amount` in the `month`-th month of `LOAN`."""
+    payment_date = START_DATE + pd.DateOffset(months=month)
+    return one_time_payment(
+        None, amount, payment_date, current_monthly_payment=inputs["monthly_payment"], **_arguments(LOAN)
+    )
+
+
+def _arguments(loan: dict) -> dict:
+    return {key: loan[key] for key in ["interest_perc", "years", "start_date", "original_debt", "payment_offset"]}
+
+
+def _loans(seed: int, n: int) -> list:
+    rng = random.Random(seed)
+    return [
+        (
+            rng.choice([15, 35]),
+            pd.Timestamp(f"{rng.randint(2020, 2030)}-{rng.randint(1, 12):02d}-01"),
+            rng.choice([10_000, 30_000, rng.randint(100, 150_000)]),
+            rng.choice([2.56, 0.46, 0, round(rng.uniform(0, 6), 2)]),
+            rng.randint(1, 84),
+        )
+        for _ in range(n)
+    ]
+
+
+@pytest.mark.parametrize("loan", _loans(0, 30))
+def test_payment_phase_payment_recalculates_the_months_left(loan):
+    """After an extra payment in the payment phase, the rest of the debt is paid off in the months that are left."""
+    years, start_date, original_debt, interest_perc, payment_offset = loan
+    inputs = get_inputs(*loan)
+    months = payment_offset + 12 * years
+    rng = random.Random(repr(loan))
+    month = rng.randint(payment_offset, months - 2)
+    amount = rng.randint(1, max(1, int(inputs["debt_over_time"].debt[month]) - 1))
+
+    # The schedule up to the extra payment, followed by a new payment phase over the months after it
+    before = inputs["debt_over_time"][: month + 1].to_pandas()
+    before.loc[month, ["payment", "principal"]] += amount
+    before.loc[month, "debt"] -= amount
+    after, payment = baseline.payment_phase(
+        start_date + pd.DateOffset(months=month + 1), interest_perc / 100, before["debt"].iloc[-1], months - month - 1
+    )
+    df = pd.concat([before, after]).reset_index(drop=True)
+    expected = {
+        "debt_over_time": df,
+        "total_interest_paid": round(df["payment"].sum() - original_debt, 2),
+        "monthly_payment": round(np.mean([payment, inputs["monthly_payment"]]), 2),
+    }
+
+    outputs = one_time_payment(
+        None,
+        amount,
+        start_date + pd.DateOffset(months=month),
+        interest_perc,
+        years,
+        start_date,
+        original_debt,
+        payment_offset,
+        inputs["monthly_payment"],
+    )
+    baseline.assert_same_outputs(expected, outputs)
+    assert len(outputs["debt_over_time"]) == months
+
+
+def test_payment_phase_payment_has_no_extra_month():
+    """The original annuity counted the month of the extra payment as well, and paid it without showing it."""
+    inputs = get_inputs(**LOAN)
+    schedule = _one_time_payment(inputs, 5_000, 100)["debt_over_time"]
+
+    # The month after the extra payment pays off its own principal only
+    assert schedule.debt[101] == schedule.debt[100] - schedule.principal[101]
+    assert schedule.payment[101] == baseline.monthly_payment(schedule.debt[100], 0.0256, 444 - 101)
+
+    original_inputs = baseline.get_inputs(**LOAN)
+    original = baseline.one_time_payment(
+        original_inputs,
+        5_000,
+        START_DATE + pd.DateOffset(months=100),
+        **_arguments(LOAN),
+        current_monthly_payment=original_inputs["monthly_payment"],
+    )["debt_over_time"]
+    assert original["debt"][101] != original["debt"][100] - original["principal"][101]
+    assert original["payment"][101] == baseline.monthly_payment(original["debt"][100], 0.0256, 444 - 100)
+    assert schedule.payment[101] > original["payment"][101]
+
+
+@pytest.mark.parametrize("month", [10, 23, 24, 100, 443])
+def test_full_payoff_ends_the_schedule(month):
+    inputs = get_inputs(**LOAN)
+    debt = inputs["debt_over_time"].debt[month]
+
+    outputs = _one_time_payment(inputs, debt, month)
+    schedule = outputs["debt_over_time"]
+    assert len(schedule) == month + 1
+    assert outputs["debt_over_time"].last_month == START_DATE + pd.DateOffset(months=month)
+    assert schedule.debt[-1] == 0
+    assert outputs["monthly_payment"] == 0
+    assert outputs["total_interest_paid"] == round(schedule.payment.sum() - LOAN["original_debt"], 2)
+    np.testing.assert_array_equal(schedule.debt[:month], inputs["debt_over_time"].debt[:month])
+
+
+def test_payment_above_the_debt_is_refused():
+    inputs = get_inputs(**LOAN)
+    with pytest.raises(ValueError):
+        _one_time_payment(inputs, inputs["debt_over_time"].debt[100] + 0.01, 100)
+
+
+@pytest.mark.parametrize("loan", _loans(1, 15))
+def test_incremental_engine_equals_fresh_engine(loan):
+    rng = random.Random(repr(loan))
+    months = loan[4] + 12 * loan[0]
+    engine = ScheduleEngine(*loan)
+    for _ in range(6):
+        events = [
+            ExtraPayment(loan[1] + pd.DateOffset(months=rng.randint(0, months - 1)), rng.randint(1, 300))
+            for _ in range(rng.randint(0, 4))
+        ]
+        try:
+            expected = ScheduleEngine(*loan).calculate(events)
+        except ValueError:
+            with pytest.raises(ValueError):
+                engine.calculate(events)
+            continue
+
+        outputs = engine.calculate(events)
+        assert outputs["total_interest_paid"] == expected["total_interest_paid"]
+        assert outputs["monthly_payment"] == expected["monthly_payment"]
+        pd.testing.assert_frame_equal(outputs["debt_over_time"].to_pandas(), expected["debt_over_time"].to_pandas())
@@ -0,0 +1,132 @@
+import random
+from fractions import Fraction
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from duo_tool.fixed_point import (
+    DENOMINATOR,
+    FACTOR_SCALE,
+    ROUNDING,
+    compound_cents,
+    divide_round,
+    get_inputs_cents,
+    get_summary_cents,
+    to_cents,
+    to_rate,
+)
+
+
+def _round(value: Fraction, rounding: str) -> int:
+    """Round an exact fraction to an integer."""
+    floor = value.numerator // value.denominator
+    remainder = value - floor
+    if remainder > Fraction(1, 2) or (remainder == Fraction(1, 2) and (rounding == "half_up" or floor % 2 == 1)):
+        return floor + 1
+    return floor
+
+
+def _reference(years: int, original_debt: float, interest_perc: float, payment_offset: int, rounding: str) -> dict:
+    """The loan month by month with python integers and fractions, see the `duo_tool.fixed_point` docstring."""
+    debt = round(original_debt * 100)
+    rate = Fraction(round(interest_perc * 10_000), DENOMINATOR)
+    months = 12 * years
+
+    schedule = []
+    current = debt
+    for _ in range(payment_offset):
+        schedule.append((current, 0, 0, 0))
+        current += _round(current * rate, rounding)
+    debt_after_aanloopfase = schedule[-1][0]
+
+    if rate == 0:
+        factor = _round(Fraction(FACTOR_SCALE, months), "half_even")
+    else:
+        factor = _round(rate * (1 + rate) ** months / ((1 + rate) ** months - 1) * FACTOR_SCALE, "half_even")
+    payment = _round(Fraction(debt_after_aanloopfase * factor, FACTOR_SCALE), rounding)
+
+    remaining = debt_after_aanloopfase
+    for _ in range(months):
+        interest = _round(remaining * rate, rounding)
+        principal = payment - interest
+        remaining = max(0, remaining - principal)
+        schedule.append((remaining, payment, principal, interest))
+
+    return {
+        "schedule": np.array(schedule, dtype=np.int64).T,
+        "total_interest_paid": payment * months - debt,
+        "monthly_payment": payment,
+        "debt_after_aanloopfase": debt_after_aanloopfase,
+    }
+
+
+def _loans(seed: int, n: int) -> list:
+    """Random (years, original debt, interest percentage, payment offset) loans, with at most 4 decimals of interest."""
+    rng = random.Random(seed)
+    return [
+        (
+            rng.choice([15, 35]),
+            rng.choice([6.0, 10_000, round(rng.uniform(100, 150_000), 2)]),
+            rng.choice([0, 0.46, 1, 2.56, round(rng.uniform(0, 6), 4)]),
+            rng.randint(1, 84),
+        )
+        for _ in range(n)
+    ]
+
+
+@pytest.mark.parametrize("rounding", ROUNDING)
+def test_divide_round(rounding):
+    # Negative halves round to even or away from zero as well
+    numerator = np.arange(-50, 51)
+    expected = [int(np.sign(value)) * _round(Fraction(abs(value), 10), rounding) for value in numerator.tolist()]
+    assert divide_round(numerator, 10, rounding).tolist() == expected
+
+
+@pytest.mark.parametrize("rounding", ROUNDING)
+def test_compound_cents_rounds_half_cents(rounding):
+    # 1% of 6 euros a month is exactly half a cent
+    assert compound_cents(600, to_rate(1), 2, rounding).tolist() == [[600, 600 if rounding == "half_even" else 601]]
+
+
+@pytest.mark.parametrize("rounding", ROUNDING)
+@pytest.mark.parametrize("loan", _loans(0, 25))
+def test_get_inputs_cents_equals_reference(loan, rounding):
+    years, original_debt, interest_perc, payment_offset = loan
+    expected = _reference(*loan, rounding)
+    outputs = get_inputs_cents(
+        years, pd.Timestamp("2024-01-01"), original_debt, interest_perc, payment_offset, rounding
+    )
+
+    schedule = outputs["debt_over_time"]
+    np.testing.assert_array_equal(
+        np.stack([schedule.debt, schedule.payment, schedule.principal, schedule.interest]), expected["schedule"]
+    )
+    assert outputs["monthly_payment"] == expected["monthly_payment"]
+    assert outputs["total_interest_paid"] == expected["total_interest_paid"]
+
+
+@pytest.mark.parametrize("rounding", ROUNDING)
+def test_get_summary_cents_equals_reference(rounding):
+    loans = _loans(1, 300)
+    outputs = get_summary_cents(*(np.array(values) for values in zip(*loans)), rounding)
+    for idx, loan in enumerate(loans):
+        expected = _reference(*loan, rounding)
+        for key in ["monthly_payment", "total_interest_paid", "debt_after_aanloopfase"]:
+            assert outputs[key][idx] == expected[key]
+
+
+def test_to_cents_and_rate():
+    assert to_cents([0.5, 12.34, 100_000]).tolist() == [50, 1234, 10_000_000]
+    assert to_rate([2.56, 0.0001]).tolist() == [25_600, 1]
+    with pytest.raises(ValueError):
+        to_rate(2.56001)
+
+
+@pytest.mark.parametrize("payment_offset", [0, -1])
+def test_payment_offset_below_one_month(payment_offset):
+    # Without an aanloopfase month there is no debt to start the payment phase from
+    with pytest.raises(ValueError, match="payment offset"):
+        get_inputs_cents(35, pd.Timestamp("2024-01-01"), 10_000, 2.56, payment_offset)
+    with pytest.raises(ValueError, match="payment offset"):
+        get_summary_cents(35, 10_000, 2.56, [24, payment_offset])
@@ -0,0 +1,131 @@
+import random
+
+import baseline
+import numpy as np
+import pandas as pd
+import pytest
+
+from duo_tool.calculations import PaymentPhase
+from duo_tool.inputs import get_inputs, get_summary, one_time_payment
+
+
+def _loans(seed: int, n: int) -> list:
+    """Random (years, start date, original debt, interest percentage, payment offset) loans."""
+    rng = random.Random(seed)
+    return [
+        (
+            rng.choice([15, 35]),
+            pd.Timestamp(f"{rng.randint(2020, 2030)}-{rng.randint(1, 12):02d}-01"),
+            rng.choice([10_000, 30_000, rng.randint(100, 150_000)]),
+            rng.choice([2.56, 0.46, 0, round(rng.uniform(0, 6), 2)]),
+            rng.randint(1, 84),
+        )
+        for _ in range(n)
+    ]
+
+
+@pytest.mark.parametrize("loan", _loans(0, 40))
+def test_get_inputs_equals_baseline(loan):
+    expected = baseline.get_inputs(*loan)
+    outputs = get_inputs(*loan)
+    baseline.assert_same_outputs(expected, outputs)
+    assert outputs["last_payment_month"] == expected["debt_over_time"]["month"].iloc[-1]
+
+
+@pytest.mark.parametrize("loan", _loans(2, 200))
+def test_get_summary_equals_get_inputs(loan):
+    expected = get_inputs(*loan)
+    summary = get_summary(*loan)
+    assert summary["monthly_payment"] == expected["monthly_payment"]
+    assert summary["total_interest_paid"] == expected["total_interest_paid"]
+    assert summary["last_payment_month"] == expected["last_payment_month"]
+    assert summary["debt_after_aanloopfase"] == expected["debt_over_time"].debt[loan[4] - 1]
+
+
+@pytest.mark.parametrize("loan", [loan for loan in _loans(1, 40) if loan[4] > 1])
+def test_one_time_payment_in_aanloopfase_equals_baseline(loan):
+    years, start_date, original_debt, interest_perc, payment_offset = loan
+    expected_inputs = baseline.get_inputs(*loan)
+    rng = random.Random(repr(loan))
+
+    # The baseline treats a payment in the last month of the aanloopfase as one in the payment phase
+    month = rng.randint(0, payment_offset - 2)
+    debt = expected_inputs["debt_over_time"]["debt"].iloc[month]
+    amount = rng.randint(1, max(1, int(debt) - 1))
+    payment_date = start_date + pd.DateOffset(months=month)
+    arguments = (amount, payment_date, interest_perc, years, start_date, original_debt, payment_offset)
+
+    expected = baseline.one_time_payment(expected_inputs, *arguments, expected_inputs["monthly_payment"])
+    inputs = get_inputs(*loan)
+    baseline.assert_same_outputs(expected, one_time_payment(None, *arguments, inputs["monthly_payment"]))
+
+
+def test_one_time_payment_inputs_are_deprecated():
+    loan = (35, pd.Timestamp("2024-01-01"), 30_000, 2.56, 24)
+    inputs = get_inputs(*loan)
+    arguments = (5_000, pd.Timestamp("2030-03-01"), 2.56, 35, loan[1], 30_000, 24, inputs["monthly_payment"])
+    expected = one_time_payment(None, *arguments)
+    with pytest.warns(DeprecationWarning, match="pass None"):
+        outputs = one_time_payment(inputs, *arguments)
+    assert outputs["monthly_payment"] == expected["monthly_payment"]
+    assert outputs["total_interest_paid"] == expected["total_interest_paid"]
+    np.testing.assert_array_equal(outputs["debt_over_time"].debt, expected["debt_over_time"].debt)
+
+
+@pytest.mark.parametrize("loan", _loans(3, 30))
+def test_rate_change_to_the_same_rate_changes_nothing(loan):
+    expected = get_inputs(*loan)
+    rng = random.Random(repr(loan))
+    for month in [0, rng.randint(0, loan[4]), loan[4], loan[4] + rng.randint(1, 12 * loan[0] - 1)]:
+        outputs = get_inputs(*loan, rate_schedule=[(loan[1] + pd.DateOffset(months=month), loan[3])])
+        assert outputs["monthly_payment"] == expected["monthly_payment"]
+        assert outputs["total_interest_paid"] == expected["total_interest_paid"]
+        for column in ["debt", "payment", "principal", "interest"]:
+            np.testing.assert_array_equal(
+                getattr(outputs["debt_over_time"], column), getattr(expected["debt_over_time"], column)
+            )
+
+
+@pytest.mark.parametrize("loan", _loans(4, 30))
+def test_rate_change_in_payment_phase_recalculates_the_payment(loan):
+    years, start_date, original_debt, interest_perc, payment_offset = loan
+    months = 12 * years
+    change = payment_offset + random.Random(repr(loan)).randint(1, months - 1)
+    new_perc = round(interest_perc + 1.5, 2)
+    expected = get_inputs(*loan)
+    outputs = get_inputs(*loan, rate_schedule=[(start_date + pd.DateOffset(months=change), new_perc)])
+
+    # Nothing changes before the new rate, after it the remaining debt is paid off over the remaining months
+    schedule, expected_schedule = outputs["debt_over_time"], expected["debt_over_time"]
+    assert outputs["monthly_payment"] == expected["monthly_payment"]
+    np.testing.assert_array_equal(schedule.debt[:change], expected_schedule.debt[:change])
+    payment = PaymentPhase._monthly_payment(
+        schedule.debt[change - 1], new_perc / 100, months - (change - payment_offset)
+    )
+    assert (schedule.payment[change:] == payment).all()
+    assert schedule.interest[change] == round(schedule.debt[change - 1] * new_perc / 1200, 2)
+    assert len(schedule) == payment_offset + months
+    assert schedule.debt[-1] < schedule.payment[-1]
+    assert outputs["total_interest_paid"] > expected["total_interest_paid"]
+
+
+@pytest.mark.parametrize("loan", _loans(5, 30))
+def test_extra_payment_ends_the_schedule_when_paid_off(loan):
+    years, start_date, original_debt, interest_perc, payment_offset = loan
+    expected = get_inputs(*loan)
+    extra = round(expected["monthly_payment"] * 2 + 1, 2)
+    outputs = get_inputs(*loan, extra_payment=extra)
+
+    schedule = outputs["debt_over_time"]
+    phase = schedule[payment_offset:]
+    assert outputs["monthly_payment"] == expected["monthly_payment"]
+    assert len(phase) < 12 * years
+    assert outputs["last_payment_month"] == schedule.last_month
+
+    # Every month but the last pays the extra payment, the last only pays off what is left
+    assert (phase.payment[:-1] == expected["monthly_payment"] + extra).all()
+    assert (phase.debt[:-1] > 0).all() and phase.debt[-1] == 0
+    assert phase.payment[-1] == round(phase.debt[-2] + phase.interest[-1], 2)
+    assert phase.principal.sum() == pytest.approx(schedule.debt[payment_offset - 1], abs=1e-6)
+    assert outputs["total_interest_paid"] == round(schedule.payment.sum() - original_debt, 2)
+    assert outputs["total_interest_paid"] < expected["total_interest_paid"] or interest_perc == 0
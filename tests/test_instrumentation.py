@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+
+import pytest
+
+from duo_tool import instrumentation
+from duo_tool.instrumentation import MemorySink, PrometheusFileSink, SamplingProfiler, count, snapshot, timed, timer
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    """Start and end every test with metrics off and empty."""
+    instrumentation.disable()
+    instrumentation.reset()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+@timed("stage")
+def _work(seconds: float, fail: bool = False) -> float:
+    """Sleep for the seconds, and return them or raise."""
+    time.sleep(seconds)
+    if fail:
+        raise ValueError("failed")
+    return seconds
+
+
+def test_timed_is_a_no_op_when_disabled():
+    assert _work(0) == 0
+    with timer("block"):
+        pass
+    count("rows", 10)
+    assert snapshot() == {"timers": {}, "counters": {}}
+    assert _work.__name__ == "_work"
+
+
+def test_timed_adds_up_calls_and_seconds():
+    instrumentation.enable()
+    assert _work(0.02) == 0.02
+    _work(0.001)
+    with pytest.raises(ValueError):
+        _work(0.001, fail=True)
+
+    # Calls that raise are timed as well
+    stage = snapshot()["timers"]["stage"]
+    assert stage["calls"] == 3
+    assert 0.022 <= stage["seconds"] < 1
+    assert 0.02 <= stage["max_seconds"] <= stage["seconds"]
+
+
+def test_timed_from_many_threads():
+    instrumentation.enable()
+    threads = [threading.Thread(target=lambda: [_work(0) for _ in range(100)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert snapshot()["timers"]["stage"]["calls"] == 800
+
+
+def test_counters_per_label():
+    instrumentation.enable()
+    count("rows", 420)
+    count("rows", 60)
+    count("cache_hits", cache="get_inputs")
+    count("cache_hits", cache="get_inputs")
+    count("cache_hits", cache="one_time_payment")
+    assert snapshot()["counters"] == {
+        "rows": {(): 480},
+        "cache_hits": {(("cache", "get_inputs"),): 2, (("cache", "one_time_payment"),): 1},
+    }
+
+
+def test_sinks(tmp_path):
+    memory = MemorySink()
+    instrumentation.enable(memory, PrometheusFileSink(str(tmp_path / "metrics.{pid}.prom")))
+    with timer("batch"):
+        count("rows", 3, phase="aanloopfase")
+    metrics = instrumentation.flush()
+    assert memory.last == metrics
+
+    text = (tmp_path / f"metrics.{os.getpid()}.prom").read_text()
+    assert text == instrumentation.to_prometheus(metrics)
+    assert 'duo_tool_stage_calls_total{stage="batch"} 1\n' in text
+    assert 'duo_tool_rows_total{phase="aanloopfase"} 3\n' in text
+    assert "# TYPE duo_tool_stage_seconds_max gauge\n" in text
+
+    # Disabling removes the sinks, but keeps the metrics until they are reset
+    instrumentation.disable()
+    assert snapshot()["counters"]["rows"] == {(("phase", "aanloopfase"),): 3}
+    instrumentation.reset()
+    assert instrumentation.to_prometheus(snapshot()) == "\n"
+
+
+def _busy_profiled_function(seconds: float) -> None:
+    """Keep the main thread busy, so the profiler samples this function."""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(1_000))
+
+
+def test_sampling_profiler(tmp_path):
+    profiler = SamplingProfiler(interval=0.005)
+    profiler.start()
+    _busy_profiled_function(0.3)
+    profiler.stop()
+
+    # Every sample is a stack of all frames from the root, ending in the function that was running
+    stacks = [stack for stack in profiler.samples if "_busy_profiled_function" in stack]
+    assert sum(profiler.samples[stack] for stack in stacks) >= 10
+    assert all(stack.index("test_sampling_profiler") < stack.index("_busy_profiled_function") for stack in stacks)
+    # The profiler does not sample its own thread
+    assert not any("_run (instrumentation.py" in stack for stack in profiler.samples)
+
+    path = tmp_path / "profile.{pid}.folded"
+    profiler.write(str(path))
+    lines = (tmp_path / f"profile.{os.getpid()}.folded").read_text().splitlines()
+    assert lines == profiler.folded().splitlines()
+    counts = [int(line.rpartition(" ")[2]) for line in lines]
+    assert counts == sorted(counts, reverse=True) and sum(counts) == sum(profiler.samples.values())
+
+    # No samples are taken after stopping
+    samples = sum(profiler.samples.values())
+    _busy_profiled_function(0.05)
+    assert sum(profiler.samples.values()) == samples
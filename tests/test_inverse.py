@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from duo_tool.inputs import get_inputs
+from duo_tool.inverse import debt_for_payment, monthly_payment, months_for_payment, rate_for_payment
+from duo_tool.kernels import payment_after_aanloopfase
+
+rng = np.random.default_rng(0)
+ROWS = 300
+YEARS = rng.choice([15, 35], ROWS)
+DEBT = np.round(rng.uniform(100, 150_000, ROWS), 2)
+PERC = np.where(rng.random(ROWS) < 0.2, 0.0, np.round(rng.uniform(0, 6, ROWS), 2))
+OFFSET = rng.integers(1, 85, ROWS)
+
+
+def _payment_for_months(original_debt, interest_perc, payment_offset, months) -> np.ndarray:
+    """The monthly payment for a payment phase of any number of months."""
+    interest_rate = np.asarray(interest_perc, dtype=np.float64) / 100
+    return payment_after_aanloopfase(original_debt, interest_rate, payment_offset, months)[1]
+
+
+def test_monthly_payment_equals_get_inputs():
+    for idx in range(0, ROWS, 30):
+        inputs = get_inputs(int(YEARS[idx]), pd.Timestamp("2024-01-01"), DEBT[idx], PERC[idx], int(OFFSET[idx]))
+        assert monthly_payment(YEARS[idx], DEBT[idx], PERC[idx], OFFSET[idx]).tolist() == [inputs["monthly_payment"]]
+
+
+def test_debt_for_payment():
+    target = monthly_payment(YEARS, DEBT, PERC, OFFSET)
+    debt = debt_for_payment(target, YEARS, PERC, OFFSET)
+
+    # The debt is the highest in whole cents with at most the target payment, so it is at least the original debt
+    assert (monthly_payment(YEARS, debt, PERC, OFFSET) <= target).all()
+    assert (monthly_payment(YEARS, debt + 0.01, PERC, OFFSET) > target).all()
+    assert (debt >= DEBT).all()
+    assert (np.round(debt, 2) == debt).all()
+
+
+def test_debt_for_payment_without_interest():
+    # Every debt up to about 420 * 100.005 euros rounds to a payment of 100 euros over 35 years
+    assert debt_for_payment(100, 35, 0, [1, 24]).tolist() == [42_002.1, 42_002.1]
+    with pytest.raises(ValueError):
+        debt_for_payment(-1, 35, 2.56, 24)
+
+
+def test_months_for_payment():
+    target = monthly_payment(YEARS, DEBT, PERC, OFFSET)
+    months = months_for_payment(target, DEBT, PERC, OFFSET)
+
+    # The shortest payment phase with at most the target payment, which is at most the term
+    assert np.isfinite(months).all() and (months <= 12 * YEARS).all()
+    months = months.astype(np.int64)
+    assert (_payment_for_months(DEBT, PERC, OFFSET, months) <= target).all()
+    shorter = months > 1
+    assert (
+        _payment_for_months(DEBT[shorter], PERC[shorter], OFFSET[shorter], months[shorter] - 1) > target[shorter]
+    ).all()
+
+
+def test_months_for_payment_that_never_pays_off():
+    # The interest of the first month of the payment phase is 30_000 * 2.56% / 12 = 64 euros
+    payment = monthly_payment(35, 30_000, 2.56, 1)[0]
+    months = months_for_payment([0.0, 63.99, 64.0, 64.01, payment], 30_000, 2.56, 1)
+    assert months[:3].tolist() == [np.inf] * 3
+    assert months[3] > months[4] == 420
+
+    # Without interest any payment pays off the debt, 1 euro needs 30_000 / 1.005 months to round to at most 1 euro
+    assert months_for_payment([1, 100, 30_000, 40_000], 30_000, 0, 24).tolist() == [29_851, 300, 1, 1]
+
+
+def test_rate_for_payment():
+    i = PERC / 1200
+    growth = (1 + i) ** (12 * YEARS)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factor = np.where(i == 0, 1 / (12 * YEARS), i * growth / (growth - 1))
+    target = DEBT * (1 + i) ** (OFFSET - 1) * factor
+    perc = rate_for_payment(target, YEARS, DEBT, OFFSET)
+    np.testing.assert_allclose(perc, PERC, atol=1e-8)
+
+    # Every next cent of payment needs a higher interest percentage
+    assert (rate_for_payment(target + 0.01, YEARS, DEBT, OFFSET) > perc).all()
+
+
+def test_rate_for_payment_below_zero_percent():
+    # At 0% the payment is 42_000 / 420 = 100 euros, less is not enough to pay off the debt at any rate
+    perc = rate_for_payment([99.99, 100, 150], 35, 42_000, 24)
+    assert np.isnan(perc[0])
+    assert perc[1] == pytest.approx(0, abs=1e-8)
+    assert monthly_payment(35, 42_000, perc[2], 24) == 150
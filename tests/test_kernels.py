@@ -0,0 +1,89 @@
+import random
+
+import baseline
+import numpy as np
+import pytest
+
+from duo_tool.kernels import amortize, annuity_payment, compound, compound_at, round_cents
+
+
+def _loans(seed: int, n: int) -> list:
+    """Random (debt, interest rate, months) loans, including 0% and the rates DUO used."""
+    rng = random.Random(seed)
+    return [
+        (
+            round(rng.uniform(100, 200_000), rng.choice([0, 2])),
+            rng.choice([0, 0.0256, 0.0046, 0.0592, round(rng.uniform(0, 0.1), 4)]),
+            rng.choice([12, 180, 420, rng.randint(1, 500)]),
+        )
+        for _ in range(n)
+    ]
+
+
+def _debt(debt: float, numpy_round: bool):
+    """The debt as the type that rounds like `numpy_round`, see `duo_tool.kernels`."""
+    return np.float64(debt) if numpy_round else debt
+
+
+@pytest.mark.parametrize("numpy_round", [False, True])
+def test_round_cents(numpy_round):
+    values = np.random.default_rng(0).uniform(0, 1000, 10_000)
+    values[:100] = np.arange(100) / 100 + 0.005  # half cents
+    expected = [round(_debt(value, numpy_round), 2) for value in values.tolist()]
+    assert round_cents(values, numpy_round).tolist() == expected
+
+
+@pytest.mark.parametrize("numpy_round", [False, True])
+def test_compound(numpy_round):
+    rng = random.Random(1)
+    for debt, rate, _ in _loans(1, 300):
+        months = rng.randint(1, 84)
+        expected = [float(baseline.monthly_compound(_debt(debt, numpy_round), x, rate)) for x in range(months)]
+        assert compound(debt, rate, months, numpy_round)[0].tolist() == expected
+
+
+def test_compound_at():
+    debt, rate, months = np.array(_loans(2, 500), dtype=np.float64).T
+    months_passed = (months % 85).astype(int)
+    expected = [baseline.monthly_compound(*loan) for loan in zip(debt.tolist(), months_passed.tolist(), rate.tolist())]
+    assert compound_at(debt, rate, months_passed).tolist() == expected
+
+
+@pytest.mark.parametrize("numpy_round", [False, True])
+def test_annuity_payment(numpy_round):
+    for debt, rate, months in _loans(3, 1000):
+        expected = baseline.monthly_payment(_debt(debt, numpy_round), rate, months)
+        assert annuity_payment(debt, rate, months, numpy_round)[0] == expected
+
+
+@pytest.mark.parametrize("numpy_round", [False, True])
+def test_amortize(numpy_round):
+    rng = random.Random(4)
+    for debt, rate, months in _loans(4, 300):
+        debt = _debt(debt, numpy_round)
+        payment = baseline.monthly_payment(debt, rate, months)
+        if rng.random() < 0.3:
+            # A higher or lower payment than the annuity, which pays off the debt early or leaves some behind
+            payment = _debt(round(payment * rng.uniform(0.5, 3), 2), numpy_round)
+
+        remaining, principal, interest = amortize(float(debt), float(payment), rate, months, numpy_round)
+        expected = np.array(baseline.amortize(debt, payment, rate, months), dtype=np.float64).T
+        np.testing.assert_array_equal(np.stack([remaining[0], principal[0], interest[0]]), expected)
+
+
+@pytest.mark.parametrize("numpy_round", [False, True])
+@pytest.mark.parametrize("borrowers", [60, 400])
+def test_amortize_batch(numpy_round, borrowers):
+    """Small batches are solved for all months at once, large batches step through the months."""
+    rng = np.random.default_rng(5)
+    debt = np.round(rng.uniform(1000, 100_000, borrowers), 2)
+    rate = rng.choice([0.0256, 0.0592, 0.0046, 0], borrowers)
+    payment = annuity_payment(debt, rate, 420, numpy_round) * rng.choice([1, 1, 1.5], borrowers)
+
+    remaining, principal, interest = amortize(debt, payment, rate, 420, numpy_round)
+    for idx in range(borrowers):
+        debt_i, payment_i = _debt(float(debt[idx]), numpy_round), _debt(float(payment[idx]), numpy_round)
+        expected = baseline.amortize(debt_i, payment_i, float(rate[idx]), 420)
+        np.testing.assert_array_equal(
+            np.stack([remaining[idx], principal[idx], interest[idx]]), np.array(expected, dtype=np.float64).T
+        )
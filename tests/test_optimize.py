@@ -0,0 +1,103 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from duo_tool.events import ExtraPayment, ScheduleEngine
+from duo_tool.optimize import LumpSumOptimizer
+from duo_tool.schedule import to_ordinal, to_timestamp
+
+
+def _loans(seed: int, n: int) -> list:
+    """Random (years, start date, original debt, interest percentage, payment offset) loans."""
+    rng = random.Random(seed)
+    return [
+        (
+            rng.choice([15, 35]),
+            pd.Timestamp(f"{rng.randint(2020, 2030)}-{rng.randint(1, 12):02d}-01"),
+            rng.choice([10_000, 30_000, rng.randint(100, 150_000)]),
+            rng.choice([2.56, 0.46, 0, round(rng.uniform(0, 6), 2)]),
+            rng.randint(1, 84),
+        )
+        for _ in range(n)
+    ]
+
+
+def _engine(loan: tuple, payment_date: pd.Timestamp, amount: float) -> dict:
+    """The outcome of the extra payment calculated by the engine, which the optimizer should match."""
+    return ScheduleEngine(*loan).calculate([ExtraPayment(payment_date, amount)])
+
+
+@pytest.mark.parametrize("loan", _loans(0, 100))
+def test_evaluate_equals_engine(loan):
+    optimizer = LumpSumOptimizer(*loan)
+    rng = random.Random(repr(loan))
+    for row in rng.sample(range(optimizer.months), 15):
+        debt = optimizer.schedule.debt[row]
+        if debt < 1:
+            continue
+        amount = rng.choice([round(rng.uniform(0, debt), 2), float(int(debt / 2)), float(debt)])
+        payment_date = to_timestamp(to_ordinal(loan[1]) + row)
+
+        expected = _engine(loan, payment_date, amount)
+        outputs = optimizer.evaluate(payment_date, amount)
+        assert outputs["monthly_payment"][0] == expected["monthly_payment"]
+        assert outputs["total_interest_paid"][0] == expected["total_interest_paid"]
+        assert pd.Timestamp(outputs["last_payment_month"][0]) == expected["debt_over_time"].last_month
+
+
+def test_evaluate_many_months_at_once():
+    loan = (35, pd.Timestamp("2024-01-01"), 30_000, 2.56, 24)
+    optimizer = LumpSumOptimizer(*loan)
+    rows = np.flatnonzero(optimizer.schedule.debt >= 1_000)[::7]
+    dates = [to_timestamp(to_ordinal(loan[1]) + row) for row in rows]
+    outputs = optimizer.evaluate(dates, 1_000)
+    expected = [_engine(loan, date, 1_000)["total_interest_paid"] for date in dates]
+    assert outputs["total_interest_paid"].tolist() == expected
+
+
+def test_evaluate_refuses_payment_above_the_debt():
+    optimizer = LumpSumOptimizer(35, pd.Timestamp("2024-01-01"), 10_000, 2.56, 24)
+    with pytest.raises(ValueError):
+        optimizer.evaluate(pd.Timestamp("2024-01-01"), 10_000.01)
+
+
+@pytest.mark.parametrize("loan", _loans(1, 15))
+def test_amount_for_payment_is_the_smallest(loan):
+    optimizer = LumpSumOptimizer(*loan)
+    rng = random.Random(repr(loan))
+    target = round(optimizer.monthly_payment * rng.uniform(0.3, 0.95), 2)
+    last_date = to_timestamp(to_ordinal(loan[1]) + rng.randint(0, optimizer.months - 2))
+
+    for result in [optimizer.amount_for_payment(target), optimizer.amount_for_payment(target, last_date=last_date)]:
+        outputs = _engine(loan, result["payment_date"], result["amount"])
+        assert outputs["monthly_payment"] <= target
+        assert outputs["total_interest_paid"] == result["total_interest_paid"]
+
+        # A cent less does not reach the target, unless the amount is the whole debt
+        row = to_ordinal(result["payment_date"]) - to_ordinal(loan[1])
+        if 0.01 <= result["amount"] < optimizer.schedule.debt[row]:
+            assert _engine(loan, result["payment_date"], round(result["amount"] - 0.01, 2))["monthly_payment"] > target
+
+
+@pytest.mark.parametrize("loan", _loans(2, 15))
+def test_best_month_saves_the_most_interest(loan):
+    optimizer = LumpSumOptimizer(*loan)
+    amount = float(int(loan[2] / 3))
+    result = optimizer.best_month(amount)
+    assert _engine(loan, result["payment_date"], amount)["total_interest_paid"] == result["total_interest_paid"]
+
+    rows = np.flatnonzero(optimizer.schedule.debt[:-1] >= amount)
+    dates = [to_timestamp(to_ordinal(loan[1]) + row) for row in rows]
+    assert result["total_interest_paid"] == optimizer.evaluate(dates, amount)["total_interest_paid"].min()
+
+
+@pytest.mark.parametrize("loan", _loans(3, 15))
+def test_amount_to_finish_by(loan):
+    optimizer = LumpSumOptimizer(*loan)
+    last_date = to_timestamp(to_ordinal(loan[1]) + random.Random(repr(loan)).randint(0, optimizer.months - 1))
+    result = optimizer.amount_to_finish_by(last_date)
+    outputs = _engine(loan, result["payment_date"], result["amount"])
+    assert outputs["debt_over_time"].last_month <= last_date
+    assert outputs["total_interest_paid"] == result["total_interest_paid"]
@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from duo_tool import cache, instrumentation
+from duo_tool.inputs import get_inputs, one_time_payment
+from duo_tool.pipeline import Pipeline, loan_pipeline
+
+LOAN = {
+    "years": 35,
+    "start_date": pd.Timestamp("2024-01-01"),
+    "original_debt": 30_000,
+    "interest_perc": 2.56,
+    "payment_offset": 24,
+    "payment_date": None,
+    "payment_amount": 0,
+}
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    """Start every test without cached results, and count the calculations of the pipeline nodes."""
+    monkeypatch.setattr(cache, "store", None)
+    cache.inputs_cache.clear()
+    cache.one_time_payment_cache.clear()
+    instrumentation.reset()
+    instrumentation.enable()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+    cache.inputs_cache.clear()
+    cache.one_time_payment_cache.clear()
+
+
+def _misses(node: str) -> int:
+    """The number of times a node was calculated."""
+    return instrumentation.snapshot()["counters"].get("pipeline_misses", {}).get((("node", node),), 0)
+
+
+def _expected(values: dict) -> dict:
+    loan = [values[name] for name in ["years", "start_date", "original_debt", "interest_perc", "payment_offset"]]
+    outputs = get_inputs(*loan)
+    if values["payment_date"] is not None and values["payment_amount"]:
+        outputs = one_time_payment(
+            None,
+            values["payment_amount"],
+            values["payment_date"],
+            values["interest_perc"],
+            values["years"],
+            values["start_date"],
+            values["original_debt"],
+            values["payment_offset"],
+            outputs["monthly_payment"],
+        )
+    return outputs
+
+
+def test_random_edits_equal_direct_calculation():
+    pipeline = loan_pipeline()
+    rng = np.random.default_rng(1)
+    payment_dates = [None, pd.Timestamp("2026-03-01"), pd.Timestamp("2030-01-01")]
+    for _ in range(400):
+        values = {
+            "years": int(rng.choice([15, 35])),
+            "start_date": pd.Timestamp("2024-01-01"),
+            "original_debt": int(rng.choice([10_000, 23_456, 80_000])),
+            "interest_perc": float(rng.choice([0.0, 2.56, 0.46])),
+            "payment_offset": int(rng.choice([24, 1, 60])),
+            "payment_date": payment_dates[rng.integers(len(payment_dates))],
+            "payment_amount": int(rng.choice([0, 500, 3_000])),
+        }
+        pipeline.update(**values)
+        outputs = pipeline.get("outputs")
+        expected = _expected(values)
+
+        for column in ["month", "debt", "payment", "principal", "interest"]:
+            np.testing.assert_array_equal(
+                getattr(outputs["debt_over_time"], column), getattr(expected["debt_over_time"], column)
+            )
+        for key in expected:
+            if key != "debt_over_time":
+                assert outputs[key] == expected[key]
+                assert type(outputs[key]) is type(expected[key])
+
+
+def test_changing_the_years_reuses_the_aanloopfase():
+    pipeline = loan_pipeline()
+    pipeline.update(**LOAN)
+    pipeline.get("outputs")
+    assert _misses("aanloopfase") == 1
+
+    assert pipeline.update(years=15) == ["payment_phase", "inputs", "engine", "outputs"]
+    pipeline.get("outputs")
+    assert _misses("aanloopfase") == 1
+    assert _misses("payment_phase") == 2
+
+    # Back to 35 years gives the kept results
+    pipeline.update(years=35)
+    pipeline.get("outputs")
+    assert _misses("payment_phase") == 2
+    assert _misses("outputs") == 2
+
+
+def test_changing_the_extra_payment_reuses_both_phases():
+    pipeline = loan_pipeline()
+    pipeline.update(**LOAN)
+    pipeline.get("outputs")
+    for amount in [500, 1_000, 1_500]:
+        assert pipeline.update(payment_date=pd.Timestamp("2030-01-01"), payment_amount=amount) == ["outputs"]
+        assert pipeline.get("outputs")["total_interest_paid"] == _expected(pipeline.inputs)["total_interest_paid"]
+    assert _misses("aanloopfase") == 1
+    assert _misses("payment_phase") == 1
+    assert _misses("engine") == 1
+
+
+def test_cached_inputs_skip_the_phases():
+    """A loan that another session already calculated comes from the shared cache."""
+    first = loan_pipeline()
+    first.update(**LOAN)
+    first.get("outputs")
+
+    second = loan_pipeline()
+    second.update(**LOAN)
+    second.get("outputs")
+    assert _misses("aanloopfase") == 1
+    assert _misses("inputs") == 2
+
+
+def test_lazy_dependency_is_only_calculated_when_used():
+    calls = []
+    pipeline = Pipeline()
+    pipeline.add("expensive", lambda x: calls.append(x) or x * 2, "x")
+    pipeline.add("result", lambda x, expensive: x if x < 10 else expensive(), "x", lazy=("expensive",))
+
+    pipeline.update(x=3)
+    assert pipeline.get("result") == 3
+    pipeline.update(x=12)
+    assert pipeline.get("result") == 24
+    assert calls == [12]
+
+
+def test_missing_inputs():
+    pipeline = loan_pipeline()
+    pipeline.update(years=35)
+    with pytest.raises(ValueError):
+        pipeline.get("outputs")
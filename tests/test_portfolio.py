@@ -0,0 +1,67 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from duo_tool.inputs import get_inputs
+from duo_tool.portfolio import Projection, project_portfolio
+from duo_tool.schedule import COLUMNS
+
+
+def _borrowers(seed: int, n: int) -> dict:
+    """Random inputs of `n` borrowers as arrays, many of them starting in the same month."""
+    rng = random.Random(seed)
+    return {
+        "years": np.array([rng.choice([15, 35]) for _ in range(n)]),
+        "start_date": pd.to_datetime([f"{rng.randint(2024, 2026)}-{rng.choice([1, 9]):02d}-01" for _ in range(n)]),
+        "original_debt": np.array([round(rng.uniform(100, 90_000), 2) for _ in range(n)]),
+        "interest_perc": np.array([rng.choice([0, 0.46, 2.56, 2.95]) for _ in range(n)]),
+        "payment_offset": np.array([rng.randint(1, 84) for _ in range(n)]),
+    }
+
+
+def _expected(borrowers: dict) -> Projection:
+    """The sum of the debt over time of `get_inputs` of every borrower."""
+    schedules = [
+        get_inputs(*(values[borrower] for values in borrowers.values()))["debt_over_time"]
+        for borrower in range(len(borrowers["years"]))
+    ]
+    return Projection.combine([Projection.from_schedule(schedule) for schedule in schedules])
+
+
+@pytest.mark.parametrize("workers, chunk_size", [(1, 2_000), (1, 3), (2, 3)])
+def test_portfolio_equals_sum_of_get_inputs(workers, chunk_size):
+    borrowers = _borrowers(0, 11)
+    projection = project_portfolio(*borrowers.values(), chunk_size=chunk_size, workers=workers)
+    expected = _expected(borrowers)
+
+    assert projection.first_month == expected.first_month
+    for column in ("borrowers",) + COLUMNS:
+        np.testing.assert_array_equal(getattr(projection, column), getattr(expected, column))
+    assert projection.borrowers.max() <= 11 and projection.borrowers[0] >= 1
+
+
+def test_combine_in_any_order():
+    borrowers = _borrowers(1, 6)
+    parts = []
+    for start, stop in [(0, 2), (2, 4), (4, 6)]:
+        parts.append(project_portfolio(**{name: values[start:stop] for name, values in borrowers.items()}))
+    forward, backward = Projection.combine(parts), Projection.combine(parts[::-1])
+    for column in ("borrowers",) + COLUMNS:
+        np.testing.assert_array_equal(getattr(forward, column), getattr(backward, column))
+    pd.testing.assert_frame_equal(forward.to_pandas(), _expected(borrowers).to_pandas())
+
+
+def test_single_borrower():
+    projection = project_portfolio(35, pd.Timestamp("2024-01-01"), 30_000, 2.56, 24)
+    frame = projection.to_pandas()
+    inputs = get_inputs(35, pd.Timestamp("2024-01-01"), 30_000, 2.56, 24)
+    assert len(frame) == 444 and (frame["borrowers"] == 1).all()
+    assert frame["month"].tolist() == inputs["debt_over_time"].to_pandas()["month"].tolist()
+    assert frame["payment"].iloc[-1] == inputs["monthly_payment"]
+
+
+def test_wrong_chunk_size():
+    with pytest.raises(ValueError):
+        project_portfolio(35, pd.Timestamp("2024-01-01"), 30_000, 2.56, 24, chunk_size=0)
@@ -0,0 +1,151 @@
+import asyncio
+import random
+from dataclasses import replace
+
+import pandas as pd
+from loguru import logger
+
+from duo_tool.inputs import get_inputs, one_time_payment
+from duo_tool.service import Service, ServiceClient, parse_loan
+
+
+def _loans(seed: int, n: int) -> list:
+    """Random request bodies for /inputs."""
+    rng = random.Random(seed)
+    return [
+        {
+            "start_date": f"{rng.randint(1, 12):02d}-{rng.randint(2015, 2030)}",
+            "years": rng.choice([15, 35]),
+            "original_debt": round(rng.uniform(1000, 90_000), 2),
+            "interest_perc": rng.choice([0, 0.46, 2.56, 2.95]),
+            "payment_offset": rng.randint(1, 84),
+        }
+        for _ in range(n)
+    ]
+
+
+def _expected(loan: dict) -> dict:
+    start_date = pd.to_datetime(loan["start_date"], format="%m-%Y")
+    return get_inputs(loan["years"], start_date, loan["original_debt"], loan["interest_perc"], loan["payment_offset"])
+
+
+def _serve(test) -> None:
+    """Run the async test against a service on a free port."""
+
+    async def main():
+        async with Service(port=0) as service:
+            await test(service)
+
+    # The service logs every monthly payment of the extra payments
+    logger.disable("duo_tool")
+    try:
+        asyncio.run(main())
+    finally:
+        logger.enable("duo_tool")
+
+
+def test_inputs_equals_get_inputs():
+    async def test(service):
+        async with ServiceClient(port=service.port) as client:
+            for loan in _loans(0, 30):
+                status, outputs = await client.inputs(**loan, schedule=True)
+                expected = _expected(loan)
+                assert status == 200
+                assert outputs["monthly_payment"] == expected["monthly_payment"]
+                assert outputs["total_interest_paid"] == expected["total_interest_paid"]
+                assert outputs["last_payment_month"] == f"{expected['last_payment_month']:%m-%Y}"
+                for column in ["debt", "payment", "principal", "interest"]:
+                    assert outputs["debt_over_time"][column] == getattr(expected["debt_over_time"], column).tolist()
+
+    _serve(test)
+
+
+def test_one_time_payment_equals_one_time_payment():
+    async def test(service):
+        rng = random.Random(1)
+        async with ServiceClient(port=service.port) as client:
+            for loan in _loans(1, 20):
+                start_date = pd.to_datetime(loan["start_date"], format="%m-%Y")
+                payment_date = start_date + pd.DateOffset(months=rng.randint(0, 100))
+                status, outputs = await client.one_time_payment(
+                    **loan, payment_date=f"{payment_date:%m-%Y}", payment_amount=1000, schedule=True
+                )
+
+                inputs = _expected(loan)
+                expected = one_time_payment(
+                    None,
+                    1000.0,
+                    payment_date,
+                    loan["interest_perc"],
+                    loan["years"],
+                    start_date,
+                    loan["original_debt"],
+                    loan["payment_offset"],
+                    inputs["monthly_payment"],
+                )
+                assert status == 200
+                assert outputs["monthly_payment"] == expected["monthly_payment"]
+                assert outputs["total_interest_paid"] == expected["total_interest_paid"]
+                assert outputs["debt_over_time"]["debt"] == expected["debt_over_time"].debt.tolist()
+
+    _serve(test)
+
+
+def test_concurrent_requests_are_batched():
+    loans = _loans(2, 500)
+    results = [None] * len(loans)
+
+    async def client(service, first):
+        async with ServiceClient(port=service.port) as client:
+            for idx in range(first, len(loans), 50):
+                results[idx] = await client.inputs(**loans[idx])
+
+    async def test(service):
+        await asyncio.gather(*[client(service, first) for first in range(50)])
+        assert service.coalescer.loans == len(loans)
+        assert service.coalescer.batches < len(loans) / 5
+
+    _serve(test)
+    for loan, (status, outputs) in zip(loans, results):
+        expected = _expected(loan)
+        assert status == 200
+        assert outputs["monthly_payment"] == expected["monthly_payment"]
+        assert outputs["total_interest_paid"] == expected["total_interest_paid"]
+        assert outputs["last_payment_month"] == f"{expected['last_payment_month']:%m-%Y}"
+
+
+def test_wrong_requests():
+    async def test(service):
+        async with ServiceClient(port=service.port) as client:
+            status, outputs = await client.inputs(start_date="13-2024", years=35, original_debt=1, interest_perc=1)
+            assert status == 400 and "date" in outputs["error"]
+            status, _ = await client.inputs(start_date="01-2024", years=20, original_debt=1, interest_perc=1)
+            assert status == 400
+            for interest_perc in [1e6, "inf", "nan", -1]:
+                status, outputs = await client.inputs(
+                    start_date="01-2024", years=35, original_debt=1, interest_perc=interest_perc
+                )
+                assert status == 400 and "interest_perc" in outputs["error"]
+            assert await client.request("GET", "/health") == (200, {"status": "ok", "pending": 0})
+            assert (await client.request("GET", "/nope"))[0] == 404
+
+    _serve(test)
+
+
+def test_failing_loan_only_fails_its_own_request():
+    """A loan that overflows is calculated in the same batch as a valid one, only its request gets the error."""
+    loan = _loans(3, 1)[0]
+    body = {**loan, "payment_date": "01-2030", "payment_amount": 10}
+    poisoned = replace(parse_loan(body, one_time=True), interest_perc=1e6)
+
+    async def test(service):
+        async with ServiceClient(port=service.port) as client:
+            failed, (status, outputs) = await asyncio.gather(
+                service.coalescer.submit(poisoned), client.inputs(**loan), return_exceptions=True
+            )
+        assert service.coalescer.batches == 1 and service.coalescer.loans == 2
+        assert isinstance(failed, ArithmeticError)
+        assert status == 200
+        assert outputs["monthly_payment"] == _expected(loan)["monthly_payment"]
+
+    _serve(test)
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from duo_tool.inputs import get_inputs
+from duo_tool.kernels import truncate_at_payoff
+from duo_tool.schedule import to_datetime64, to_ordinal, to_timestamp
+from duo_tool.simulation import RateModel, get_simulation
+
+RESET_MONTHS = 60
+
+
+def _expected(years: int, start_date: pd.Timestamp, original_debt: float, payment_offset: int, rates: tuple) -> dict:
+    """`get_inputs` with the rate of every reset in the rate schedule, ending in the month the debt is paid off."""
+    months = 12 * years
+    first_payment = to_ordinal(start_date) + payment_offset
+    resets = range(RESET_MONTHS, months, RESET_MONTHS)
+    rate_schedule = [(to_timestamp(first_payment + first), rates[1]) for first in resets]
+    outputs = get_inputs(years, start_date, original_debt, rates[0], payment_offset, rate_schedule)
+
+    # Without extra payments `get_inputs` keeps charging the payment after the rounding paid the debt off
+    schedule = outputs["debt_over_time"]
+    phase = schedule[payment_offset:]
+    length, payment, _ = truncate_at_payoff(
+        schedule.debt[payment_offset - 1],
+        phase.payment[None],
+        phase.debt[None],
+        phase.principal[None],
+        phase.interest[None],
+    )
+    expected = {
+        "monthly_payment": phase.payment[range(0, months, RESET_MONTHS)],
+        "total_interest_paid": outputs["total_interest_paid"],
+        "last_payment_month": to_datetime64(outputs["debt_over_time"].month[-1]),
+    }
+    if length[0] < months:
+        expected["monthly_payment"] = payment[0, range(0, months, RESET_MONTHS)]
+        expected["total_interest_paid"] = round(payment.sum() - original_debt, 2)
+        expected["last_payment_month"] = to_datetime64(first_payment + length[0] - 1)
+    return expected
+
+
+@pytest.mark.parametrize(
+    "loan",
+    [
+        (35, pd.Timestamp("2024-01-01"), 30_000, (2.56, 2.56), 24),
+        (35, pd.Timestamp("2024-01-01"), 30_000, (2.56, 4.1), 24),
+        (15, pd.Timestamp("2027-06-01"), 12_345.67, (0.46, 0.0), 7),
+        (35, pd.Timestamp("2024-01-01"), 74_000, (5.0, 1.25), 84),
+        # The rounding pays these off years before the end of the term
+        (15, pd.Timestamp("2024-01-01"), 1, (0.0, 0.0), 1),
+        (35, pd.Timestamp("2024-01-01"), 1, (2.0, 0.5), 1),
+    ],
+)
+def test_deterministic_simulation_equals_get_inputs(loan):
+    years, start_date, original_debt, rates, payment_offset = loan
+    model = RateModel(mean=rates[1], reversion=1, volatility=0)
+    outputs = get_simulation(
+        years, start_date, original_debt, rates[0], payment_offset, model, paths=3, reset_months=RESET_MONTHS
+    )
+    expected = _expected(years, start_date, original_debt, payment_offset, rates)
+
+    for percentile in range(len(outputs["percentiles"])):
+        np.testing.assert_array_equal(outputs["monthly_payment"][percentile], expected["monthly_payment"])
+        assert outputs["total_interest_paid"][percentile] == expected["total_interest_paid"]
+        assert outputs["last_payment_month"][percentile] == expected["last_payment_month"]
+    assert outputs["expected_total_interest_paid"] == expected["total_interest_paid"]
+
+
+def test_results_do_not_depend_on_the_workers():
+    loan = (35, pd.Timestamp("2024-01-01"), 30_000, 2.56, 24)
+    serial = get_simulation(*loan, paths=500, seed=1, chunk_size=100)
+    parallel = get_simulation(*loan, paths=500, seed=1, chunk_size=100, workers=2)
+    for key in ["monthly_payment", "total_interest_paid", "last_payment_month"]:
+        np.testing.assert_array_equal(serial[key], parallel[key])
+    assert serial["expected_total_interest_paid"] == parallel["expected_total_interest_paid"]
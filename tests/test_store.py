@@ -0,0 +1,109 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from duo_tool.inputs import get_inputs
+from duo_tool.schedule import COLUMNS
+from duo_tool.store import ScheduleStore
+
+LOAN = (35, pd.Timestamp("2024-01-01"), 30_000.0, 2.56, 24)
+
+
+def _key(original_debt: float = LOAN[2]) -> str:
+    return ScheduleStore.key("get_inputs", *LOAN[:2], original_debt, *LOAN[3:])
+
+
+def _put_many(directory: str, times: int) -> None:
+    """Write the same entry over and over, from another process."""
+    store = ScheduleStore(directory)
+    result = get_inputs(*LOAN)
+    for _ in range(times):
+        store.put(_key(), result)
+
+
+def test_round_trip(tmp_path):
+    store = ScheduleStore(tmp_path)
+    expected = get_inputs(*LOAN)
+    store.put(_key(), expected)
+    outputs = store.get(_key())
+
+    schedule = outputs["debt_over_time"]
+    assert schedule.month[0] == expected["debt_over_time"].month[0]
+    np.testing.assert_array_equal(schedule.month, expected["debt_over_time"].month)
+    for column in COLUMNS:
+        values = getattr(schedule, column)
+        assert values.dtype == np.float64
+        assert isinstance(values, np.memmap) and not values.flags.writeable
+        np.testing.assert_array_equal(values, getattr(expected["debt_over_time"], column))
+    assert outputs["monthly_payment"] == expected["monthly_payment"]
+    assert outputs["total_interest_paid"] == expected["total_interest_paid"]
+    assert outputs["last_payment_month"] == expected["last_payment_month"]
+    assert store.info() == {"hits": 1, "misses": 0, "entries": 1, "bytes": (tmp_path / f"{_key()}.npy").stat().st_size}
+
+
+def test_keys_depend_on_the_inputs():
+    assert _key() == _key()
+    assert _key() != _key(30_000.01)
+    assert ScheduleStore.key("get_inputs", 10_000.0) != ScheduleStore.key("get_inputs", 10_000)
+
+
+def test_evicts_the_least_recently_read(tmp_path):
+    result = get_inputs(*LOAN)
+    store = ScheduleStore(tmp_path)
+    keys = [_key(debt) for debt in [1_000.0, 2_000.0, 3_000.0, 4_000.0]]
+    for idx, key in enumerate(keys):
+        store.put(key, result)
+        os.utime(tmp_path / f"{key}.json", (idx, idx))
+
+    # Reading the oldest entry makes it the most recently read
+    assert store.get(keys[0]) is not None
+
+    # Room for two and a half entries, so eviction keeps two of them
+    entry_bytes = sum(path.stat().st_size for path in tmp_path.glob(f"{keys[0]}.*"))
+    store.max_bytes = int(2.5 * entry_bytes)
+    assert store.evict() == 2
+    assert [store.get(key) is None for key in keys] == [False, True, True, False]
+    assert store.info()["entries"] == 2
+
+
+@pytest.mark.parametrize(
+    "corrupt",
+    [
+        lambda path: path.with_suffix(".json").unlink(),
+        lambda path: path.with_suffix(".json").write_text('{"first_month": 2'),
+        lambda path: path.with_suffix(".json").write_text("[]"),
+        lambda path: path.with_suffix(".json").write_text("{}"),
+        lambda path: path.with_suffix(".npy").write_bytes(path.with_suffix(".npy").read_bytes()[:200]),
+    ],
+    ids=["missing", "truncated", "list", "no first month", "truncated schedule"],
+)
+def test_unreadable_entry_is_calculated_again(tmp_path, corrupt):
+    store = ScheduleStore(tmp_path)
+    expected = get_inputs(*LOAN)
+    store.put(_key(), expected)
+    corrupt(tmp_path / f"{_key()}.npy")
+
+    assert store.get(_key()) is None
+    outputs = store.get_or_compute(_key(), lambda: expected)
+    assert store.misses == 2
+    np.testing.assert_array_equal(store.get(_key())["debt_over_time"].debt, expected["debt_over_time"].debt)
+    assert outputs["total_interest_paid"] == expected["total_interest_paid"]
+
+
+def test_two_writers_of_the_same_key(tmp_path):
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(_put_many, str(tmp_path), 20) for _ in range(2)]
+        for future in futures:
+            future.result()
+
+    expected = get_inputs(*LOAN)
+    outputs = ScheduleStore(tmp_path).get(_key())
+    np.testing.assert_array_equal(outputs["debt_over_time"].debt, expected["debt_over_time"].debt)
+    assert outputs["total_interest_paid"] == expected["total_interest_paid"]
+    assert sorted(path.name for path in tmp_path.iterdir() if path.name != ".lock") == [
+        f"{_key()}.json",
+        f"{_key()}.npy",
+    ]
@@ -0,0 +1,87 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from duo_tool.inputs import get_inputs
+from duo_tool.schedule import COLUMNS
+from duo_tool.stream import iter_chunks, iter_rows, open_writer, write_schedules
+
+# 7 borrowers in chunks of 3, so the last chunk is smaller
+CHUNK_SIZE = 3
+
+
+def _borrowers(seed: int, n: int) -> dict:
+    """Random inputs of `n` borrowers, as arrays."""
+    rng = random.Random(seed)
+    return {
+        "years": np.array([rng.choice([15, 35]) for _ in range(n)]),
+        "start_date": pd.to_datetime([f"{rng.randint(2020, 2030)}-{rng.randint(1, 12):02d}-01" for _ in range(n)]),
+        "original_debt": np.array([round(rng.uniform(100, 90_000), 2) for _ in range(n)]),
+        "interest_perc": np.array([rng.choice([0, 0.46, 2.56, 2.95]) for _ in range(n)]),
+        "payment_offset": np.array([rng.randint(1, 84) for _ in range(n)]),
+    }
+
+
+def _assert_equals_get_inputs(frame: pd.DataFrame, borrowers: dict) -> None:
+    """Check the rows of every borrower against the debt over time of `get_inputs`."""
+    assert frame["borrower"].tolist() == sorted(frame["borrower"].tolist())
+    for borrower, rows in frame.groupby("borrower"):
+        inputs = get_inputs(*(values[borrower] for values in borrowers.values()))
+        expected = inputs["debt_over_time"].to_pandas()
+        assert rows["month"].tolist() == expected["month"].tolist()
+        for column in COLUMNS:
+            np.testing.assert_array_equal(rows[column].to_numpy(), expected[column].to_numpy())
+    assert frame["borrower"].nunique() == len(borrowers["years"])
+
+
+def test_chunks_equal_get_inputs():
+    borrowers = _borrowers(0, 7)
+    chunks = list(iter_chunks(*borrowers.values(), chunk_size=CHUNK_SIZE))
+    assert [np.unique(chunk["borrower"]).tolist() for chunk in chunks] == [[0, 1, 2], [3, 4, 5], [6]]
+
+    frame = pd.concat([pd.DataFrame(chunk) for chunk in chunks], ignore_index=True)
+    frame["month"] = frame["month"].astype("datetime64[ns]")
+    _assert_equals_get_inputs(frame, borrowers)
+
+
+def test_rows_equal_chunks():
+    borrowers = _borrowers(1, 4)
+    rows = list(iter_rows(*borrowers.values(), chunk_size=CHUNK_SIZE))
+    frame = pd.DataFrame(rows, columns=["borrower", "month", *COLUMNS])
+    _assert_equals_get_inputs(frame, borrowers)
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet"])
+def test_write_schedules(tmp_path, suffix):
+    if suffix == ".parquet":
+        pytest.importorskip("pyarrow")
+    borrowers = _borrowers(2, 7)
+    path = tmp_path / f"schedules{suffix}"
+    rows = write_schedules(path, *borrowers.values(), chunk_size=CHUNK_SIZE)
+
+    if suffix == ".csv":
+        frame = pd.read_csv(path, parse_dates=["month"], float_precision="round_trip")
+    else:
+        frame = pd.read_parquet(path)
+        frame["month"] = pd.to_datetime(frame["month"])
+    assert len(frame) == rows == (12 * borrowers["years"] + borrowers["payment_offset"]).sum()
+    _assert_equals_get_inputs(frame, borrowers)
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet"])
+def test_write_without_chunks(tmp_path, suffix):
+    if suffix == ".parquet":
+        pytest.importorskip("pyarrow")
+    path = tmp_path / f"empty{suffix}"
+    with open_writer(path) as writer:
+        pass
+    assert writer.rows == 0 and path.exists()
+
+
+def test_wrong_arguments(tmp_path):
+    with pytest.raises(ValueError):
+        open_writer(tmp_path / "schedules.xlsx")
+    with pytest.raises(ValueError):
+        next(iter_chunks(35, pd.Timestamp("2024-01-01"), 30_000, 2.56, 24, chunk_size=0))
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from duo_tool.inputs import get_inputs
+from duo_tool.sweep import get_sweep
+
+START_DATE = pd.Timestamp("2024-01-01")
+GRID = ([15, 35], [1_000, 30_000.5, 89_999], [0, 0.46, 2.56], [1, 24, 84])
+
+
+@pytest.mark.parametrize("workers, chunk_size", [(1, 100_000), (1, 7), (2, 7)])
+def test_sweep_equals_get_inputs(workers, chunk_size):
+    outputs = get_sweep(GRID[0], START_DATE, *GRID[1:], workers=workers, chunk_size=chunk_size)
+    assert len(outputs) == np.prod([len(axis) for axis in GRID])
+
+    # The rows go through the grid in the order of the axes, the last one changing fastest
+    expected = pd.MultiIndex.from_product(GRID).to_frame(index=False)
+    np.testing.assert_array_equal(outputs[["years", "original_debt", "interest_perc", "payment_offset"]], expected)
+
+    for row in outputs.itertuples():
+        inputs = get_inputs(row.years, START_DATE, row.original_debt, row.interest_perc, row.payment_offset)
+        assert row.monthly_payment == inputs["monthly_payment"]
+        assert row.total_interest_paid == inputs["total_interest_paid"]
+        assert row.last_payment_month == inputs["last_payment_month"]
+
+
+def test_sweep_of_single_values():
+    outputs = get_sweep(35, START_DATE, 30_000, 2.56, 24, workers=1)
+    inputs = get_inputs(35, START_DATE, 30_000, 2.56, 24)
+    assert outputs["monthly_payment"].tolist() == [inputs["monthly_payment"]]
+
+
+def test_sweep_without_values():
+    with pytest.raises(ValueError):
+        get_sweep([], START_DATE, 30_000, 2.56, 24)
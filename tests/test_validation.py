@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from duo_tool.validation import check_amount, parse_date, validate_borrowers
+
+BORROWERS = {
+    "start_date": ["01-2024", "06-2020", "12-2030"],
+    "years": [35, 15, 35],
+    "original_debt": [30_000, 12_345.67, 500],
+    "interest_perc": [2.56, 0, 0.46],
+}
+
+
+def test_parse_date():
+    assert parse_date("03-2027") == pd.Timestamp("2027-03-01")
+    for date in ["13-2024", "2024-01", "", None]:
+        with pytest.raises(ValueError, match="date format"):
+            parse_date(date)
+
+
+def test_check_amount():
+    check_amount(1_000, upper_limit=1_000)
+    with pytest.raises(ValueError, match="too low"):
+        check_amount(0)
+    with pytest.raises(ValueError, match="too high"):
+        check_amount(1_000.01, upper_limit=1_000)
+
+
+def test_borrowers_with_defaults():
+    frame = pd.DataFrame({**BORROWERS, "payment_offset": [12, np.nan, 84]})
+    borrowers = validate_borrowers(frame)
+    assert borrowers["start_month"].tolist() == list(np.array(["2024-01", "2020-06", "2030-12"], dtype="datetime64[M]"))
+    assert borrowers["years"].tolist() == [35, 15, 35]
+    assert borrowers["original_debt"].tolist() == [30_000, 12_345.67, 500]
+    assert borrowers["interest_perc"].tolist() == [2.56, 0, 0.46]
+
+    # A blank optional cell, or a missing optional column, gets the default
+    assert borrowers["payment_offset"].tolist() == [12, 24, 84]
+    assert borrowers["events"] == [[], [], []]
+
+
+def test_borrowers_with_extra_payments():
+    frame = pd.DataFrame(
+        {
+            **BORROWERS,
+            "payment_date": ["01-2027;06-2030", None, "12-2030"],
+            "payment_amount": ["5000;2000", None, "500"],
+        }
+    )
+    events = validate_borrowers(frame)["events"]
+    assert events == [
+        [(pd.Timestamp("2027-01-01"), 5_000), (pd.Timestamp("2030-06-01"), 2_000)],
+        [],
+        [(pd.Timestamp("2030-12-01"), 500)],
+    ]
+
+
+@pytest.mark.parametrize(
+    "column, values, message",
+    [
+        ("start_date", ["01-2024", "2020-06", "13-2030"], "Rows 11, 12: the start_date"),
+        ("years", [35, 20, 35], "Row 11: the years"),
+        ("original_debt", [30_000, 0, "a lot"], "Rows 11, 12: the original_debt"),
+        ("interest_perc", [-0.01, np.inf, 100.01], "Rows 10, 11, 12: the interest_perc must be from 0 to 100"),
+        ("payment_offset", [0, 85, 1.5], "Rows 10, 11, 12: the payment_offset"),
+    ],
+)
+def test_wrong_borrowers(column, values, message):
+    frame = pd.DataFrame({**BORROWERS, column: values})
+    with pytest.raises(ValueError, match=message):
+        validate_borrowers(frame, first_row=10)
+
+
+@pytest.mark.parametrize(
+    "payment_date, payment_amount, message",
+    [
+        ("01-2027;06-2030", "5000", "the same number of extra payments"),
+        ("13-2027", "5000", "wrong extra payment of 5000 in 13-2027"),
+        ("01-2027", "40000", "Amount too high"),
+        ("01-2027", "0", "Amount too low"),
+        ("12-2023", "5000", "before the start of the aanloopfase"),
+    ],
+)
+def test_wrong_extra_payments(payment_date, payment_amount, message):
+    frame = pd.DataFrame(
+        {**BORROWERS, "payment_date": [payment_date, None, None], "payment_amount": [payment_amount, None, None]}
+    )
+    with pytest.raises(ValueError, match=f"Row 0: .*{message}"):
+        validate_borrowers(frame)
+
+
+def test_missing_columns():
+    with pytest.raises(ValueError, match="misses the columns \\['interest_perc'\\]"):
+        validate_borrowers(
+            pd.DataFrame({column: BORROWERS[column] for column in ["start_date", "years", "original_debt"]})
+        )
+
+
+def test_many_wrong_rows():
+    frame = pd.DataFrame({**BORROWERS, "years": [20, 20, 20]}).loc[[0, 1, 2, 0, 1, 2, 0]]
+    with pytest.raises(ValueError, match="Rows 0, 1, 2, 3, 4 and 2 more: the years"):
+        validate_borrowers(frame)